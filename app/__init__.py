@@ -42,6 +42,7 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import os
 import logging
 from dotenv import load_dotenv
@@ -90,14 +91,41 @@ def read_root():
     logger.info("Root endpoint accessed")
     return {"message": "API is running"}
 
+@app.get("/ready")
+def read_ready():
+    """200 once the chain client is initialised and has reached the node, 503 until then."""
+    from app.utils.blockchain import readiness, start_warm_up
+    if not readiness["ready"]:
+        start_warm_up()
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("Vault Blockchain API starting up...")
     logger.info(f"Network: {os.getenv('NETWORK', 'sepolia')}")
     logger.info(f"Contract Address: {os.getenv('CONTRACT_ADDRESS_SEPOLIA') or os.getenv('CONTRACT_ADDRESS')}")
+    # Client initialisation and the first RPC round-trips happen off the startup path; see /ready
+    from app.utils.blockchain import start_warm_up
+    start_warm_up()
+    from app.utils.indexer import indexer
+    if indexer is not None:
+        indexer.start()
+    from app.utils.content_cache import content_cache
+    content_cache.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Vault Blockchain API shutting down...")
+    from app.utils.chain_client import chain_client
+    chain_client.shutdown()
+    from app.utils.offload import cpu_pool
+    cpu_pool.shutdown()
+    from app.utils.tx_manager import tx_manager
+    tx_manager.stop()
+    from app.utils.indexer import indexer
+    if indexer is not None:
+        indexer.stop()
+    from app.utils.content_cache import content_cache
+    content_cache.stop()
 
  
\ No newline at end of file
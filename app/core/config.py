@@ -16,8 +16,25 @@ class Settings:
     ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY", Fernet.generate_key())
     SECRET_KEY = os.getenv("SECRET_KEY", "vault-secret-key-change-in-production")
     
+    # CPU pool (hashing and encryption of large payloads)
+    CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", os.cpu_count() or 1))  # Processes that hash/encrypt/decrypt large payloads; 0 = always inline
+    CPU_POOL_INLINE_BELOW = int(os.getenv("CPU_POOL_INLINE_BELOW", 1024 * 1024))  # Smaller inputs run in the calling thread
+    CPU_POOL_TIMEOUT = float(os.getenv("CPU_POOL_TIMEOUT", 120))  # Seconds to wait for an offloaded job
+
     # File Upload
     MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 50 * 1024 * 1024))  # 50MB default
+    ENCRYPTION_CHUNK_SIZE = int(os.getenv("ENCRYPTION_CHUNK_SIZE", 64 * 1024))  # Plaintext bytes per AES-GCM chunk of stored files
+    DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")  # Skip re-uploading known content
+    DEDUP_DB_PATH = os.getenv("DEDUP_DB_PATH", "./vault_pins.sqlite3")  # Locally computed CID -> pinned CID of everything pinned
+    IPFS_HEDGE_DELAY = float(os.getenv("IPFS_HEDGE_DELAY", 2))  # Seconds before the next pinning provider joins; 0 = all at once
+    IPFS_HEDGE_POLICY = os.getenv("IPFS_HEDGE_POLICY", "cancel")  # cancel | complete (let losing uploads finish)
+    IPFS_UPLOAD_WORKERS = int(os.getenv("IPFS_UPLOAD_WORKERS", 16))  # Concurrent provider uploads
+    IPFS_GATEWAY_URL = os.getenv("IPFS_GATEWAY_URL", "https://gateway.pinata.cloud/ipfs/")  # Where downloads not in the content cache are fetched from
+    CONTENT_CACHE_DIR = os.getenv("CONTENT_CACHE_DIR", "./uploads/ipfs")  # Local copies of IPFS content, by CID
+    CONTENT_CACHE_DB_PATH = os.getenv("CONTENT_CACHE_DB_PATH", "./vault_content.sqlite3")  # CID -> size, last access of everything cached
+    CONTENT_CACHE_MAX_BYTES = int(os.getenv("CONTENT_CACHE_MAX_BYTES", 10 * 1024 ** 3))  # Least recently used content is evicted above this
+    CONTENT_CACHE_JANITOR_INTERVAL = float(os.getenv("CONTENT_CACHE_JANITOR_INTERVAL", 30))  # Seconds between janitor passes
+    CONTENT_CACHE_JANITOR_BATCH = int(os.getenv("CONTENT_CACHE_JANITOR_BATCH", 500))  # Index entries checked against the disk per pass
     ALLOWED_EXTENSIONS = [
         '.pdf', '.doc', '.docx', '.txt', '.jpg', '.jpeg', 
         '.png', '.gif', '.xlsx', '.xls', '.ppt', '.pptx',
@@ -35,6 +52,67 @@ class Settings:
     # Blockchain
     GENESIS_HASH = "0" * 64
     
+    # Chain client
+    CHAIN_MAX_WORKERS = int(os.getenv("CHAIN_MAX_WORKERS", 64))  # Max concurrent blocking RPC calls per worker
+    CHAIN_CALL_TIMEOUT = float(os.getenv("CHAIN_CALL_TIMEOUT", 30))  # Seconds per read/send call
+    CHAIN_RECEIPT_TIMEOUT = float(os.getenv("CHAIN_RECEIPT_TIMEOUT", 120))  # Seconds to wait for a receipt
+    RPC_REQUEST_TIMEOUT = float(os.getenv("RPC_REQUEST_TIMEOUT", 10))  # HTTP timeout of a single JSON-RPC request
+    NONCE_GAP_GRACE = float(os.getenv("NONCE_GAP_GRACE", 30))  # Seconds a nonce must be missing on the node before it is reissued
+    NONCE_BROADCAST_TTL = float(os.getenv("NONCE_BROADCAST_TTL", 300))  # Seconds a sent nonce is assumed pending though the node does not count it
+    NONCE_RESYNC_INTERVAL = float(os.getenv("NONCE_RESYNC_INTERVAL", 30))  # Seconds between pending-count reads when allocating
+
+    # Outbound HTTP (RPC node, Pinata, Infura)
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 32))  # Keep-alive connections per upstream
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))  # Seconds to establish a connection
+    HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 120))  # Seconds of upstream silence (IPFS uploads)
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))  # Consecutive failures that open a circuit
+    BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", 30))  # Seconds an open circuit fails fast
+
+    READ_BATCH_MAX = int(os.getenv("READ_BATCH_MAX", 200))  # Max eth_calls per JSON-RPC batch / bulk read request
+    PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", 100))  # Records per page when a paged listing has no limit
+    PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", 500))  # Largest allowed limit on paged listings
+    VERIFY_MEMO_MAX_ENTRIES = int(os.getenv("VERIFY_MEMO_MAX_ENTRIES", 10000))  # Verified history heads remembered for incremental re-verification
+
+    WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", 500))  # Max items per bulk create/access/share request
+    PREFLIGHT_ENABLED = os.getenv("PREFLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")  # eth_call every write before sending it
+    PREFLIGHT_REVERT_TTL = float(os.getenv("PREFLIGHT_REVERT_TTL", 5))  # Seconds a simulated revert is remembered
+
+    # Gas and fees
+    FEE_URGENCY_CREATE = os.getenv("FEE_URGENCY_CREATE", "standard")  # slow / standard / fast
+    FEE_URGENCY_SHARE = os.getenv("FEE_URGENCY_SHARE", "standard")
+    FEE_URGENCY_ACCESS = os.getenv("FEE_URGENCY_ACCESS", "slow")
+    FEE_HISTORY_BLOCKS = int(os.getenv("FEE_HISTORY_BLOCKS", 20))  # eth_feeHistory window
+    FEE_REFRESH_INTERVAL = float(os.getenv("FEE_REFRESH_INTERVAL", 5))  # Seconds between fee history reads
+    FEE_MIN_PRIORITY_GWEI = float(os.getenv("FEE_MIN_PRIORITY_GWEI", 0.001))  # Tip floor
+    FEE_MAX_GWEI = float(os.getenv("FEE_MAX_GWEI", 200))  # Hard cap on maxFeePerGas / gasPrice
+    GAS_ESTIMATE_REFRESH = float(os.getenv("GAS_ESTIMATE_REFRESH", 600))  # Seconds a per-function estimate is reused
+    GAS_MARGIN_PERCENT = int(os.getenv("GAS_MARGIN_PERCENT", 25))  # Headroom on top of estimates
+    DEFAULT_GAS_LIMIT = int(os.getenv("DEFAULT_GAS_LIMIT", 500000))  # Used when no estimate is available
+
+    # Async transaction jobs (?wait=false on write endpoints)
+    TX_POLL_INTERVAL = float(os.getenv("TX_POLL_INTERVAL", 2))  # Seconds between receipt polls
+    TX_POLL_BATCH = int(os.getenv("TX_POLL_BATCH", 100))  # Receipts fetched per JSON-RPC batch
+    TX_STUCK_AFTER = float(os.getenv("TX_STUCK_AFTER", 60))  # Seconds without receipt before re-broadcast
+    TX_FEE_BUMP_PERCENT = int(os.getenv("TX_FEE_BUMP_PERCENT", 15))  # Nodes require >= 10% to replace
+    TX_MAX_REBROADCASTS = int(os.getenv("TX_MAX_REBROADCASTS", 5))
+    TX_JOB_TTL = float(os.getenv("TX_JOB_TTL", 3600))  # Seconds finished jobs stay queryable
+
+    # Read-through cache for getDocument / getDocumentHistory / getUserDocuments
+    READ_CACHE_MAX_ENTRIES = int(os.getenv("READ_CACHE_MAX_ENTRIES", 4096))  # 0 disables the cache
+    READ_CACHE_TTL = float(os.getenv("READ_CACHE_TTL", 30))  # Seconds; 0 = until invalidated
+    READ_CACHE_HEAD_POLL_INTERVAL = float(os.getenv("READ_CACHE_HEAD_POLL_INTERVAL", 1))  # Seconds between head checks
+    READ_CACHE_MAX_HEAD_GAP = int(os.getenv("READ_CACHE_MAX_HEAD_GAP", 500))  # Clear all instead of scanning more blocks
+    OWNER_INDEX_DB_PATH = os.getenv("OWNER_INDEX_DB_PATH", "")  # Persist the owner -> titles index here; empty = memory only
+
+    # Event indexer (serves /blocks/* reads from a local SQLite copy of contract events)
+    INDEXER_ENABLED = os.getenv("INDEXER_ENABLED", "false").lower() in ("1", "true", "yes")
+    INDEXER_DB_PATH = os.getenv("INDEXER_DB_PATH", "./vault_index.sqlite3")
+    INDEXER_START_BLOCK = os.getenv("INDEXER_START_BLOCK")  # Contract deployment block; required to enable the index
+    INDEXER_CONFIRMATIONS = int(os.getenv("INDEXER_CONFIRMATIONS", 5))  # Blocks behind head considered final
+    INDEXER_POLL_INTERVAL = float(os.getenv("INDEXER_POLL_INTERVAL", 2))  # Seconds between polls
+    INDEXER_BATCH_BLOCKS = int(os.getenv("INDEXER_BATCH_BLOCKS", 2000))  # Max block range per eth_getLogs
+    INDEXER_MAX_LAG = int(os.getenv("INDEXER_MAX_LAG", 20))  # Fall back to live reads when further behind than this
+
     # Directories
     TEMP_DIR = os.getenv("TEMP_DIR", "./temp")
     UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
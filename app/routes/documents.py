@@ -1,89 +1,118 @@
+import json
+import mimetypes
 import os
-from fastapi import APIRouter, HTTPException, File, UploadFile, Form
-from fastapi.responses import FileResponse
-from app.schemas import DocumentBlockRequest, ShareDocumentRequest, AccessActionRequest, DocumentResponse
+import time
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from app.schemas import DocumentBlockRequest, ShareDocumentRequest, AccessActionRequest, DocumentResponse, BulkDocumentsRequest
+from app.core.config import settings
 from app.models.models import APIResponse
-from app.utils.blockchain import upload_to_pinata, w3, contract, create_document_on_chain, access_document_on_chain, share_document_on_chain, get_document_on_chain, get_user_documents_on_chain, get_document_history_on_chain
-from app.utils.utils import get_file_info, create_block_metadata
+from fastapi.concurrency import run_in_threadpool
+from app.utils.blockchain import upload_file, ipfs_uploader, encode_bytes32, revert_code, ContractRevert, PartialSendError, check_create_document, create_document_on_chain, access_document_on_chain, share_document_on_chain, get_document_on_chain, get_user_documents_on_chain, get_document_history_on_chain, get_document_history_page_on_chain, get_user_documents_page_on_chain, get_documents_on_chain, get_owner_titles_and_document_on_chain, get_owner_titles_and_history_on_chain, read_cache, fee_oracle, submit_create_document, submit_access_document, submit_share_document, submit_create_documents, submit_access_documents, submit_share_documents, wait_for_receipts, receipt_summary, receipt_records, previous_hash_in_receipt
+from app.utils.chain_client import chain_client
+from app.utils.tx_manager import tx_manager
+from app.utils.indexer import indexer
+from app.utils.ipfs import cid_to_digest
+from app.utils.content_cache import content_cache
+from app.utils.signing import signing_configured, verify_download
+from app.utils.dedup import dedup_uploader
+from app.utils.uploads import receive_upload
+from app.utils.ownership import owner_index
+from app.utils.offload import cpu_pool
+from app.utils.transport import upstream_status
+from app.utils.verifier import history_verifier, verify_documents
+from app.utils.utils import ZERO_HASH, get_file_info, create_block_metadata
 from typing import List, Optional
-from eth_utils import keccak
-from web3.exceptions import ContractLogicError
-
-ACTION_ENUM = [
-    "Created", "Shared", "Viewed", "Downloaded", "Shared_view", "Shared_download"
-]
 
 PERMISSION_ENUM = ["View", "Download"]
 
-def compute_block_hash(block):
-    # Solidity's abi.encode order for ActionRecord (no ipfsHash)
-    concat = (
-        str(block["DocTitle"]) +
-        str(block["Owner"]) +
-        str(block["LastAccessDate"]) +
-        str(block["LastAccessedBy"]) +
-        str(block["action"]) +
-        str(block["SharedUser"]) +
-        str(block["SharedEndDate"]) +
-        str(block.get("timestamp") or block.get("TimeStamp")) +
-        str(block["previousHash"])
+def _blocks_response(message: str, blocks: list, **data) -> Response:
+    """
+    APIResponse body for a block listing, with each ActionBlock's JSON spliced in directly
+    rather than built as dicts and validated by Pydantic; `data` holds the other data keys.
+    """
+    extra = "".join(f",{json.dumps(k)}:{json.dumps(v, ensure_ascii=False, separators=(',', ':'))}" for k, v in data.items())
+    body = (
+        f'{{"success":true,"message":{json.dumps(message, ensure_ascii=False)},'
+        f'"data":{{"blocks":[{",".join(b.to_json() for b in blocks)}]{extra}}}}}'
     )
-    return "0x" + keccak(text=concat).hex()
-
-def _to_str(value):
-    return "" if value is None else str(value)
+    return Response(content=body, media_type="application/json")
 
-def _to_int(value):
+def _parse_owner(owner: str) -> int:
     try:
-        if value is None or value == "":
-            return 0
-        return int(value)
-    except Exception:
-        return 0
+        return int(owner)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Owner must be an integer")
+
+def _index_serving() -> bool:
+    return indexer is not None and indexer.is_serving()
+
+def _job_submitted(job) -> JSONResponse:
+    return JSONResponse(
+        status_code=202,
+        content=APIResponse(success=True, message="Transaction submitted; poll /jobs/{jobId} for status", data=job.to_dict()).model_dump(),
+    )
+
+async def _block_from_receipts(receipts: list, doc_title: str) -> dict:
+    """Standardised block for the last record written by `receipts`, decoded from their events.
+    previousHash is rebuilt from the chain as it stood when that record was written."""
+    records = [r for receipt in receipts for r in receipt_records(receipt)]
+    if len(records) < len(receipts):
+        raise HTTPException(status_code=400, detail="Blockchain transaction reverted.")
+    block = records[-1]
+    block.previousHash = await chain_client.call(previous_hash_in_receipt, receipts[-1], doc_title)
+    return block.to_dict()
+
+def _placeholder_ipfs(request: DocumentBlockRequest) -> str:
+    # Internal placeholder ipfsHash for documents created without an upload (API does not supply one)
+    from eth_utils import keccak
+    return keccak(text=f"{request.DocTitle}|{request.Owner}|{request.LastAccessDate}").hex()[2:34]
+
+def _check_batch(requests: list) -> None:
+    if not requests:
+        raise HTTPException(status_code=400, detail="Batch must not be empty")
+    if len(requests) > settings.WRITE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {settings.WRITE_BATCH_MAX} items per batch")
 
-def _action_to_str(action_value):
+async def _batch_response(kind: str, requests: list, submit, items: list, wait: bool):
+    """Submit a pipelined batch, then either track it as one job or await all receipts together."""
     try:
-        if isinstance(action_value, int):
-            return ACTION_ENUM[action_value] if 0 <= action_value < len(ACTION_ENUM) else str(action_value)
-        return str(action_value)
-    except Exception:
-        return ""
-
-def _standardize_block(raw: dict) -> dict:
-    # Normalize fields; keep numeric types as ints for Swagger correctness
-    action = raw.get("action")
-    owner = raw.get("Owner")
-    shared_user = raw.get("SharedUser")
-    last_accessed_by = raw.get("LastAccessedBy")
-    # For Created, LastAccessedBy is owner
-    if (isinstance(action, int) and action == 0) or (action == "Created"):
-        last_accessed_by = owner
-    # For Shared actions, LastAccessedBy is shared_user
-    elif (isinstance(action, int) and action in [1, 4, 5]) or (action in ["Shared", "Shared_view", "Shared_download"]):
-        last_accessed_by = shared_user
-    # For Viewed/Downloaded, use contract value (do not override)
-    # If contract value is empty, fallback to owner
-    if (isinstance(action, int) and action in [2, 3]) or (action in ["Viewed", "Downloaded"]):
-        if not last_accessed_by:
-            last_accessed_by = owner
-    prev_hash = raw.get("previousHash")
-    if isinstance(prev_hash, bytes):
-        prev_hash = prev_hash.hex()
-    sanitized = {
-        "DocTitle": _to_str(raw.get("DocTitle")),
-        "Owner": _to_str(owner),
-        "LastAccessDate": _to_int(raw.get("LastAccessDate")),
-        "LastAccessedBy": _to_str(last_accessed_by),
-        "action": _action_to_str(action),
-        "SharedUser": _to_str(shared_user),
-        "SharedEndDate": _to_int(raw.get("SharedEndDate")),
-        "TimeStamp": _to_int(raw.get("TimeStamp")),
-        "previousHash": _to_str(prev_hash),
-    }
-    compute_input = dict(sanitized)
-    compute_input["timestamp"] = _to_str(raw.get("timestamp"))
-    sanitized["blockHash"] = _to_str(compute_block_hash(compute_input))
-    return sanitized
+        sent = await chain_client.transact(submit, items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Blockchain error: {e}")
+    tx_hashes = [tx_hash for item in sent if not isinstance(item, Exception) for tx_hash, _ in item]
+    if not wait:
+        ok = [pair for item in sent if not isinstance(item, Exception) for pair in item]
+        job = tx_manager.track(kind, ok, count=len(requests)) if ok else None
+    receipts = iter(await chain_client.transact(wait_for_receipts, tx_hashes) if wait else [])
+    results = []
+    for i, (request, item) in enumerate(zip(requests, sent)):
+        result = {"index": i, "DocTitle": request.DocTitle, "Owner": str(request.Owner)}
+        if isinstance(item, ContractRevert):
+            result.update(status="failed", error=item.reason, code=item.code)
+        elif isinstance(item, Exception):
+            result.update(status="failed", error=str(item))
+        elif not wait:
+            result.update(status="pending", txHashes=["0x" + bytes(h).hex() for h, _ in item])
+        else:
+            summaries = []
+            for _ in item:
+                receipt = next(receipts)
+                summaries.append({"status": "failed", "error": str(receipt)} if isinstance(receipt, Exception) else receipt_summary(receipt))
+            statuses = {x["status"] for x in summaries}
+            result.update(
+                status=next((st for st in ("failed", "reverted") if st in statuses), "confirmed"),
+                transactions=summaries,
+            )
+        results.append(result)
+    data = {"results": results}
+    if not wait:
+        data["jobId"] = job.id if job else None
+        return JSONResponse(status_code=202, content=APIResponse(success=True, message=f"{len(tx_hashes)} transactions submitted", data=data).model_dump())
+    confirmed = sum(1 for r in results if r["status"] == "confirmed")
+    return APIResponse(success=confirmed == len(results), message=f"{confirmed} of {len(results)} items confirmed", data=data)
 
 router = APIRouter()
 
@@ -91,92 +120,166 @@ router = APIRouter()
 
 from app.schemas import DocumentBlockRequest
 
-@router.post("/create_block", response_model=APIResponse)
-async def create_document_block(request: DocumentBlockRequest):
-    import asyncio
-    # Pre-check if document already exists (handles cross-owner duplication as contract uses title key)
+# HTTP status per contract revert code; anything else is a 400
+_REVERT_STATUS = {"DOCUMENT_NOT_FOUND": 404, "OWNER_MISMATCH": 403}
+
+def _revert_error(e: ContractRevert) -> HTTPException:
+    return HTTPException(status_code=_REVERT_STATUS.get(e.code, 400), detail={"code": e.code, "message": e.reason})
+
+async def _ensure_title_available(doc_title: str, owner: int, last_access_date: int) -> None:
+    # Simulate createDocument (placeholder ipfsHash) so a taken title is rejected before the file is pinned
     try:
-        exists = False
-        try:
-            # Use wrapper that encodes bytes32
-            get_document_on_chain(request.DocTitle, request.Owner)
-            exists = True  # found for same owner
-        except Exception as e:
-            msg = str(e)
-            # Treat contract revert/no data as 'not found', not 500
-            if "Document does not exist" in msg or "execution reverted" in msg or "no data" in msg:
-                exists = False
-            elif "Owner does not match" in msg:
-                raise HTTPException(status_code=400, detail="DocTitle is already used by another owner. Choose a different title.")
-            else:
-                raise
-        if exists:
-            raise HTTPException(status_code=400, detail="Document with this title already exists for this owner.")
-    except HTTPException:
-        raise
-    except Exception as e:
-        msg = str(e)
-        # Treat contract revert/no data as 'not found', not 500
-        if "execution reverted" in msg or "no data" in msg:
-            pass  # Document does not exist, so allow creation
-        else:
-            raise HTTPException(status_code=500, detail=f"Error checking document existence: {e}")
+        await chain_client.call(check_create_document, doc_title, owner, last_access_date, "pending-upload")
+    except ContractRevert as e:
+        raise _revert_error(e)
 
+@router.post("/create_block", response_model=APIResponse)
+async def create_document_block(request: DocumentBlockRequest, wait: bool = True):
     try:
         # Create document block on blockchain; generate internal placeholder ipfsHash (API does not supply)
-        placeholder_ipfs = keccak(text=f"{request.DocTitle}|{request.Owner}|{request.LastAccessDate}").hex()[2:34]
-        receipt = create_document_on_chain(request.DocTitle, int(request.Owner), request.LastAccessDate, placeholder_ipfs)
-        if receipt.get("status", 1) == 0:
-            raise HTTPException(status_code=400, detail="Blockchain transaction reverted. Title may already exist.")
+        placeholder_ipfs = _placeholder_ipfs(request)
+        if not wait:
+            sent = await chain_client.call(submit_create_document, request.DocTitle, int(request.Owner), request.LastAccessDate, placeholder_ipfs)
+            return _job_submitted(tx_manager.track("create", sent, DocTitle=request.DocTitle, Owner=str(request.Owner)))
+        receipt = await chain_client.transact(create_document_on_chain, request.DocTitle, int(request.Owner), request.LastAccessDate, placeholder_ipfs)
+    except ContractRevert as e:
+        raise _revert_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        msg = str(e)
-        # If contract revert is for duplicate, return 400
-        if "Document already exists" in msg or "Owner does not match" in msg or "reverted" in msg:
-            raise HTTPException(status_code=400, detail=f"Document already exists for this owner or title is not unique: {msg}")
-        raise HTTPException(status_code=500, detail=f"Blockchain error: {msg}")
-
-    # Retry fetching document/history for up to 5 seconds
-    import asyncio
-    for _ in range(10):
+        raise HTTPException(status_code=500, detail=f"Blockchain error: {e}")
+    if receipt.get("status", 1) == 0:
+        raise HTTPException(status_code=400, detail="Blockchain transaction reverted.")
+
+    # The DocumentCreated event in the receipt carries the whole record; a new record has no predecessor
+    records = receipt_records(receipt)
+    if not records:
+        raise HTTPException(status_code=500, detail="Transaction confirmed but emitted no DocumentCreated event")
+    latest_block = records[-1]
+    latest_block.previousHash = ZERO_HASH
+    return APIResponse(
+        success=True,
+        message="Document block created on blockchain",
+        data=latest_block.to_dict(),
+    )
+
+
+# The form is parsed by receive_upload, which hashes the file as it arrives; this documents it
+_UPLOAD_FORM = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object",
+    "required": ["file", "DocTitle", "Owner", "LastAccessDate"],
+    "properties": {
+        "file": {"type": "string", "format": "binary"},
+        "DocTitle": {"type": "string"},
+        "Owner": {"type": "integer"},
+        "LastAccessDate": {"type": "integer"},
+    },
+}}}}}
+
+@router.post("/upload_document", response_model=APIResponse, openapi_extra=_UPLOAD_FORM)
+async def upload_document(request: Request, wait: bool = True):
+    """Stream the file to IPFS and create the document with the real CID. The file is hashed
+    while it is received, so content that was pinned before is not read or uploaded again.
+    """
+    try:
+        upload = await receive_upload(request, "file", settings.MAX_FILE_SIZE)
+    except ValueError as e:
+        raise HTTPException(status_code=413 if "limit" in str(e) else 400, detail=str(e))
+    try:
         try:
-            latest_doc = get_document_on_chain(request.DocTitle, request.Owner)
-            history = get_document_history_on_chain(request.DocTitle, request.Owner)
-            action_str = ACTION_ENUM[latest_doc["action"]] if isinstance(latest_doc["action"], int) and latest_doc["action"] < len(ACTION_ENUM) else str(latest_doc["action"])
-            latest_block = dict(latest_doc)
-            latest_block["action"] = action_str
-            latest_block["timestamp"] = history[0]["timestamp"] if history else None
-            latest_block["previousHash"] = history[0].get("previousHash") if history else None
-            return APIResponse(
-                success=True,
-                message="Document block created on blockchain",
-                data=_standardize_block(latest_block),
-            )
+            DocTitle = upload.fields["DocTitle"]
+            Owner = int(upload.fields["Owner"])
+            LastAccessDate = int(upload.fields["LastAccessDate"])
+            encode_bytes32(DocTitle)
+        except KeyError as e:
+            raise HTTPException(status_code=400, detail=f"Missing form field {e}")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        await _ensure_title_available(DocTitle, Owner, LastAccessDate)
+
+        filename = upload.filename or DocTitle
+        try:
+            if dedup_uploader is None:
+                cid, deduplicated = await run_in_threadpool(upload_file, upload.file, filename), False
+            else:
+                cid, deduplicated = await run_in_threadpool(
+                    dedup_uploader.upload, upload.file, filename, upload.cid, upload.sha256, upload.size
+                )
         except Exception as e:
-            await asyncio.sleep(0.5)
-    raise HTTPException(status_code=202, detail="Document creation transaction sent; data will be readable shortly. Try again in a few seconds.")
+            raise HTTPException(status_code=502, detail=f"IPFS upload failed: {e}")
+    finally:
+        upload.close()
+    if not cid:
+        raise HTTPException(status_code=502, detail="IPFS upload returned no CID")
+    data = {
+        "DocTitle": DocTitle,
+        "Owner": str(Owner),
+        "filename": upload.filename,
+        "size": upload.size,
+        "sha256": upload.sha256,
+        "ipfsHash": cid,
+        "deduplicated": deduplicated,
+    }
 
+    try:
+        if not wait:
+            sent = await chain_client.call(submit_create_document, DocTitle, Owner, LastAccessDate, cid)
+            job = tx_manager.track("create", sent, DocTitle=DocTitle, Owner=str(Owner), ipfsHash=cid)
+            return JSONResponse(
+                status_code=202,
+                content=APIResponse(success=True, message="File uploaded; transaction submitted", data={**data, **job.to_dict()}).model_dump(),
+            )
+        receipt = await chain_client.transact(create_document_on_chain, DocTitle, Owner, LastAccessDate, cid)
+    except ContractRevert as e:
+        error = _revert_error(e)
+        error.detail["ipfsHash"] = cid
+        raise error
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e} (file is pinned as {cid})")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Blockchain error: {e} (file is pinned as {cid})")
+    data["transaction"] = receipt_summary(receipt)
+    if data["transaction"]["status"] != "confirmed":
+        raise HTTPException(status_code=400, detail=f"Blockchain transaction reverted (file is pinned as {cid})")
+    return APIResponse(success=True, message="File uploaded and document block created on blockchain", data=data)
 
 @router.post("/access_document", response_model=APIResponse)
-async def access_document(request: AccessActionRequest):
+async def access_document(request: AccessActionRequest, wait: bool = True):
     try:
-        receipt = access_document_on_chain(request.DocTitle, int(request.Owner), request.action, request.LastAccessDate)
-        d = get_document_on_chain(request.DocTitle, int(request.Owner))
-        action_str = ACTION_ENUM[d["action"]] if isinstance(d["action"], int) and d["action"] < len(ACTION_ENUM) else str(d["action"])
-        block = dict(d)
-        block["action"] = action_str
-        block["blockHash"] = compute_block_hash(block)
+        if not wait:
+            sent = await chain_client.call(submit_access_document, request.DocTitle, int(request.Owner), request.action, request.LastAccessDate)
+            return _job_submitted(tx_manager.track("access", sent, DocTitle=request.DocTitle, Owner=str(request.Owner)))
+        receipt = await chain_client.transact(access_document_on_chain, request.DocTitle, int(request.Owner), request.action, request.LastAccessDate)
         return APIResponse(
             success=True,
             message="Document accessed",
-            data=_standardize_block(block),
+            data=await _block_from_receipts([receipt], request.DocTitle),
         )
+    except HTTPException:
+        raise
+    except ContractRevert as e:
+        raise _revert_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/share_document", response_model=APIResponse)
-async def share_document(request: ShareDocumentRequest):
+async def share_document(request: ShareDocumentRequest, wait: bool = True):
     try:
-        receipt = share_document_on_chain(
+        if not wait:
+            sent = await chain_client.call(
+                submit_share_document,
+                request.DocTitle,
+                int(request.Owner),
+                request.SharedUser,
+                request.permissions,
+                request.SharedEndDate,
+                request.LastAccessDate
+            )
+            return _job_submitted(tx_manager.track("share", sent, DocTitle=request.DocTitle, Owner=str(request.Owner)))
+        receipt = await chain_client.transact(
+            share_document_on_chain,
             request.DocTitle,
             int(request.Owner),
             request.SharedUser,
@@ -184,128 +287,420 @@ async def share_document(request: ShareDocumentRequest):
             request.SharedEndDate,
             request.LastAccessDate
         )
-        d = get_document_on_chain(request.DocTitle, int(request.Owner))
-        action_str = ACTION_ENUM[d["action"]] if isinstance(d["action"], int) and d["action"] < len(ACTION_ENUM) else str(d["action"])
-        block = dict(d)
-        block["action"] = action_str
-        block["blockHash"] = compute_block_hash(block)
+        receipts = receipt if isinstance(receipt, list) else [receipt]
         return APIResponse(
             success=True,
             message="Document shared",
-            data=_standardize_block(block),
+            data=await _block_from_receipts(receipts, request.DocTitle),
         )
+    except HTTPException:
+        raise
+    except PartialSendError as e:
+        # Half of a 'both' share went out; the caller needs its hash to track or retry the rest
+        raise HTTPException(status_code=502, detail={
+            "message": f"Share only partly sent: {e.error}",
+            "txHashes": ["0x" + bytes(tx_hash).hex() for tx_hash, _ in e.sent],
+        })
+    except ContractRevert as e:
+        raise _revert_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/create_blocks", response_model=APIResponse)
+async def create_document_blocks(requests: List[DocumentBlockRequest], wait: bool = True):
+    _check_batch(requests)
+    titles = [r.DocTitle for r in requests]
+    if len(set(titles)) != len(titles):
+        raise HTTPException(status_code=400, detail="DocTitle values must be unique within a batch")
+    items = [(r.DocTitle, int(r.Owner), r.LastAccessDate, _placeholder_ipfs(r)) for r in requests]
+    return await _batch_response("create_batch", requests, submit_create_documents, items, wait)
+
+@router.post("/access_documents", response_model=APIResponse)
+async def access_documents(requests: List[AccessActionRequest], wait: bool = True):
+    _check_batch(requests)
+    items = [(r.DocTitle, int(r.Owner), r.action, r.LastAccessDate) for r in requests]
+    return await _batch_response("access_batch", requests, submit_access_documents, items, wait)
+
+@router.post("/share_documents", response_model=APIResponse)
+async def share_documents(requests: List[ShareDocumentRequest], wait: bool = True):
+    _check_batch(requests)
+    items = [(r.DocTitle, int(r.Owner), r.SharedUser, r.permissions, r.SharedEndDate, r.LastAccessDate) for r in requests]
+    return await _batch_response("share_batch", requests, submit_share_documents, items, wait)
+
+@router.get("/jobs/{job_id}", response_model=APIResponse)
+async def get_job_status(job_id: str):
+    job = tx_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id")
+    data = job.to_dict()
+    return APIResponse(success=True, message=f"Transaction job is {data['status']}", data=data)
+
+@router.get("/cache/stats", response_model=APIResponse)
+async def get_cache_stats():
+    return APIResponse(success=True, message="Read cache statistics", data={**read_cache.stats(), "ownerIndex": owner_index.stats()})
+
+@router.get("/uploads/stats", response_model=APIResponse)
+async def get_upload_stats():
+    data = {
+        "dedup": dedup_uploader.stats() if dedup_uploader is not None else None,
+        "pinning": ipfs_uploader.stats(),
+        "contentCache": content_cache.stats(),
+    }
+    return APIResponse(success=True, message="Upload statistics", data=data)
+
+@router.get("/cpu/stats", response_model=APIResponse)
+async def get_cpu_pool_stats():
+    return APIResponse(success=True, message="CPU pool statistics", data=cpu_pool.stats())
+
+@router.get("/upstreams", response_model=APIResponse)
+async def get_upstream_status():
+    return APIResponse(success=True, message="Upstream circuit breakers", data=upstream_status())
+
+@router.get("/fees", response_model=APIResponse)
+async def get_fee_stats():
+    return APIResponse(success=True, message="Gas and fee oracle state", data=fee_oracle.stats())
+
 # New GET endpoint: Get all blocks for an owner
 @router.get("/blocks/owner/{owner}", response_model=APIResponse)
-async def get_blocks_by_owner(owner: str):
+async def get_blocks_by_owner(request: Request, owner: str, limit: Optional[int] = None, cursor: Optional[str] = None, stream: bool = False):
+    owner_id = _parse_owner(owner)
+    # ?stream=1 or Accept: application/x-ndjson streams every block (from cursor on), `limit` per chain read
+    if _wants_stream(request, stream):
+        return await _get_blocks_by_owner_page(owner_id, settings.PAGE_MAX_LIMIT if limit is None else limit, cursor, stream=True)
+    if limit is not None or cursor is not None:
+        return await _get_blocks_by_owner_page(owner_id, limit, cursor)
     try:
-        docs = get_user_documents_on_chain(int(owner))
-        blocks = []
-        for d in docs:
-            action_str = ACTION_ENUM[d["action"]] if isinstance(d["action"], int) and d["action"] < len(ACTION_ENUM) else str(d["action"])
-            block = dict(d)
-            block["action"] = action_str
-            # Ensure previousHash is always present, set to None or empty string if missing
-            if "previousHash" not in block or block["previousHash"] is None:
-                block["previousHash"] = ""
-            block["blockHash"] = compute_block_hash(block)
-            blocks.append(_standardize_block(block))
-        if blocks:
-            return APIResponse(success=True, message="Blocks for this owner fetched from blockchain.", data={"blocks": blocks})
+        indexed_block = None
+        if _index_serving():
+            docs = await run_in_threadpool(indexer.get_user_documents, owner_id)
+            indexed_block = indexer.indexed_block
+        else:
+            docs = await chain_client.call(get_user_documents_on_chain, owner_id)
+        if docs:
+            return _blocks_response("Blocks for this owner fetched from blockchain.", docs, indexedBlock=indexed_block)
         else:
             raise HTTPException(status_code=404, detail="No blocks found for this owner.")
+    except HTTPException:
+        raise
     except Exception as e:
         msg = str(e)
-        # If error is only about previousHash, ignore and return blocks
-        if "previousHash" in msg:
-            # Try to fetch blocks again, ignoring previousHash
-            try:
-                docs = get_user_documents_on_chain(int(owner))
-                blocks = []
-                for d in docs:
-                    action_str = ACTION_ENUM[d["action"]] if isinstance(d["action"], int) and d["action"] < len(ACTION_ENUM) else str(d["action"])
-                    block = dict(d)
-                    block["action"] = action_str
-                    block["previousHash"] = ""
-                    block["blockHash"] = compute_block_hash(block)
-                    blocks.append(_standardize_block(block))
-                if blocks:
-                    return APIResponse(success=True, message="Blocks for this owner fetched from blockchain.", data={"blocks": blocks})
-            except Exception:
-                pass
         if "invalid" in msg or "not found" in msg or "does not exist" in msg:
             raise HTTPException(status_code=404, detail=f"Owner not found or invalid: {msg}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch blocks for owner: {msg}")
 
 # New GET endpoint: Get all blocks (history) for a document
 @router.get("/blocks/document/{doctitle}/owner/{owner}", response_model=APIResponse)
-async def get_document_blocks_history(doctitle: str, owner: str):
+async def get_document_blocks_history(request: Request, doctitle: str, owner: str, limit: Optional[int] = None, cursor: Optional[str] = None, stream: bool = False):
+    owner_id = _parse_owner(owner)
+    # ?stream=1 or Accept: application/x-ndjson streams every block (from cursor on), `limit` per chain read
+    if _wants_stream(request, stream):
+        return await _get_document_blocks_history_page(doctitle, owner_id, settings.PAGE_MAX_LIMIT if limit is None else limit, cursor, stream=True)
+    if limit is not None or cursor is not None:
+        return await _get_document_blocks_history_page(doctitle, owner_id, limit, cursor)
     try:
-        # Pre-check existence to avoid revert and provide clearer error
-        try:
-            history = get_document_history_on_chain(doctitle, int(owner))
-        except Exception as e:
-            msg = str(e)
-            if "Document does not exist" in msg or "execution reverted" in msg or "no data" in msg:
-                raise HTTPException(status_code=404, detail="Document not found for this owner")
-            else:
+        history = None
+        indexed_block = None
+        if _index_serving():
+            try:
+                history = await run_in_threadpool(indexer.get_document_history, doctitle, owner_id)
+                indexed_block = indexer.indexed_block
+            except LookupError:
+                pass  # Not indexed (or not yet confirmed); read from chain
+        if history is None:
+            try:
+                if owner_index.contains(owner_id, doctitle):
+                    history = await chain_client.call(get_document_history_on_chain, doctitle, owner_id)
+                    owner_titles = None
+                else:
+                    # History and the owner's titles come back from one batched round-trip
+                    owner_titles, history = await chain_client.call(get_owner_titles_and_history_on_chain, doctitle, owner_id)
+                    owner_index.add_titles(owner_id, owner_titles)
+            except Exception as e:
+                if revert_code(e) is not None:
+                    raise HTTPException(status_code=404, detail="Document not found for this owner")
                 raise
-        try:
-            user_docs = get_user_documents_on_chain(owner)
-            owner_titles = [d.get("DocTitle") for d in user_docs]
-            if doctitle not in owner_titles:
+            if owner_titles is not None and doctitle not in owner_titles:
                 raise HTTPException(status_code=404, detail="Document not found for this owner")
-        except ContractLogicError as cle:
-            # If even listing fails, bubble up as 404
-            raise HTTPException(status_code=404, detail=str(cle))
-
-        blocks = []
-        for h in history:
-            action_str = ACTION_ENUM[h["action"]] if isinstance(h["action"], int) and h["action"] < len(ACTION_ENUM) else str(h["action"])
-            block = dict(h)
-            block["action"] = action_str
-            block["blockHash"] = compute_block_hash(block)
-            blocks.append(_standardize_block(block))
-        if blocks:
-            return APIResponse(success=True, message="Document history blocks fetched from blockchain.", data={"blocks": blocks})
+
+        if history:
+            return _blocks_response("Document history blocks fetched from blockchain.", history, indexedBlock=indexed_block)
         else:
             raise HTTPException(status_code=404, detail="No history found for this document title.")
-    except ContractLogicError as e:
+    except HTTPException:
+        raise
+    except Exception as e:
         # Map common revert reasons to 404
         msg = str(e)
-        if "Document does not exist" in msg or "Owner does not match" in msg:
+        if revert_code(e) in ("DOCUMENT_NOT_FOUND", "OWNER_MISMATCH"):
             raise HTTPException(status_code=404, detail=msg)
         raise HTTPException(status_code=500, detail=f"Failed to fetch document history: {msg}")
-    except HTTPException:
-        raise
+
+async def _owner_page(owner: int, offset: int, limit: int):
+    """(docs, next_offset, total, indexed_block) from the event index when it is serving, else the chain."""
+    if _index_serving():
+        return (*await run_in_threadpool(indexer.get_user_documents_page, owner, offset, limit), indexer.indexed_block)
+    return (*await chain_client.call(get_user_documents_page_on_chain, owner, offset, limit), None)
+
+async def _history_page(doctitle: str, owner: int, cursor: Optional[bytes], limit: int):
+    """(records, next_cursor, indexed_block) from the event index when it has the page, else the chain."""
+    if _index_serving():
+        try:
+            return (*await run_in_threadpool(indexer.get_document_history_page, doctitle, owner, cursor, limit), indexer.indexed_block)
+        except LookupError:
+            pass  # Not indexed (or not yet confirmed); read from chain
+    return (*await chain_client.call(get_document_history_page_on_chain, doctitle, owner, cursor, limit), None)
+
+def _wants_stream(request: Request, stream: bool) -> bool:
+    return stream or "application/x-ndjson" in request.headers.get("accept", "")
+
+def _stream_blocks(items: list, cursor, next_page, headers: Optional[dict] = None) -> StreamingResponse:
+    """
+    NDJSON response: one standardised block per line, fetched page by page through
+    next_page(cursor) so only one page is held at a time. A read that fails after the
+    first page ends the stream with an {"error": ...} line.
+    """
+    async def lines():
+        page, next_cursor = items, cursor
+        while True:
+            for item in page:
+                yield item.to_json() + "\n"
+            if next_cursor is None:
+                return
+            try:
+                page, next_cursor = (await next_page(next_cursor))[:2]
+            except Exception as e:
+                yield json.dumps({"error": str(e)}) + "\n"
+                return
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
+
+def _page_limit(limit: Optional[int]) -> int:
+    limit = settings.PAGE_DEFAULT_LIMIT if limit is None else limit
+    if not 1 <= limit <= settings.PAGE_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {settings.PAGE_MAX_LIMIT}")
+    return limit
+
+# Paged owner listing: the cursor is the index of the next title in the owner's document list
+async def _get_blocks_by_owner_page(owner: int, limit: Optional[int], cursor: Optional[str], stream: bool = False):
+    limit = _page_limit(limit)
+    try:
+        offset = int(cursor) if cursor else 0
+        if offset < 0:
+            raise ValueError
+    except ValueError:
+        raise HTTPException(status_code=400, detail="cursor must be the nextCursor of a previous page")
+    try:
+        docs, next_offset, total, indexed_block = await _owner_page(owner, offset, limit)
     except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch blocks for owner: {str(e)}")
+    if not docs and offset == 0:
+        raise HTTPException(status_code=404, detail="No blocks found for this owner.")
+    if stream:
+        return _stream_blocks(
+            docs, next_offset,
+            lambda cursor: _owner_page(owner, cursor, limit),
+            headers={"X-Total-Count": str(total)} if total is not None else None,
+        )
+    return _blocks_response(
+        f"{len(docs)} blocks for this owner fetched from blockchain.", docs,
+        nextCursor=None if next_offset is None else str(next_offset), total=total, indexedBlock=indexed_block,
+    )
+
+# Paged history, newest first: the cursor is the hash of the next (older) record to return
+async def _get_document_blocks_history_page(doctitle: str, owner: int, limit: Optional[int], cursor: Optional[str], stream: bool = False):
+    limit = _page_limit(limit)
+    try:
+        start = bytes.fromhex(cursor[2:] if cursor.startswith("0x") else cursor) if cursor else None
+        if start is not None and len(start) != 32:
+            raise ValueError
+    except ValueError:
+        raise HTTPException(status_code=400, detail="cursor must be the nextCursor of a previous page")
+    try:
+        records, next_cursor, indexed_block = await _history_page(doctitle, owner, start, limit)
+    except Exception as e:
+        code = revert_code(e)
+        if code == "INVALID_CURSOR":
+            raise HTTPException(status_code=400, detail="cursor does not belong to this document")
+        if code in ("DOCUMENT_NOT_FOUND", "OWNER_MISMATCH"):
+            raise HTTPException(status_code=404, detail="Document not found for this owner")
         raise HTTPException(status_code=500, detail=f"Failed to fetch document history: {str(e)}")
+    if stream:
+        return _stream_blocks(records, next_cursor, lambda cursor: _history_page(doctitle, owner, cursor, limit))
+    return _blocks_response(
+        f"{len(records)} document history blocks fetched from blockchain.", records,
+        nextCursor=None if next_cursor is None else "0x" + next_cursor.hex(), indexedBlock=indexed_block,
+    )
 
 # New GET endpoint: Get latest block for a document
 @router.get("/blocks/document/{doctitle}/owner/{owner}/latest", response_model=APIResponse)
 async def get_document_latest_block(doctitle: str, owner: str):
+    owner_id = _parse_owner(owner)
     try:
-        # Pre-check existence to avoid revert and provide clearer error
-        try:
-            user_docs = get_user_documents_on_chain(int(owner))
-            owner_titles = [d.get("DocTitle") for d in user_docs]
-            if doctitle not in owner_titles:
-                raise HTTPException(status_code=404, detail="Document not found for this owner")
-            d = get_document_on_chain(doctitle, int(owner))
-        except Exception as e:
-            msg = str(e)
-            if "Document does not exist" in msg or "execution reverted" in msg or "no data" in msg:
-                raise HTTPException(status_code=404, detail="Document not found for this owner")
-            else:
+        d = None
+        indexed_block = None
+        if _index_serving():
+            try:
+                d = await run_in_threadpool(indexer.get_document, doctitle, owner_id)
+                indexed_block = indexer.indexed_block
+            except LookupError:
+                pass  # Not indexed (or not yet confirmed); read from chain
+        if d is None:
+            # Pre-check existence to avoid revert and provide clearer error
+            try:
+                if owner_index.contains(owner_id, doctitle):
+                    d = await chain_client.call(get_document_on_chain, doctitle, owner_id)
+                else:
+                    owner_titles, d = await chain_client.call(get_owner_titles_and_document_on_chain, doctitle, owner_id)
+                    owner_index.add_titles(owner_id, owner_titles)
+                    if doctitle not in owner_titles:
+                        raise HTTPException(status_code=404, detail="Document not found for this owner")
+            except Exception as e:
+                if revert_code(e) is not None:
+                    raise HTTPException(status_code=404, detail="Document not found for this owner")
                 raise
-        action_str = ACTION_ENUM[d["action"]] if isinstance(d["action"], int) and d["action"] < len(ACTION_ENUM) else str(d["action"])
-        block = dict(d)
-        block["action"] = action_str
-        block["blockHash"] = compute_block_hash(block)
-        return APIResponse(success=True, message="Latest block for document fetched from blockchain.", data=_standardize_block(block))
+        data = d.to_dict()
+        data["indexedBlock"] = indexed_block
+        return APIResponse(success=True, message="Latest block for document fetched from blockchain.", data=data)
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch document latest block: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to fetch document latest block: {str(e)}")
+
+class _CachedFileResponse(FileResponse):
+    """FileResponse for a content cache file; the lease is released however the response ends
+    (background tasks are skipped on range errors and client disconnects)."""
+
+    def __init__(self, cid: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cid = cid
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            content_cache.release(self.cid)
+
+def _may_download(history: list, user: str) -> bool:
+    # Shares are never revoked: any unexpired Shared_download record for the user grants it
+    now = int(time.time())
+    return any(
+        b.action == 5 and b.SharedUser == user and (b.SharedEndDate == 0 or b.SharedEndDate >= now)
+        for b in history
+    )
+
+# Download the stored file: for the owner, or a user it was shared with for download
+@router.get("/download/{doctitle}/owner/{owner}")
+async def download_document(doctitle: str, owner: str, user: str, expires: int, signature: str):
+    """Serve the document's IPFS content from the local content cache, fetching it from
+    the gateway on a miss. Range requests are honoured and the body goes out with sendfile
+    where the server supports it.
+
+    `user` is only trusted from a link signed with SECRET_KEY (see app/utils/signing.py)
+    by the service that authenticated that user.
+    """
+    owner_id = _parse_owner(owner)
+    if not signing_configured():
+        raise HTTPException(status_code=503, detail="Downloads are disabled until SECRET_KEY is configured")
+    if not verify_download(doctitle, owner_id, user, expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired download link")
+    try:
+        history = None
+        if _index_serving():
+            try:
+                history = await run_in_threadpool(indexer.get_document_history, doctitle, owner_id)
+            except LookupError:
+                pass  # Not indexed (or not yet confirmed); read from chain
+        if history is None:
+            history = await chain_client.call(get_document_history_on_chain, doctitle, owner_id)
+    except Exception as e:
+        if revert_code(e) is not None:
+            raise HTTPException(status_code=404, detail="Document not found for this owner")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch document history: {str(e)}")
+    if not history:
+        raise HTTPException(status_code=404, detail="Document not found for this owner")
+    if user != str(owner_id) and not _may_download(history, user):
+        raise HTTPException(status_code=403, detail="Document is not shared with this user for download")
+
+    cid = history[-1].ipfsHash
+    try:
+        cid_to_digest(cid)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Document has no stored content")
+    try:
+        path = await run_in_threadpool(content_cache.acquire, cid)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"IPFS download failed: {e}")
+    # Content is addressed by its CID, so the CID is a strong validator for If-Range / If-None-Match
+    return _CachedFileResponse(
+        cid,
+        path,
+        filename=doctitle,
+        media_type=mimetypes.guess_type(doctitle)[0] or "application/octet-stream",
+        headers={"ETag": f'"{cid}"', "Cache-Control": "private, max-age=31536000, immutable"},
+    )
+
+# Bulk read: latest block of several documents for one owner in a single round-trip
+@router.post("/blocks/owner/{owner}/documents", response_model=APIResponse)
+async def get_documents_bulk(owner: str, request: BulkDocumentsRequest):
+    owner_id = _parse_owner(owner)
+    if not request.DocTitles:
+        raise HTTPException(status_code=400, detail="DocTitles must not be empty")
+    if len(request.DocTitles) > settings.READ_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {settings.READ_BATCH_MAX} DocTitles per request")
+    try:
+        docs = await chain_client.call(get_documents_on_chain, owner_id, request.DocTitles)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch documents: {str(e)}")
+    blocks = []
+    errors = []
+    for d in docs:
+        if "error" in d:
+            errors.append(d)
+            continue
+        blocks.append(d.to_dict())
+    return APIResponse(success=True, message=f"Fetched {len(blocks)} of {len(docs)} documents from blockchain.", data={"blocks": blocks, "errors": errors})
+
+# Verify the previousHash chain of one document's history
+@router.get("/verify/document/{doctitle}/owner/{owner}", response_model=APIResponse)
+async def verify_document_history(doctitle: str, owner: str, source: str = "chain"):
+    owner_id = _parse_owner(owner)
+    if source not in ("chain", "index"):
+        raise HTTPException(status_code=400, detail="source must be 'chain' or 'index'")
+    if source == "index" and indexer is None:
+        raise HTTPException(status_code=400, detail="Event index is not enabled")
+    try:
+        report = await chain_client.call(verify_documents, owner_id, [doctitle], source)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to verify document history: {str(e)}")
+    result = report["documents"][0]
+    if "error" in result:
+        msg = result["error"]
+        if result.get("code") in ("DOCUMENT_NOT_FOUND", "OWNER_MISMATCH"):
+            raise HTTPException(status_code=404, detail=msg)
+        raise HTTPException(status_code=500, detail=f"Failed to verify document history: {msg}")
+    message = "History chain is intact." if result["valid"] else "History chain is broken."
+    return APIResponse(success=True, message=message, data={"Owner": report["Owner"], "source": source, **result})
+
+# Verify the previousHash chains of all of an owner's documents (histories fetched in one batch)
+@router.get("/verify/owner/{owner}", response_model=APIResponse)
+async def verify_owner_histories(owner: str, source: str = "chain"):
+    owner_id = _parse_owner(owner)
+    if source not in ("chain", "index"):
+        raise HTTPException(status_code=400, detail="source must be 'chain' or 'index'")
+    if source == "index" and indexer is None:
+        raise HTTPException(status_code=400, detail="Event index is not enabled")
+    try:
+        report = await chain_client.call(verify_documents, owner_id, None, source)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to verify owner histories: {str(e)}")
+    if not report["documents"]:
+        raise HTTPException(status_code=404, detail="No documents found for this owner.")
+    broken = sum(1 for r in report["documents"] if not r["valid"])
+    message = f"{len(report['documents']) - broken} of {len(report['documents'])} history chains are intact."
+    report["verifier"] = history_verifier.stats()
+    return APIResponse(success=True, message=message, data=report)
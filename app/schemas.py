@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 
 class UserAuth(BaseModel):
     email: EmailStr
@@ -31,6 +31,9 @@ class ShareDocumentRequest(BaseModel):
     SharedEndDate: int
     LastAccessDate: int
 
+class BulkDocumentsRequest(BaseModel):
+    DocTitles: List[str]
+
 class DocumentResponse(BaseModel):
     DocTitle: str
     Owner: int  # Owner is now uint64 (int)
@@ -1,6 +1,8 @@
-from eth_utils import to_bytes, to_hex
+import functools
 
+@functools.lru_cache(maxsize=4096)
 def encode_bytes32(val: str) -> bytes:
+    # Memoised: the same titles and users are encoded on every read and write of a document
     b = val.encode('utf-8')
     if len(b) > 32:
         raise ValueError('String too long for bytes32')
@@ -9,10 +11,21 @@ def encode_bytes32(val: str) -> bytes:
 def decode_bytes32(val: bytes) -> str:
     return val.rstrip(b'\0').decode('utf-8')
 import os
-from web3 import Web3
-import requests
-from requests_toolbelt.multipart.encoder import MultipartEncoder
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
 from dotenv import load_dotenv
+from app.core.config import settings
+from app.utils.blocks import ActionBlock
+from app.utils.cache import ReadCache
+from app.utils.codec import ContractCodec
+from app.utils.fees import FeeOracle
+from app.utils.ipfs import encode_ipfs_hash
+from app.utils.pinning import HedgedUploader, InfuraProvider, PinataProvider
+from app.utils.transport import upstream_session
+from app.utils.nonce import NonceManager
+from app.utils.ownership import owner_index
 
 load_dotenv()
 
@@ -30,12 +43,7 @@ elif NETWORK == "sepolia":
     CONTRACT_ADDRESS = os.getenv("SEPOLIA_CONTRACT_ADDRESS")
     PRIVATE_KEY = os.getenv("SEPOLIA_PRIVATE_KEY") or os.getenv("PRIVATE_KEY")
 else:
-    raise RuntimeError(f"Unsupported NETWORK: {NETWORK}. Use 'optimism' or 'sepolia'.")
-
-if not RPC_URL:
-    raise RuntimeError(f"No RPC URL found for {NETWORK}. Set the correct RPC URL in .env.")
-if not CONTRACT_ADDRESS:
-    raise RuntimeError(f"No contract address found for {NETWORK}. Set the correct contract address in .env.")
+    RPC_URL = CONTRACT_ADDRESS = PRIVATE_KEY = None
 
 PINATA_JWT = os.getenv("PINATA_JWT")
 INFURA_IPFS_PROJECT_ID = os.getenv("INFURA_IPFS_PROJECT_ID") or os.getenv("IPFS_PROJECT_ID")
@@ -66,55 +74,122 @@ def _load_contract_abi() -> list:
             continue
     raise FileNotFoundError('Contract ABI not found in artifacts or contract directories')
 
-CONTRACT_ABI = _load_contract_abi()
+# --- Chain client: built on first use so importing the app does not load web3 ---
+_client = None
+_client_lock = threading.Lock()
 
-w3 = Web3(Web3.HTTPProvider(RPC_URL))
-account = w3.eth.account.from_key(PRIVATE_KEY)
-contract = w3.eth.contract(address=Web3.to_checksum_address(CONTRACT_ADDRESS), abi=CONTRACT_ABI)
+def _build_client() -> SimpleNamespace:
+    if NETWORK not in ("optimism", "sepolia"):
+        raise RuntimeError(f"Unsupported NETWORK: {NETWORK}. Use 'optimism' or 'sepolia'.")
+    if not RPC_URL:
+        raise RuntimeError(f"No RPC URL found for {NETWORK}. Set the correct RPC URL in .env.")
+    if not CONTRACT_ADDRESS:
+        raise RuntimeError(f"No contract address found for {NETWORK}. Set the correct contract address in .env.")
+    from web3 import Web3
 
-def upload_to_pinata(file_bytes, filename):
-    m = MultipartEncoder(
-        fields={
-            "file": (filename, file_bytes),
-            "pinataMetadata": ('', '{"name": "%s"}' % filename, 'application/json')
-        }
+    abi = _load_contract_abi()
+    client_w3 = Web3(Web3.HTTPProvider(
+        RPC_URL,
+        request_kwargs={"timeout": (settings.HTTP_CONNECT_TIMEOUT, settings.RPC_REQUEST_TIMEOUT)},
+        session=upstream_session("rpc", settings.RPC_REQUEST_TIMEOUT),
+    ))
+    return SimpleNamespace(
+        w3=client_w3,
+        account=client_w3.eth.account.from_key(PRIVATE_KEY),
+        contract=client_w3.eth.contract(address=Web3.to_checksum_address(CONTRACT_ADDRESS), abi=abi),
+        abi=abi,
+        codec=ContractCodec(abi),
     )
-    headers = {
-        "Authorization": f"Bearer {PINATA_JWT}",
-        "Content-Type": m.content_type
-    }
-    response = requests.post("https://api.pinata.cloud/pinning/pinFileToIPFS", data=m, headers=headers)
-    response.raise_for_status()
-    data = response.json()
-    return data.get("IpfsHash") or data.get("IpfsCid") or data.get("cid") or data.get("Hash")
-
-def upload_to_infura_ipfs(file_bytes: bytes, filename: str) -> str:
-    """Upload a file to Infura IPFS API v0 and return CID."""
-    auth = None
-    if INFURA_IPFS_PROJECT_ID and INFURA_IPFS_PROJECT_SECRET:
-        auth = (INFURA_IPFS_PROJECT_ID, INFURA_IPFS_PROJECT_SECRET)
-    files = {"file": (filename, file_bytes)}
-    resp = requests.post("https://ipfs.infura.io:5001/api/v0/add", files=files, auth=auth)
-    resp.raise_for_status()
-    info = resp.json()
-    # Infura returns { Name, Hash, Size }
-    return info.get("Hash") or info.get("Cid")
-
-def upload_file(file_bytes: bytes, filename: str) -> str:
-    """Try Pinata first; if not configured or fails, try Infura IPFS. Return CID."""
-    last_err: Exception | None = None
-    if PINATA_JWT:
-        try:
-            return upload_to_pinata(file_bytes, filename)
-        except Exception as e:
-            last_err = e
-    # Fallback to Infura IPFS
-    try:
-        return upload_to_infura_ipfs(file_bytes, filename)
-    except Exception as e:
-        if last_err is not None:
-            raise RuntimeError(f"Pinata and Infura IPFS upload failed: pinata={last_err}, infura={e}")
-        raise
+
+def get_client() -> SimpleNamespace:
+    """The web3 client, account and contract, created once (thread-safe) on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_client()
+    return _client
+
+class _ClientAttribute:
+    """Stand-in for w3 / account / contract that initialises the client on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(getattr(get_client(), self._name), attr)
+
+    def __repr__(self):
+        return f"<lazy {self._name}>"
+
+w3 = _ClientAttribute("w3")
+account = _ClientAttribute("account")
+contract = _ClientAttribute("contract")
+codec = _ClientAttribute("codec")
+
+def __getattr__(name):
+    if name == "CONTRACT_ABI":
+        return get_client().abi
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+nonce_manager = NonceManager(
+    lambda: w3.eth.get_transaction_count(account.address, "pending"),
+    gap_grace=settings.NONCE_GAP_GRACE,
+    broadcast_ttl=settings.NONCE_BROADCAST_TTL,
+    resync_interval=settings.NONCE_RESYNC_INTERVAL,
+)
+fee_oracle = FeeOracle(
+    estimate_gas=lambda fn: fn.estimate_gas({"from": account.address}),
+    fetch_fee_history=lambda blocks, percentiles: w3.eth.fee_history(blocks, "latest", percentiles),
+    fetch_gas_price=lambda: w3.eth.gas_price,
+    gas_refresh=settings.GAS_ESTIMATE_REFRESH,
+    gas_margin_percent=settings.GAS_MARGIN_PERCENT,
+    default_gas=settings.DEFAULT_GAS_LIMIT,
+    fee_refresh=settings.FEE_REFRESH_INTERVAL,
+    window=settings.FEE_HISTORY_BLOCKS,
+    min_priority_fee=int(settings.FEE_MIN_PRIORITY_GWEI * 10**9),
+    max_fee=int(settings.FEE_MAX_GWEI * 10**9),
+)
+
+def _documents_touched(from_block: int, to_block: int) -> list:
+    """(DocTitle, Owner) of every DocumentCreated/Shared/Accessed event in the block range."""
+    topics = [getattr(contract.events, name)().topic for name in ("DocumentCreated", "DocumentShared", "DocumentAccessed")]
+    logs = w3.eth.get_logs({"address": contract.address, "fromBlock": from_block, "toBlock": to_block, "topics": [topics]})
+    # Event fields are all non-indexed static words: DocTitle, Owner, ...
+    touched = [(decode_bytes32(bytes(log["data"][0:32])), int.from_bytes(bytes(log["data"][32:64]), "big")) for log in logs]
+    for doc_title, owner in touched:
+        owner_index.add(owner, doc_title)
+    return touched
+
+read_cache = ReadCache(
+    max_entries=settings.READ_CACHE_MAX_ENTRIES,
+    ttl=settings.READ_CACHE_TTL,
+    head_poll_interval=settings.READ_CACHE_HEAD_POLL_INTERVAL,
+    max_head_gap=settings.READ_CACHE_MAX_HEAD_GAP,
+    fetch_head=lambda: w3.eth.block_number,
+    fetch_touched=_documents_touched,
+)
+
+pinata_provider = PinataProvider(PINATA_JWT)
+infura_provider = InfuraProvider(INFURA_IPFS_PROJECT_ID, INFURA_IPFS_PROJECT_SECRET)
+ipfs_uploader = HedgedUploader(
+    providers=[pinata_provider, infura_provider],
+    hedge_delay=settings.IPFS_HEDGE_DELAY,
+    policy=settings.IPFS_HEDGE_POLICY,
+    max_workers=settings.IPFS_UPLOAD_WORKERS,
+)
+
+def upload_to_pinata(file_bytes, filename):
+    """`file_bytes` may be bytes or a binary file object; file objects are streamed, not buffered."""
+    return pinata_provider.pin(file_bytes, filename)
+
+def upload_to_infura_ipfs(file_bytes, filename: str) -> str:
+    """Upload a file (bytes or binary file object, streamed) to Infura IPFS API v0 and return CID."""
+    return infura_provider.pin(file_bytes, filename)
+
+def upload_file(file_bytes, filename: str) -> str:
+    """Upload to the configured pinning providers (Pinata, then Infura), hedged; return the first CID."""
+    return ipfs_uploader.upload(file_bytes, filename)
 
 def is_owner(user_address, document_id):
     doc = contract.functions.documents(user_address, document_id).call()
@@ -124,144 +199,649 @@ def has_shared_access(owner_address, document_id, user_address):
     return contract.functions.sharedAccess(owner_address, document_id, user_address).call()
 
 def _get_create_document_inputs_len() -> int:
-    for entry in CONTRACT_ABI:
-        if entry.get('type') == 'function' and entry.get('name') == 'createDocument':
-            return len(entry.get('inputs', []))
-    return -1
+    return codec.input_counts.get("createDocument", -1)
 
-def create_document_on_chain(doc_title: str, owner: str, last_access_date: int, ipfs_hash: str):
-    fn = contract.functions.createDocument(
+@functools.lru_cache(maxsize=1)
+def _chain_id() -> int:
+    return w3.eth.chain_id
+
+def is_contract_revert(exc: Exception) -> bool:
+    from web3.exceptions import ContractLogicError
+    return isinstance(exc, (ContractLogicError, ContractRevert))
+
+def revert_code(exc: Exception) -> str | None:
+    """REVERT_CODES code of a reverted call's exception, or None if it did not revert."""
+    if isinstance(exc, ContractRevert):
+        return exc.code
+    reason = revert_reason(exc)
+    return None if reason is None else REVERT_CODES.get(reason, "REVERTED")
+
+readiness = {"ready": False, "chainId": None, "warmedUpAt": None, "error": None}
+_warm_up_lock = threading.Lock()
+
+def warm_up() -> dict:
+    """
+    Initialise the client and make the first round-trips (chain id, nonce) so the first
+    request does not pay for them. Safe to call repeatedly; concurrent calls share one run.
+    """
+    if not _warm_up_lock.acquire(blocking=False):
+        return readiness
+    try:
+        get_client()
+        import eth_abi  # noqa: F401  (first batch_read would import it)
+        readiness["chainId"] = _chain_id()
+        nonce_manager.resync()
+        readiness.update(ready=True, warmedUpAt=int(time.time()), error=None)
+    except Exception as e:
+        readiness.update(ready=False, error=str(e))
+    finally:
+        _warm_up_lock.release()
+    return readiness
+
+def start_warm_up() -> None:
+    if not readiness["ready"] and not _warm_up_lock.locked():
+        threading.Thread(target=warm_up, name="chain-warm-up", daemon=True).start()
+
+def _sign_and_send(tx: dict):
+    signed_tx = w3.eth.account.sign_transaction(tx, private_key=PRIVATE_KEY)
+    return w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+
+def _send_transaction(fn, urgency: str, nonce: int | None = None):
+    """Build, sign and broadcast a contract call using a nonce from the shared allocator (or
+    `nonce`, already allocated by the caller) and gas/fees from the fee oracle for the given
+    urgency profile. Returns (tx_hash, tx) so the caller can track or re-broadcast the transaction.
+    """
+    try:
+        params = fee_oracle.tx_params(fn, urgency)
+    except Exception:
+        if nonce is not None:
+            nonce_manager.release(nonce)
+        raise
+    if nonce is None:
+        nonce = nonce_manager.allocate()
+    try:
+        tx = fn.build_transaction({
+            "from": account.address,
+            "chainId": _chain_id(),
+            "nonce": nonce,
+            **params,
+        })
+    except Exception:
+        # Nothing was sent: the nonce can be handed out again
+        nonce_manager.release(nonce)
+        raise
+    try:
+        tx_hash = _sign_and_send(tx)
+    except Exception as e:
+        nonce_manager.release(nonce, e)
+        raise
+    nonce_manager.confirm(nonce)
+    _forget_reverts(tx["data"])
+    return tx_hash, tx
+
+def rebroadcast_transaction(tx: dict, bump_percent: int):
+    """
+    Re-sign `tx` with the same nonce and fees raised by `bump_percent` so it replaces a stuck one.
+    Fees stay within the fee oracle's cap (FEE_MAX_GWEI); returns None instead of sending once the
+    cap leaves no room for a full bump, since nodes reject a replacement that does not outbid the original.
+    """
+    bumped = dict(tx)
+    keys = [key for key in ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas") if key in bumped]
+    for key in keys:
+        bumped[key] = min(int(bumped[key]) * (100 + bump_percent) // 100 + 1, fee_oracle.max_fee)
+    if "maxFeePerGas" in bumped and "maxPriorityFeePerGas" in bumped:
+        bumped["maxPriorityFeePerGas"] = min(bumped["maxPriorityFeePerGas"], bumped["maxFeePerGas"])
+    if any(bumped[key] < int(tx[key]) * (100 + bump_percent) // 100 for key in keys):
+        return None
+    return _sign_and_send(bumped), bumped
+
+def _as_bytes(value) -> bytes:
+    return bytes.fromhex(value[2:]) if isinstance(value, str) else bytes(value)
+
+def _record_logs(logs) -> list:
+    """(log, ActionBlock) for each DocumentCreated / DocumentShared / DocumentAccessed log of the contract in `logs`."""
+    topics = {_as_bytes(getattr(contract.events, name)().topic) for name in ("DocumentCreated", "DocumentShared", "DocumentAccessed")}
+    address = _as_bytes(contract.address)
+    records = []
+    for log in logs:
+        log_topics = log.get("topics") or []
+        if not log_topics or _as_bytes(log_topics[0]) not in topics or _as_bytes(log["address"]) != address:
+            continue
+        # Event fields are all non-indexed static words: DocTitle, Owner, ..., ipfsHash, TimeStamp
+        data = _as_bytes(log["data"])
+        words = [data[i:i + 32] for i in range(0, 9 * 32, 32)]
+        fields = [int.from_bytes(w, "big") if i in (1, 2, 4, 6, 8) else w for i, w in enumerate(words)]
+        records.append((log, ActionBlock(fields, timestamp=fields[8])))
+    return records
+
+def receipt_records(receipt) -> list:
+    """
+    The records written by a successful receipt (raw or web3-formatted), decoded from its
+    DocumentCreated / DocumentShared / DocumentAccessed logs in log order, as ActionBlocks
+    with timestamp = TimeStamp; previousHash is not in the events and is left unset.
+    """
+    status = receipt.get("status", 1)
+    if (int(status, 16) if isinstance(status, str) else int(status)) != 1:
+        return []
+    return [record for _, record in _record_logs(receipt.get("logs") or [])]
+
+def previous_hash_in_receipt(receipt, doc_title: str) -> bytes:
+    """
+    previousHash of the last record `receipt` wrote for `doc_title`. Events do not carry it, and
+    the document's state at the receipt's block already includes any later transaction of that
+    block, so it is rebuilt: the document's latest record at the end of the previous block,
+    chained through the document's earlier logs in the receipt's block.
+    """
+    from app.utils.utils import ZERO_HASH, compute_record_hash
+
+    def to_int(v):
+        return int(v, 16) if isinstance(v, str) else int(v)
+
+    ours = [(log, r) for log, r in _record_logs(receipt.get("logs") or []) if r.DocTitle == doc_title]
+    if not ours:
+        raise ValueError(f"Receipt wrote no record for {doc_title}")
+    last_log, last = ours[-1]
+    if last.action == 0:
+        return ZERO_HASH
+    block_number = to_int(receipt["blockNumber"])
+    call = _read("documentHistory", encode_bytes32(doc_title))
+    # The earlier state and the block's logs in one round-trip
+    state, logs = rpc_batch([
+        ("eth_call", [{"to": contract.address, "data": "0x" + call.data.hex()}, hex(block_number - 1)]),
+        ("eth_getLogs", [{"fromBlock": hex(block_number), "toBlock": hex(block_number), "address": [contract.address]}]),
+    ])
+    for answer in (state, logs):
+        if isinstance(answer, Exception):
+            raise answer
+    previous = compute_record_hash(ActionBlock.from_record(call.decode(_as_bytes(state))).record_fields())
+    def position(log):
+        return to_int(log["transactionIndex"]), to_int(log["logIndex"])
+
+    for log, record in _record_logs(sorted(logs, key=position)):
+        if position(log) >= position(last_log):
+            break
+        if record.DocTitle == doc_title:
+            record.previousHash = ZERO_HASH if record.action == 0 else previous
+            previous = compute_record_hash(record.record_fields())
+    return previous
+
+def observe_receipt(receipt) -> None:
+    """Learn owner -> title membership from the DocumentCreated logs of a successful receipt."""
+    for record in receipt_records(receipt):
+        if record["action"] == 0:
+            owner_index.add(record.Owner, record.DocTitle)
+
+def wait_for_receipt(tx_hash):
+    receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=settings.CHAIN_RECEIPT_TIMEOUT)
+    observe_receipt(receipt)
+    return receipt
+
+def send_many(calls: list) -> list:
+    """
+    Broadcast [(fn, urgency), ...] back-to-back without waiting for receipts; the nonces are
+    reserved from the shared allocator in one step. Returns (tx_hash, tx) or the exception per call.
+    Sending stops at the first failure: later nonces would sit behind its gap, so the calls
+    after it are not attempted, their nonces are released and they report the failure.
+    """
+    nonces = nonce_manager.allocate_many(len(calls))
+    results = []
+    for (fn, urgency), nonce in zip(calls, nonces):
+        try:
+            results.append(_send_transaction(fn, urgency, nonce))
+        except Exception as e:
+            results.append(e)
+            for unused in nonces[len(results):]:
+                nonce_manager.release(unused)
+            skipped = RuntimeError(f"Not sent: an earlier transaction of the batch failed: {e}")
+            results += [skipped] * (len(calls) - len(results))
+            break
+    return results
+
+def wait_for_receipts(tx_hashes: list, timeout: float | None = None, poll_interval: float = 1.0) -> list:
+    """
+    Wait for many receipts at once, polling all outstanding ones per JSON-RPC batch.
+    Returns the receipt per hash, or a TimeoutError for those not mined within `timeout`.
+    """
+    timeout = settings.CHAIN_RECEIPT_TIMEOUT if timeout is None else timeout
+    hashes = [h if isinstance(h, str) else "0x" + bytes(h).hex() for h in tx_hashes]
+    receipts: dict = {}
+    deadline = time.monotonic() + timeout
+    while True:
+        outstanding = [h for h in dict.fromkeys(hashes) if h not in receipts]
+        for start in range(0, len(outstanding), settings.READ_BATCH_MAX):
+            chunk = outstanding[start:start + settings.READ_BATCH_MAX]
+            for h, result in zip(chunk, rpc_batch([("eth_getTransactionReceipt", [h]) for h in chunk])):
+                if result is not None and not isinstance(result, Exception):
+                    receipts[h] = result
+                    observe_receipt(result)
+        if len(receipts) == len(set(hashes)) or time.monotonic() >= deadline:
+            break
+        time.sleep(poll_interval)
+    return [receipts.get(h) or TimeoutError(f"Transaction {h} not mined within {timeout:g}s") for h in hashes]
+
+def receipt_summary(receipt) -> dict:
+    """status ('confirmed' / 'reverted'), txHash and blockNumber of a raw or web3-formatted receipt."""
+    def to_int(v):
+        return int(v, 16) if isinstance(v, str) else int(v)
+    tx_hash = receipt["transactionHash"]
+    return {
+        "status": "confirmed" if to_int(receipt.get("status", 1)) == 1 else "reverted",
+        "txHash": tx_hash if isinstance(tx_hash, str) else "0x" + bytes(tx_hash).hex(),
+        "blockNumber": to_int(receipt["blockNumber"]),
+    }
+
+class RPCError(RuntimeError):
+    """JSON-RPC error object returned for one request of a batch."""
+
+    def __init__(self, error):
+        self.error = error if isinstance(error, dict) else {"message": str(error)}
+        super().__init__(self.error.get("message") or str(error))
+
+def rpc_batch(requests_: list) -> list:
+    """
+    Send [(method, params), ...] as one JSON-RPC batch when the provider supports it,
+    otherwise one by one. Returns the result per request, or the exception (RPCError
+    for batched requests) for requests the node answered with an error.
+    """
+    provider = w3.provider
+    if not hasattr(provider, "make_batch_request"):
+        results = []
+        for method, params in requests_:
+            try:
+                results.append(w3.manager.request_blocking(method, params))
+            except Exception as e:
+                results.append(e)
+        return results
+    responses = provider.make_batch_request(requests_)
+    if not isinstance(responses, list):
+        raise RPCError(responses.get("error"))
+    return [RPCError(r["error"]) if "error" in r else r.get("result") for r in responses]
+
+# Contract require() messages -> stable error codes for API clients
+REVERT_CODES = {
+    "Document already exists": "DOCUMENT_EXISTS",
+    "IPFS hash cannot be empty": "EMPTY_IPFS_HASH",
+    "Document does not exist": "DOCUMENT_NOT_FOUND",
+    "Owner does not match": "OWNER_MISMATCH",
+    "Invalid action: must be 0 (View) or 1 (Download)": "INVALID_ACTION",
+    "Invalid cursor": "INVALID_CURSOR",
+}
+
+class PartialSendError(RuntimeError):
+    """A later transaction of one request failed after earlier ones were broadcast; `sent` holds
+    their (tx_hash, tx) so the caller can report or track what already went out."""
+
+    def __init__(self, sent: list, error: Exception):
+        self.sent = sent
+        self.error = error
+        hashes = ", ".join("0x" + bytes(tx_hash).hex() for tx_hash, _ in sent)
+        super().__init__(f"{error} (already broadcast: {hashes})")
+
+class ContractRevert(RuntimeError):
+    """A contract call that reverted (or would), with its require() reason and error code."""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        self.code = REVERT_CODES.get(reason, "REVERTED")
+        super().__init__(f"Contract reverted: {reason or 'no reason given'}")
+
+def revert_reason(exc: Exception) -> str | None:
+    """The revert reason carried by an eth_call error, or None if the error is not a revert."""
+    data = exc.error.get("data") if isinstance(exc, RPCError) else getattr(exc, "data", None)
+    if isinstance(data, dict):
+        data = data.get("data")
+    if isinstance(data, str) and data.startswith("0x08c379a0"):  # Error(string)
+        from eth_abi import decode as abi_decode
+        return abi_decode(["string"], bytes.fromhex(data[10:]))[0]
+    if isinstance(data, str) and data.startswith("0x4e487b71"):  # Panic(uint256)
+        return f"Panic(0x{int(data[10:], 16):x})"
+    # web3's ContractLogicError renders as (message, data); its message is the text the node sent
+    message = getattr(exc, "message", None) or str(exc)
+    if "execution reverted" not in message and not is_contract_revert(exc):
+        return None
+    reason = message.split("execution reverted", 1)[-1].lstrip(":").strip()
+    if reason[:2] in ("b'", 'b"'):  # Raw revert data shown as a bytes literal (eth-tester: b'' for no reason)
+        reason = reason[1:]
+    return reason.strip("'\"")
+
+_revert_cache: "OrderedDict[bytes, tuple]" = OrderedDict()  # calldata -> (ContractRevert, expires at)
+_revert_cache_lock = threading.Lock()
+_REVERT_CACHE_MAX = 1024
+
+def preflight(fns: list) -> list:
+    """
+    Simulate contract writes with eth_call against the pending block, in one JSON-RPC batch.
+    Returns None per call expected to succeed, or the ContractRevert it would raise. Reverts
+    are remembered for PREFLIGHT_REVERT_TTL seconds, or until this service writes to the
+    same document. Calls that could not be simulated are let through.
+    """
+    if not settings.PREFLIGHT_ENABLED:
+        return [None] * len(fns)
+    datas = [_as_bytes(fn._encode_transaction_data()) for fn in fns]
+    results = [None] * len(fns)
+    todo = []
+    now = time.monotonic()
+    with _revert_cache_lock:
+        for i, data in enumerate(datas):
+            entry = _revert_cache.get(data)
+            if entry is not None and entry[1] > now:
+                results[i] = entry[0]
+            else:
+                todo.append(i)
+    for start in range(0, len(todo), settings.READ_BATCH_MAX):
+        chunk = todo[start:start + settings.READ_BATCH_MAX]
+        answers = rpc_batch([
+            ("eth_call", [{"from": account.address, "to": contract.address, "data": "0x" + datas[i].hex()}, "pending"])
+            for i in chunk
+        ])
+        for i, answer in zip(chunk, answers):
+            reason = revert_reason(answer) if isinstance(answer, Exception) else None
+            if reason is None:
+                continue
+            results[i] = ContractRevert(reason)
+            with _revert_cache_lock:
+                _revert_cache[datas[i]] = (results[i], time.monotonic() + settings.PREFLIGHT_REVERT_TTL)
+                while len(_revert_cache) > _REVERT_CACHE_MAX:
+                    _revert_cache.popitem(last=False)
+    return results
+
+def _check_preflight(fns: list) -> None:
+    for revert in preflight(fns):
+        if revert is not None:
+            raise revert
+
+def _forget_reverts(data) -> None:
+    """Drop remembered reverts for the document a write's calldata targets (DocTitle is the first argument)."""
+    title = _as_bytes(data)[4:36]
+    with _revert_cache_lock:
+        for key in [k for k in _revert_cache if k[4:36] == title]:
+            del _revert_cache[key]
+
+def check_create_document(doc_title: str, owner: str, last_access_date: int, ipfs_hash: str) -> None:
+    """Raise ContractRevert if createDocument would revert, without sending anything."""
+    _check_preflight([_create_document_call(doc_title, owner, last_access_date, ipfs_hash)])
+
+def _create_document_call(doc_title: str, owner: str, last_access_date: int, ipfs_hash: str):
+    return contract.functions.createDocument(
         encode_bytes32(doc_title),
         int(owner),  # Owner is now uint64
         int(last_access_date),
-        encode_bytes32(ipfs_hash)
+        encode_ipfs_hash(ipfs_hash)
     )
-    tx = fn.build_transaction({
-        "from": account.address,
-        "nonce": w3.eth.get_transaction_count(account.address),
-        "gas": 500000,
-        "gasPrice": w3.to_wei("1", "gwei"),
-    })
-    signed_tx = w3.eth.account.sign_transaction(tx, private_key=PRIVATE_KEY)
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-    return receipt
 
-def share_document_on_chain(doc_title: str, owner: str, shared_user: str, permissions: str, shared_end_date: int | None, last_access_date: int):
-    """permissions: 'view', 'download', or 'both'"""
+def _share_document_calls(doc_title: str, owner: str, shared_user: str, permissions: str, shared_end_date: int | None, last_access_date: int) -> list:
     perm_map = {"view": 0, "download": 1}
-    base_nonce = w3.eth.get_transaction_count(account.address)
-
-    def send_one(perm_value: int, nonce: int):
-        tx = contract.functions.shareDocument(
+    permissions = (permissions or "").lower()
+    if permissions == "both":
+        perm_values = [perm_map["view"], perm_map["download"]]
+    elif permissions in perm_map:
+        perm_values = [perm_map[permissions]]
+    else:
+        raise ValueError("permissions must be 'view', 'download', or 'both'")
+    return [
+        contract.functions.shareDocument(
             encode_bytes32(doc_title),
             int(owner),  # Owner is now uint64
             encode_bytes32(shared_user),
             perm_value,
             int(shared_end_date or 0),
             int(last_access_date),
-        ).build_transaction({
-            "from": account.address,
-            "nonce": nonce,
-            "gas": 500000,
-            "gasPrice": w3.to_wei("1", "gwei"),
-        })
-        signed_tx = w3.eth.account.sign_transaction(tx, private_key=PRIVATE_KEY)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        return w3.eth.wait_for_transaction_receipt(tx_hash)
-
-    permissions = (permissions or "").lower()
-    if permissions == "both":
-        r1 = send_one(perm_map["view"], base_nonce)
-        r2 = send_one(perm_map["download"], base_nonce + 1)
-        return [r1, r2]
-    elif permissions in perm_map:
-        return send_one(perm_map[permissions], base_nonce)
-    else:
-        raise ValueError("permissions must be 'view', 'download', or 'both'")
+        )
+        for perm_value in perm_values
+    ]
 
-def access_document_on_chain(doc_title: str, owner: str, action_type: int, last_access_date: int):
+def _access_document_call(doc_title: str, owner: str, action_type: int, last_access_date: int):
     if action_type not in (0, 1):
         raise ValueError("action_type must be 0 (View) or 1 (Download)")
-    tx = contract.functions.accessDocument(
+    return contract.functions.accessDocument(
         encode_bytes32(doc_title),
         int(owner),  # Owner is now uint64
         int(action_type),
         int(last_access_date)
-    ).build_transaction({
-        "from": account.address,
-        "nonce": w3.eth.get_transaction_count(account.address),
-        "gas": 300000,
-        "gasPrice": w3.to_wei("1", "gwei"),
-    })
-    signed_tx = w3.eth.account.sign_transaction(tx, private_key=PRIVATE_KEY)
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-    return receipt
+    )
 
-def get_document_on_chain(doc_title: str, owner: str):
-    doc = contract.functions.getDocument(
-        encode_bytes32(doc_title),
-        int(owner)
-    ).call()
-    # To get previousHash, fetch ActionRecord from documentHistory mapping
-    # This requires a separate call to getDocumentHistory and extract previousHash
+def submit_create_document(doc_title: str, owner: str, last_access_date: int, ipfs_hash: str) -> list:
+    """Broadcast createDocument without waiting; returns [(tx_hash, tx)]. Raises ContractRevert if it would revert."""
+    fn = _create_document_call(doc_title, owner, last_access_date, ipfs_hash)
+    _check_preflight([fn])
+    sent = [_send_transaction(fn, settings.FEE_URGENCY_CREATE)]
+    read_cache.invalidate(doc_title, owner)
+    return sent
+
+def submit_share_document(doc_title: str, owner: str, shared_user: str, permissions: str, shared_end_date: int | None, last_access_date: int) -> list:
+    """
+    Broadcast shareDocument (twice for 'both') without waiting; returns [(tx_hash, tx), ...].
+    The nonces are reserved together; if a send fails the rest are not attempted, and
+    PartialSendError reports the transactions that were already broadcast.
+    """
+    calls = _share_document_calls(doc_title, owner, shared_user, permissions, shared_end_date, last_access_date)
+    _check_preflight(calls)
+    nonces = nonce_manager.allocate_many(len(calls))
+    sent = []
     try:
-        history = contract.functions.getDocumentHistory(
-            encode_bytes32(doc_title),
-            int(owner)
-        ).call()
-        previous_hash = history[0][10] if history and len(history[0]) > 10 else b''
-    except Exception:
-        previous_hash = b''
-    return {
-        "DocTitle": decode_bytes32(doc[0]),
-        "Owner": int(doc[1]),  # Owner is now uint64
-        "LastAccessDate": int(doc[2]),
-        "LastAccessedBy": decode_bytes32(doc[3]),
-        "action": int(doc[4]),
-        "SharedUser": decode_bytes32(doc[5]),
-        "SharedEndDate": int(doc[6]),
-        "ipfsHash": decode_bytes32(doc[7]),
-        "TimeStamp": int(doc[8]),
-        "previousHash": previous_hash.hex() if isinstance(previous_hash, bytes) else str(previous_hash),
-    }
+        for fn, nonce in zip(calls, nonces):
+            sent.append(_send_transaction(fn, settings.FEE_URGENCY_SHARE, nonce))
+    except Exception as e:
+        for unused in nonces[len(sent) + 1:]:
+            nonce_manager.release(unused)
+        if sent:
+            raise PartialSendError(sent, e)
+        raise
+    finally:
+        read_cache.invalidate(doc_title, owner)
+    return sent
 
-def get_user_documents_on_chain(owner: str):
-    docs = contract.functions.getUserDocuments(int(owner)).call()
+def submit_access_document(doc_title: str, owner: str, action_type: int, last_access_date: int) -> list:
+    """Broadcast accessDocument without waiting; returns [(tx_hash, tx)]."""
+    fn = _access_document_call(doc_title, owner, action_type, last_access_date)
+    _check_preflight([fn])
+    sent = [_send_transaction(fn, settings.FEE_URGENCY_ACCESS)]
+    read_cache.invalidate(doc_title, owner)
+    return sent
+
+def _build_batch(items: list, build) -> list:
+    """Build every item's [(fn, urgency)] up front so an invalid item rejects the batch before anything is sent."""
+    item_calls = []
+    for i, item in enumerate(items):
+        try:
+            item_calls.append(build(*item))
+        except ValueError as e:
+            raise ValueError(f"Item {i}: {e}")
+    return item_calls
+
+def _send_batch(items: list, item_calls: list) -> list:
+    """
+    Broadcast every runnable item's calls back-to-back; returns per item [(tx_hash, tx), ...]
+    or an exception. Items that would revert are found with one batched preflight and not sent.
+    """
+    checks = iter(preflight([fn for calls in item_calls if not isinstance(calls, Exception) for fn, _ in calls]))
+    for i, calls in enumerate(item_calls):
+        if not isinstance(calls, Exception):
+            reverts = [r for r in [next(checks) for _ in calls] if r is not None]
+            if reverts:
+                item_calls[i] = reverts[0]
+    flat = [call for calls in item_calls if not isinstance(calls, Exception) for call in calls]
+    sent = iter(send_many(flat))
     results = []
-    for d in docs:
-        results.append({
-            "DocTitle": decode_bytes32(d[0]),
-            "Owner": int(d[1]),  # Owner is now uint64
-            "LastAccessDate": int(d[2]),
-            "LastAccessedBy": decode_bytes32(d[3]),
-            "action": int(d[4]),
-            "SharedUser": decode_bytes32(d[5]),
-            "SharedEndDate": int(d[6]),
-            "ipfsHash": decode_bytes32(d[7]),
-            "TimeStamp": int(d[8]),
-        })
+    for (doc_title, owner, *_), calls in zip(items, item_calls):
+        if isinstance(calls, Exception):
+            results.append(calls)
+            continue
+        item_sent = [next(sent) for _ in calls]
+        failed = next((r for r in item_sent if isinstance(r, Exception)), None)
+        results.append(failed or item_sent)
+        read_cache.invalidate(doc_title, owner)
     return results
 
-def get_document_history_on_chain(doc_title: str, owner: str):
-    hist = contract.functions.getDocumentHistory(
-        encode_bytes32(doc_title),
-        int(owner)
-    ).call()
+def submit_create_documents(items: list) -> list:
+    """
+    Pipelined createDocument for [(doc_title, owner, last_access_date, ipfs_hash), ...].
+    Titles that already exist are reported per item instead of being sent.
+    """
+    item_calls = _build_batch(items, lambda *item: [(_create_document_call(*item), settings.FEE_URGENCY_CREATE)])
+    return _send_batch(items, item_calls)
+
+def submit_access_documents(items: list) -> list:
+    """Pipelined accessDocument for [(doc_title, owner, action_type, last_access_date), ...]."""
+    item_calls = _build_batch(items, lambda *item: [(_access_document_call(*item), settings.FEE_URGENCY_ACCESS)])
+    return _send_batch(items, item_calls)
+
+def submit_share_documents(items: list) -> list:
+    """Pipelined shareDocument for [(doc_title, owner, shared_user, permissions, shared_end_date, last_access_date), ...]."""
+    item_calls = _build_batch(items, lambda *item: [(fn, settings.FEE_URGENCY_SHARE) for fn in _share_document_calls(*item)])
+    return _send_batch(items, item_calls)
+
+def create_document_on_chain(doc_title: str, owner: str, last_access_date: int, ipfs_hash: str):
+    tx_hash, _ = submit_create_document(doc_title, owner, last_access_date, ipfs_hash)[0]
+    receipt = wait_for_receipt(tx_hash)
+    read_cache.invalidate(doc_title, owner)
+    return receipt
+
+def share_document_on_chain(doc_title: str, owner: str, shared_user: str, permissions: str, shared_end_date: int | None, last_access_date: int):
+    """permissions: 'view', 'download', or 'both'. 'both' is two transactions sent
+    back-to-back and awaited together."""
+    sent = submit_share_document(doc_title, owner, shared_user, permissions, shared_end_date, last_access_date)
+    receipts = wait_for_receipts([tx_hash for tx_hash, _ in sent], poll_interval=0.1)
+    read_cache.invalidate(doc_title, owner)
+    for receipt in receipts:
+        if isinstance(receipt, Exception):
+            raise receipt
+    return receipts if len(receipts) > 1 else receipts[0]
+
+def access_document_on_chain(doc_title: str, owner: str, action_type: int, last_access_date: int):
+    tx_hash, _ = submit_access_document(doc_title, owner, action_type, last_access_date)[0]
+    receipt = wait_for_receipt(tx_hash)
+    read_cache.invalidate(doc_title, owner)
+    return receipt
+
+def _read(name: str, *args):
+    """A view call encoded by the raw codec, for batch_read / _call."""
+    return codec.call(name, *args)
+
+def _call(name: str, *args, block_identifier="latest"):
+    """One view call through the raw codec (eth_call, struct-decoded result)."""
+    call = _read(name, *args)
+    return call.decode(bytes(w3.eth.call({"to": contract.address, "data": "0x" + call.data.hex()}, block_identifier)))
+
+def batch_read(calls: list, block_identifier="latest") -> list:
+    """
+    Execute several view calls (from _read) as eth_calls in a single JSON-RPC batch.
+    Returns the decoded output per call (unwrapped when the function has a single
+    output), or the exception for calls that reverted.
+    """
     results = []
-    for r in hist:
-        results.append({
-            "DocTitle": decode_bytes32(r[0]),
-            "Owner": int(r[1]),  # Owner is now uint64
-            "LastAccessDate": int(r[2]),
-            "LastAccessedBy": decode_bytes32(r[3]),
-            "action": int(r[4]),
-            "SharedUser": decode_bytes32(r[5]),
-            "SharedEndDate": int(r[6]),
-            "ipfsHash": decode_bytes32(r[7]),
-            "TimeStamp": int(r[8]),
-            "timestamp": int(r[9]),
-            "previousHash": r[10],
-        })
-    return results
\ No newline at end of file
+    for start in range(0, len(calls), settings.READ_BATCH_MAX):
+        chunk = calls[start:start + settings.READ_BATCH_MAX]
+        address = contract.address
+        raw = rpc_batch([
+            ("eth_call", [{"to": address, "data": "0x" + call.data.hex()}, block_identifier])
+            for call in chunk
+        ])
+        for call, value in zip(chunk, raw):
+            if isinstance(value, Exception):
+                reason = revert_reason(value)
+                results.append(value if reason is None else ContractRevert(reason))
+                continue
+            try:
+                results.append(call.decode(_as_bytes(value)))
+            except Exception as e:
+                results.append(RuntimeError(f"Could not decode {call.fn_name} result (no data?): {e}"))
+    return results
+
+def _document_calls(doc_title: str, owner) -> list:
+    # documentHistory(title) is the latest ActionRecord; it carries previousHash without walking the history
+    title = encode_bytes32(doc_title)
+    return [_read("getDocument", title, int(owner)), _read("documentHistory", title)]
+
+def _decode_document(doc, latest_record) -> ActionBlock:
+    if isinstance(doc, Exception):
+        raise doc
+    return ActionBlock(doc, previous_hash=b'' if isinstance(latest_record, Exception) else latest_record[10])
+
+@read_cache.cached("getDocument")
+def get_document_on_chain(doc_title: str, owner: str):
+    doc, latest_record = batch_read(_document_calls(doc_title, owner))
+    return _decode_document(doc, latest_record)
+
+def get_documents_on_chain(owner: str, doc_titles: list) -> list:
+    """
+    Fetch several documents of one owner in a single round-trip. Returns one entry per
+    title, in order: the document's ActionBlock, or {"DocTitle": ..., "error": ...} if it failed.
+    """
+    calls = []
+    for title in doc_titles:
+        calls.extend(_document_calls(title, owner))
+    results = batch_read(calls)
+    documents = []
+    for i, title in enumerate(doc_titles):
+        try:
+            documents.append(_decode_document(results[2 * i], results[2 * i + 1]))
+        except Exception as e:
+            documents.append({"DocTitle": title, "error": str(e)})
+    return documents
+
+def get_document_histories_on_chain(owner: str, doc_titles: list) -> list:
+    """Histories (newest first) of several documents of one owner in a single round-trip;
+    per title the list of ActionBlocks, or the exception if the read failed."""
+    results = batch_read([
+        _read("getDocumentHistory", encode_bytes32(title), int(owner)) for title in doc_titles
+    ])
+    return [r if isinstance(r, Exception) else [ActionBlock.from_record(x) for x in r] for r in results]
+
+def get_owner_titles_and_document_on_chain(doc_title: str, owner: str):
+    """(owner's DocTitles, document ActionBlock) from one batched round-trip; raises if the document read reverts."""
+    titles, doc, latest_record = batch_read(
+        [_read("getUserDocuments", int(owner))] + _document_calls(doc_title, owner)
+    )
+    if isinstance(titles, Exception):
+        raise titles
+    return [decode_bytes32(d[0]) for d in titles], _decode_document(doc, latest_record)
+
+def get_owner_titles_and_history_on_chain(doc_title: str, owner: str):
+    """(owner's DocTitles, history records) from one batched round-trip; raises if either read reverts."""
+    history, titles = batch_read([
+        _read("getDocumentHistory", encode_bytes32(doc_title), int(owner)),
+        _read("getUserDocuments", int(owner)),
+    ])
+    for result in (history, titles):
+        if isinstance(result, Exception):
+            raise result
+    return [decode_bytes32(d[0]) for d in titles], [ActionBlock.from_record(r) for r in history]
+
+@read_cache.cached("getUserDocuments", owner_only=True)
+def get_user_documents_on_chain(owner: str):
+    docs = _call("getUserDocuments", int(owner))
+    return [ActionBlock(d) for d in docs]
+
+@read_cache.cached("getDocumentHistory")
+def get_document_history_on_chain(doc_title: str, owner: str):
+    hist = _call("getDocumentHistory", encode_bytes32(doc_title), int(owner))
+    return [ActionBlock.from_record(r) for r in hist]
+
+def get_document_history_page_on_chain(doc_title: str, owner: str, cursor: bytes | None, limit: int):
+    """
+    One page of a document's history, newest first: (records, next_cursor). The cursor is
+    the hash of the first record of the page (None for the latest record); next_cursor is
+    None after the oldest record. Pages are sliced from the (cached) full history read.
+    """
+    history = get_document_history_on_chain(doc_title, owner)
+    start = 0
+    if cursor is not None:
+        # A record's hash is the previousHash of the record after it (newest first)
+        start = next((i for i in range(1, len(history)) if history[i - 1].previousHash == cursor), None)
+        if start is None:
+            raise ContractRevert("Invalid cursor")
+    records = history[start:start + limit]
+    next_cursor = records[-1].previousHash
+    return records, (next_cursor if any(next_cursor) else None)
+
+def get_user_documents_page_on_chain(owner: str, offset: int, limit: int):
+    """
+    One page of an owner's documents in creation order: (docs, next_offset, total).
+    next_offset is None on the last page. Pages are sliced from the (cached) getUserDocuments
+    read, so their blocks are the full listing's, TimeStamp included.
+    """
+    docs = get_user_documents_on_chain(owner)
+    next_offset = offset + limit if offset + limit < len(docs) else None
+    return docs[offset:offset + limit], next_offset, len(docs)
+
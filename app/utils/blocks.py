@@ -0,0 +1,153 @@
+import json
+from collections.abc import Mapping
+from typing import Optional
+
+from app.utils.ipfs import decode_ipfs_hash
+
+ACTION_ENUM = [
+    "Created", "Shared", "Viewed", "Downloaded", "Shared_view", "Shared_download"
+]
+
+# C-accelerated JSON string escaping, as json.dumps(ensure_ascii=False) does it
+_json_str = json.encoder.encode_basestring
+
+_KEYS = (
+    "DocTitle", "Owner", "LastAccessDate", "LastAccessedBy", "action",
+    "SharedUser", "SharedEndDate", "ipfsHash", "TimeStamp",
+)
+
+
+def _text(value: bytes) -> str:
+    return bytes(value).rstrip(b"\0").decode("utf-8")
+
+
+class ActionBlock(Mapping):
+    """
+    One ActionRecord (or the 9-field document view of one), decoded once from the contract
+    tuple, an event or an index row. The API block — LastAccessedBy resolved per action,
+    the action name and blockHash — is derived from it on demand; the hash and the JSON
+    are computed at most once. Instances held by the read cache are shared between
+    requests and must not be modified.
+
+    Also a read-only mapping with the keys of the record dicts it replaces
+    (timestamp and previousHash only when known).
+    """
+
+    __slots__ = (
+        "DocTitle", "Owner", "LastAccessDate", "LastAccessedBy", "action", "SharedUser",
+        "SharedEndDate", "TimeStamp", "timestamp", "previousHash", "_ipfs", "_hash", "_json",
+    )
+
+    def __init__(self, fields, timestamp: Optional[int] = None, previous_hash: Optional[bytes] = None):
+        """`fields` are the first nine ActionRecord values in contract order (bytes32 as bytes)."""
+        self.DocTitle = _text(fields[0])
+        self.Owner = int(fields[1])
+        self.LastAccessDate = int(fields[2])
+        self.LastAccessedBy = _text(fields[3])
+        self.action = int(fields[4])
+        self.SharedUser = _text(fields[5])
+        self.SharedEndDate = int(fields[6])
+        self._ipfs = bytes(fields[7])
+        self.TimeStamp = int(fields[8])
+        self.timestamp = timestamp
+        self.previousHash = None if previous_hash is None else bytes(previous_hash)
+        self._hash = None
+        self._json = None
+
+    @classmethod
+    def from_record(cls, r) -> "ActionBlock":
+        """From a full 11-field ActionRecord tuple."""
+        return cls(r, int(r[9]), r[10])
+
+    @property
+    def ipfsHash(self) -> str:
+        return decode_ipfs_hash(self._ipfs)
+
+    # ---------------- Mapping view ----------------
+
+    def __getitem__(self, key):
+        if key in _KEYS or (key in ("timestamp", "previousHash") and getattr(self, key) is not None):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        yield from _KEYS
+        if self.timestamp is not None:
+            yield "timestamp"
+        if self.previousHash is not None:
+            yield "previousHash"
+
+    def __len__(self) -> int:
+        return len(_KEYS) + (self.timestamp is not None) + (self.previousHash is not None)
+
+    def __repr__(self) -> str:
+        return f"ActionBlock({self.DocTitle!r}, Owner={self.Owner}, action={self.action}, TimeStamp={self.TimeStamp})"
+
+    # ---------------- API block ----------------
+
+    def record_fields(self) -> tuple:
+        """ActionRecord tuple in contract field order, as hashed by _computeHash."""
+        return (
+            self.DocTitle.encode("utf-8").ljust(32, b"\0"), self.Owner, self.LastAccessDate,
+            self.LastAccessedBy.encode("utf-8").ljust(32, b"\0"), self.action,
+            self.SharedUser.encode("utf-8").ljust(32, b"\0"), self.SharedEndDate, self._ipfs,
+            self.TimeStamp, self.TimeStamp if self.timestamp is None else self.timestamp,
+            self.previousHash or b"\0" * 32,
+        )
+
+    @property
+    def action_name(self) -> str:
+        return ACTION_ENUM[self.action] if 0 <= self.action < len(ACTION_ENUM) else str(self.action)
+
+    @property
+    def accessed_by(self) -> str:
+        # Created: the owner; Shared*: the shared user; Viewed/Downloaded: as recorded, else the owner
+        if self.action == 0:
+            return str(self.Owner)
+        if self.action in (1, 4, 5):
+            return self.SharedUser
+        if self.action in (2, 3) and not self.LastAccessedBy:
+            return str(self.Owner)
+        return self.LastAccessedBy
+
+    @property
+    def previous_hash_hex(self) -> str:
+        return self.previousHash.hex() if self.previousHash else ""
+
+    @property
+    def block_hash(self) -> str:
+        """keccak256 over the concatenated API fields (not the contract's record hash)."""
+        if self._hash is None:
+            from eth_utils import keccak
+            time_text = self.TimeStamp if self.timestamp is None else self.timestamp
+            self._hash = "0x" + keccak(text=(
+                f"{self.DocTitle}{self.Owner}{self.LastAccessDate}{self.accessed_by}{self.action_name}"
+                f"{self.SharedUser}{self.SharedEndDate}{time_text}{self.previous_hash_hex}"
+            )).hex()
+        return self._hash
+
+    def to_dict(self) -> dict:
+        return {
+            "DocTitle": self.DocTitle,
+            "Owner": str(self.Owner),
+            "LastAccessDate": self.LastAccessDate,
+            "LastAccessedBy": self.accessed_by,
+            "action": self.action_name,
+            "SharedUser": self.SharedUser,
+            "SharedEndDate": self.SharedEndDate,
+            "TimeStamp": self.TimeStamp,
+            "previousHash": self.previous_hash_hex,
+            "blockHash": self.block_hash,
+        }
+
+    def to_json(self) -> str:
+        """to_dict() as compact JSON, built directly rather than through a dict."""
+        if self._json is None:
+            self._json = (
+                f'{{"DocTitle":{_json_str(self.DocTitle)},"Owner":"{self.Owner}",'
+                f'"LastAccessDate":{self.LastAccessDate},"LastAccessedBy":{_json_str(self.accessed_by)},'
+                f'"action":{_json_str(self.action_name)},"SharedUser":{_json_str(self.SharedUser)},'
+                f'"SharedEndDate":{self.SharedEndDate},"TimeStamp":{self.TimeStamp},'
+                f'"previousHash":"{self.previous_hash_hex}","blockHash":"{self.block_hash}"}}'
+            )
+        return self._json
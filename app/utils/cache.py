@@ -0,0 +1,141 @@
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ReadCache:
+    """
+    Bounded LRU cache for contract reads, keyed by (function, DocTitle, Owner).
+
+    Entries expire after `ttl` seconds (0 disables the TTL). The chain head is checked at
+    most every `head_poll_interval` seconds; when it advances, `fetch_touched` reports which
+    (DocTitle, Owner) pairs the new blocks touched and only those entries are dropped. If
+    that lookup fails, or the head jumped more than `max_head_gap` blocks, everything is.
+
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, head_poll_interval: float, max_head_gap: int,
+                 fetch_head: Callable[[], int],
+                 fetch_touched: Callable[[int, int], Iterable[Tuple[str, int]]]):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.head_poll_interval = head_poll_interval
+        self.max_head_gap = max_head_gap
+        self._fetch_head = fetch_head
+        self._fetch_touched = fetch_touched
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._head: Optional[int] = None
+        self._head_checked = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def cached(self, name: str, owner_only: bool = False):
+        """Decorate fn(doc_title, owner) — or fn(owner) when `owner_only` — with this cache."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args):
+                if owner_only:
+                    key = (name, None, int(args[0]))
+                else:
+                    key = (name, args[0], int(args[1]))
+                found, value = self.get(key)
+                if found:
+                    return value
+                value = fn(*args)
+                self.put(key, value)
+                return value
+            return wrapper
+        return decorator
+
+    def get(self, key):
+        if self.max_entries <= 0:
+            return False, None
+        self._check_head()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (not self.ttl or time.monotonic() - entry[1] < self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, doc_title: Optional[str] = None, owner=None) -> None:
+        """Drop entries for a title (any function) and the owner's document listing."""
+        owner = int(owner) if owner is not None else None
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if (doc_title is not None and key[1] == doc_title) or (owner is not None and key[1] is None and key[2] == owner)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def _check_head(self) -> None:
+        now = time.monotonic()
+        if now - self._head_checked < self.head_poll_interval:
+            return
+        with self._lock:
+            if now - self._head_checked < self.head_poll_interval:
+                return
+            self._head_checked = now
+            previous = self._head
+        try:
+            head = int(self._fetch_head())
+        except Exception as e:
+            logger.warning(f"Read cache head check failed, clearing cache: {e}")
+            self.clear()
+            return
+        self._head = head
+        if previous is None or head <= previous:
+            if previous is not None and head < previous:
+                self.clear()  # Head went backwards: reorg
+            return
+        if head - previous > self.max_head_gap:
+            self.clear()
+            return
+        try:
+            touched = list(self._fetch_touched(previous + 1, head))
+        except Exception as e:
+            logger.warning(f"Read cache log scan failed, clearing cache: {e}")
+            self.clear()
+            return
+        for doc_title, owner in touched:
+            self.invalidate(doc_title, owner)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations,
+            "head": self._head,
+        }
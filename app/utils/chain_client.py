@@ -0,0 +1,65 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+
+
+class ChainTimeout(TimeoutError):
+    pass
+
+
+class ChainClient:
+    """
+    Runs the synchronous web3 helpers on a bounded thread pool so async routes never
+    block the event loop on an RPC round-trip or a receipt wait.
+    """
+
+    def __init__(self, max_workers: int, call_timeout: float, receipt_timeout: float):
+        self.max_workers = max_workers
+        self.call_timeout = call_timeout
+        self.receipt_timeout = receipt_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chain")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    async def call(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a read (or send-only) helper off the loop, bounded by `call_timeout`."""
+        return await self._run(fn, args, kwargs, timeout or self.call_timeout)
+
+    async def transact(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a helper that waits for a receipt; allows for the receipt timeout on top."""
+        return await self._run(fn, args, kwargs, timeout or (self.call_timeout + self.receipt_timeout))
+
+    async def _run(self, fn: Callable, args: tuple, kwargs: dict, timeout: float) -> Any:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise ChainTimeout(f"Blockchain call {getattr(fn, '__name__', fn)} timed out after {timeout:g}s")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "in_flight": self._in_flight,
+            "call_timeout": self.call_timeout,
+            "receipt_timeout": self.receipt_timeout,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+chain_client = ChainClient(
+    max_workers=settings.CHAIN_MAX_WORKERS,
+    call_timeout=settings.CHAIN_CALL_TIMEOUT,
+    receipt_timeout=settings.CHAIN_RECEIPT_TIMEOUT,
+)
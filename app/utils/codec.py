@@ -0,0 +1,201 @@
+"""
+Raw eth_call codec for the contract's view functions.
+
+Every field of Document and ActionRecord is a static bytes32 / uint64 / uint8, so return
+data is a fixed layout of 32-byte words. Per function the selector, the argument encoders
+and a struct format for the outputs are compiled once from the ABI; calldata is then a
+selector plus packed words, and results are unpacked with struct straight from the
+buffer instead of going through web3 and eth_abi on every call. Output types without a
+struct layout fall back to eth_abi for that function.
+"""
+import struct
+from typing import Callable, Dict, List, Optional
+
+WORD = 32
+
+# Big-endian struct codes for one ABI word: bytes32 as-is, small uints from the low bytes
+_WORD_FORMATS = {
+    "bytes32": "32s",
+    "bool": "31x?",
+    "uint8": "31xB",
+    "uint16": "30xH",
+    "uint32": "28xI",
+    "uint64": "24xQ",
+    "uint256": "32s",  # converted with int.from_bytes after unpacking
+}
+
+
+class _Layout:
+    """struct layout of consecutive static words (a tuple's fields, or one scalar)."""
+
+    def __init__(self, types: List[str], scalar: bool):
+        self.struct = struct.Struct(">" + "".join(_WORD_FORMATS[t] for t in types))
+        self.size = self.struct.size
+        self.big_ints = [i for i, t in enumerate(types) if t == "uint256"]
+        self.scalar = scalar
+
+    def _convert(self, values: tuple):
+        if self.big_ints:
+            values = list(values)
+            for i in self.big_ints:
+                values[i] = int.from_bytes(values[i], "big")
+            values = tuple(values)
+        return values[0] if self.scalar else values
+
+    def unpack(self, view: memoryview, offset: int):
+        return self._convert(self.struct.unpack_from(view, offset))
+
+    def unpack_array(self, view: memoryview, offset: int, count: int) -> list:
+        body = view[offset:offset + count * self.size]
+        if len(body) != count * self.size:
+            raise ValueError("array runs past the end of the return data")
+        if not self.big_ints and not self.scalar:
+            return list(self.struct.iter_unpack(body))
+        return [self._convert(v) for v in self.struct.iter_unpack(body)]
+
+
+def _static_types(output: dict) -> Optional[List[str]]:
+    """Word types of a static output (scalar or tuple of scalars), None if unsupported."""
+    if output["type"] == "tuple":
+        types = [c["type"] for c in output["components"]]
+    else:
+        types = [output["type"]]
+    return types if all(t in _WORD_FORMATS for t in types) else None
+
+
+class _Function:
+    __slots__ = ("name", "selector", "encoders", "decode")
+
+    def __init__(self, name: str, selector: bytes, encoders: list, decode: Callable[[bytes], object]):
+        self.name = name
+        self.selector = selector
+        self.encoders = encoders
+        self.decode = decode
+
+
+def _encoder(abi_type: str) -> Callable:
+    if abi_type == "bytes32":
+        def encode(value) -> bytes:
+            value = bytes(value)
+            if len(value) != WORD:
+                raise ValueError(f"bytes32 argument must be 32 bytes, got {len(value)}")
+            return value
+        return encode
+    if abi_type.startswith("uint"):
+        bits = int(abi_type[4:] or 256)
+
+        def encode(value) -> bytes:
+            value = int(value)
+            if not 0 <= value < 1 << bits:
+                raise ValueError(f"{value} does not fit {abi_type}")
+            return value.to_bytes(WORD, "big")
+        return encode
+    if abi_type == "bool":
+        return lambda value: (b"\0" * 31) + (b"\1" if value else b"\0")
+    return None
+
+
+def _decoder(name: str, outputs: list) -> Callable[[bytes], object]:
+    """Compile the outputs into one function from return data to value(s), as batch_read returns them."""
+    parts = []  # (head offset, layout, is_array)
+    head = 0
+    for output in outputs:
+        if output["type"].endswith("[]"):
+            element = dict(output, type=output["type"][:-2])
+            types = _static_types(element)
+            if types is None:
+                return None
+            parts.append((head, _Layout(types, scalar=element["type"] != "tuple"), True))
+            head += WORD
+        else:
+            types = _static_types(output)
+            if types is None:
+                return None
+            parts.append((head, _Layout(types, scalar=output["type"] != "tuple"), False))
+            head += len(types) * WORD
+    # A function whose outputs are all scalars (public getters) returns them as one flat layout
+    if len(parts) > 1 and all(not p[2] and p[1].scalar for p in parts):
+        flat = _Layout([o["type"] for o in outputs], scalar=False)
+        parts = [(0, flat, False)]
+        single = True
+    else:
+        single = len(parts) == 1
+
+    def decode(data: bytes):
+        view = memoryview(data)
+        if len(view) < head:
+            raise ValueError(f"{len(view)} bytes of return data for {name}, expected at least {head}")
+        values = []
+        try:
+            for offset, layout, is_array in parts:
+                if not is_array:
+                    values.append(layout.unpack(view, offset))
+                    continue
+                start = int.from_bytes(view[offset:offset + WORD], "big")
+                count = int.from_bytes(view[start:start + WORD], "big")
+                values.append(layout.unpack_array(view, start + WORD, count))
+        except struct.error as e:
+            raise ValueError(f"Malformed return data for {name}: {e}")
+        return values[0] if single else tuple(values)
+    return decode
+
+
+def _eth_abi_decoder(outputs: list) -> Callable[[bytes], object]:
+    def decode(data: bytes):
+        from eth_abi import decode as abi_decode
+        from eth_utils.abi import collapse_if_tuple
+        types = [collapse_if_tuple(o) for o in outputs]
+        decoded = abi_decode(types, bytes(data))
+        return decoded[0] if len(types) == 1 else decoded
+    return decode
+
+
+class ContractCodec:
+    """Selectors, calldata encoders and output decoders for every function in an ABI, compiled once."""
+
+    def __init__(self, abi: list):
+        from eth_utils import function_abi_to_4byte_selector
+        self._functions: Dict[str, _Function] = {}
+        self.input_counts: Dict[str, int] = {}
+        for entry in abi:
+            if entry.get("type") != "function":
+                continue
+            name = entry["name"]
+            inputs = entry.get("inputs", [])
+            outputs = entry.get("outputs", [])
+            self.input_counts[name] = len(inputs)
+            encoders = [_encoder(i["type"]) for i in inputs]
+            self._functions[name] = _Function(
+                name,
+                function_abi_to_4byte_selector(entry),
+                None if None in encoders else encoders,
+                _decoder(name, outputs) or _eth_abi_decoder(outputs),
+            )
+
+    def selector(self, name: str) -> bytes:
+        return self._functions[name].selector
+
+    def encode(self, name: str, *args) -> bytes:
+        fn = self._functions[name]
+        if fn.encoders is None:
+            raise ValueError(f"{name} has arguments the raw codec cannot encode")
+        if len(args) != len(fn.encoders):
+            raise ValueError(f"{name} takes {len(fn.encoders)} arguments, got {len(args)}")
+        return fn.selector + b"".join(encode(arg) for encode, arg in zip(fn.encoders, args))
+
+    def decode(self, name: str, data: bytes):
+        return self._functions[name].decode(data)
+
+    def call(self, name: str, *args) -> "RawCall":
+        return RawCall(name, self.encode(name, *args), self._functions[name].decode)
+
+
+class RawCall:
+    """One encoded view call: `data` to send, `decode` for the return data."""
+
+    __slots__ = ("fn_name", "data", "decode")
+
+    def __init__(self, fn_name: str, data: bytes, decode: Callable[[bytes], object]):
+        self.fn_name = fn_name
+        self.data = data
+        self.decode = decode
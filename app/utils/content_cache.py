@@ -0,0 +1,332 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from app.core.config import settings
+from app.utils.ipfs import CHUNK_SIZE, CidBuilder, leaf_nodes
+from app.utils.offload import cpu_pool
+from app.utils.transport import upstream_session
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    cid TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS partials (
+    path TEXT PRIMARY KEY,
+    started_at REAL NOT NULL
+);
+"""
+
+_READ_CHUNK = 1024 * 1024
+_PARTIAL_MAX_AGE = 3600  # Seconds before an unfinished download is considered abandoned
+
+
+class ContentMismatchError(RuntimeError):
+    """The fetched bytes do not hash to the CID they were requested as."""
+
+
+def gateway_download(cid: str) -> Iterator[bytes]:
+    """Stream `cid` from the configured IPFS gateway."""
+    url = settings.IPFS_GATEWAY_URL.rstrip("/") + "/" + cid
+    with upstream_session("ipfs-gateway").get(url, stream=True) as response:
+        if response.status_code == 404:
+            raise FileNotFoundError(f"{cid} is not available from the IPFS gateway")
+        response.raise_for_status()
+        length = response.headers.get("Content-Length")
+        if length is not None and settings.MAX_FILE_SIZE and int(length) > settings.MAX_FILE_SIZE:
+            raise ValueError(f"{cid} is {length} bytes; the limit is {settings.MAX_FILE_SIZE}")
+        yield from response.iter_content(_READ_CHUNK)
+
+
+class ContentCache:
+    """
+    Size-bounded LRU of IPFS content on local disk, stored as <root>/<cid[:2]>/<cid>.
+
+    The index (CID -> size, last access) lives in SQLite and is loaded into an ordered
+    dict at startup, so nothing ever lists the cache directory. A hit only moves the
+    entry in memory; access times reach SQLite in batches from the janitor thread,
+    which also evicts down to `max_bytes`, re-checks `janitor_batch` entries per tick
+    for files removed behind its back, and deletes abandoned partial downloads.
+
+    Misses are fetched with `download(cid)` into a partial file, which is moved into place
+    only if its CIDv0 matches the requested CID; concurrent misses for one CID share a
+    single download. Callers hold a lease on the entry while serving it (`acquire` /
+    `release`) so eviction never removes a file that is being sent.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        db_path: str,
+        max_bytes: int,
+        download: Callable[[str], Iterable[bytes]],
+        max_file_size: int = 0,
+        janitor_interval: float = 30,
+        janitor_batch: int = 500,
+    ):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self.janitor_interval = janitor_interval
+        self.janitor_batch = janitor_batch
+        self._download = download
+        os.makedirs(self.root, exist_ok=True)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict(
+            self._conn.execute("SELECT cid, size FROM entries ORDER BY last_access")
+        )
+        self._bytes = sum(self._entries.values())
+        self._dirty: Dict[str, float] = {}
+        self._leases: Dict[str, int] = {}
+        self._in_flight: Dict[str, Future] = {}
+        self._check_cursor = ""
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.fetch_errors = 0
+        self.missing_files = 0
+
+    def path(self, cid: str) -> str:
+        return os.path.join(self.root, cid[:2], cid)
+
+    # ---------------- Serving ----------------
+
+    def acquire(self, cid: str) -> str:
+        """Local path of `cid`, downloading it on a miss. Pair with `release(cid)` once served."""
+        path = self.path(cid)
+        while True:
+            with self._lock:
+                if cid in self._entries:
+                    self._entries.move_to_end(cid)
+                    self._dirty[cid] = time.time()
+                    self._leases[cid] = self._leases.get(cid, 0) + 1
+                    future = None
+                else:
+                    future = self._in_flight.get(cid)
+                    owner = future is None
+                    if owner:
+                        future = self._in_flight[cid] = Future()
+            if future is None:
+                if os.path.exists(path):
+                    self.hits += 1
+                    return path
+                # Removed outside the cache (or by another worker process): fetch it again
+                self._forget(cid, leased=True)
+                continue
+            if not owner:
+                self.coalesced += 1
+                future.result()
+                continue
+            self.misses += 1
+            try:
+                self._fetch(cid, path)
+                future.set_result(path)
+                return path
+            except BaseException as e:
+                self.fetch_errors += 1
+                future.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    self._in_flight.pop(cid, None)
+
+    def release(self, cid: str) -> None:
+        with self._lock:
+            leases = self._leases.get(cid, 0) - 1
+            if leases > 0:
+                self._leases[cid] = leases
+            else:
+                self._leases.pop(cid, None)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _fetch(self, cid: str, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        part = f"{path}.{uuid.uuid4().hex}.part"
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO partials (path, started_at) VALUES (?, ?)", (part, time.time()))
+        try:
+            size = 0
+            builder = CidBuilder(hash_leaves=False)
+            with open(part, "wb") as f:
+                for chunk in self._download(cid):
+                    size += len(chunk)
+                    if self.max_file_size and size > self.max_file_size:
+                        raise ValueError(f"{cid} exceeds the {self.max_file_size} byte limit")
+                    builder.update(chunk)
+                    f.write(chunk)
+                    batch = builder.take_chunks(cpu_pool.batch_size(CHUNK_SIZE))
+                    if batch:
+                        builder.add_leaves(cpu_pool.run(leaf_nodes, batch))
+            if builder.cid() != cid:
+                # Never store (and serve as immutable) bytes under a CID they do not hash to
+                raise ContentMismatchError(f"Content fetched for {cid} hashes to {builder.cid()}")
+            now = time.time()
+            with self._lock:
+                # Row first: a crash before the rename leaves an entry the janitor drops,
+                # never a file the index does not know about
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO entries (cid, size, last_access) VALUES (?, ?, ?)", (cid, size, now)
+                    )
+                os.replace(part, path)
+                self._bytes += size - self._entries.get(cid, 0)
+                self._entries[cid] = size
+                self._entries.move_to_end(cid)
+                self._leases[cid] = self._leases.get(cid, 0) + 1
+                self._evict()
+        except BaseException:
+            try:
+                os.remove(part)
+            except OSError:
+                pass
+            raise
+        finally:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM partials WHERE path = ?", (part,))
+
+    def _evict(self) -> None:
+        # Caller holds the lock. Least recently used first; leased entries are skipped.
+        victims = []
+        excess = self._bytes - self.max_bytes
+        for cid, size in self._entries.items():
+            if excess <= 0:
+                break
+            if cid not in self._leases:
+                victims.append(cid)
+                excess -= size
+        for cid in victims:
+            self._remove(cid)
+            self.evictions += 1
+
+    def _remove(self, cid: str) -> None:
+        # Caller holds the lock
+        self._bytes -= self._entries.pop(cid)
+        self._dirty.pop(cid, None)
+        with self._conn:
+            self._conn.execute("DELETE FROM entries WHERE cid = ?", (cid,))
+        try:
+            os.remove(self.path(cid))
+        except FileNotFoundError:
+            pass
+
+    def _forget(self, cid: str, leased: bool = False) -> None:
+        # Drop the entry of a file that is gone; the janitor leaves entries being served alone
+        with self._lock:
+            if leased:
+                self._leases[cid] -= 1
+                if not self._leases[cid]:
+                    del self._leases[cid]
+            elif cid in self._leases:
+                return
+            if cid in self._entries:
+                self._remove(cid)
+                self.missing_files += 1
+
+    # ---------------- Janitor ----------------
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="content-cache-janitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.janitor_interval * 2)
+            self._thread = None
+        self._flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.janitor_interval):
+            try:
+                self.tidy()
+            except Exception as e:
+                logger.warning(f"Content cache janitor failed: {e}")
+
+    def tidy(self) -> None:
+        """One bounded janitor pass."""
+        self._flush()
+        with self._lock:
+            self._evict()
+        self._check_next()
+        self._clean_partials()
+
+    def _flush(self) -> None:
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            if dirty:
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE entries SET last_access = ? WHERE cid = ?", [(t, cid) for cid, t in dirty.items()]
+                    )
+
+    def _check_next(self) -> None:
+        # Keyset walk over the index, `janitor_batch` entries per tick, wrapping around
+        with self._lock:
+            cids = [row[0] for row in self._conn.execute(
+                "SELECT cid FROM entries WHERE cid > ? ORDER BY cid LIMIT ?", (self._check_cursor, self.janitor_batch)
+            )]
+            self._check_cursor = cids[-1] if len(cids) == self.janitor_batch else ""
+        for cid in cids:
+            if not os.path.exists(self.path(cid)):
+                self._forget(cid)
+
+    def _clean_partials(self) -> None:
+        with self._lock:
+            stale = [row[0] for row in self._conn.execute(
+                "SELECT path FROM partials WHERE started_at < ? LIMIT ?", (time.time() - _PARTIAL_MAX_AGE, self.janitor_batch)
+            )]
+        for part in stale:
+            try:
+                os.remove(part)
+            except FileNotFoundError:
+                pass
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM partials WHERE path = ?", (part,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "leased": len(self._leases),
+                "inFlight": len(self._in_flight),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "fetchErrors": self.fetch_errors,
+                "missingFiles": self.missing_files,
+            }
+
+
+content_cache = ContentCache(
+    root=settings.CONTENT_CACHE_DIR,
+    db_path=settings.CONTENT_CACHE_DB_PATH,
+    max_bytes=settings.CONTENT_CACHE_MAX_BYTES,
+    download=gateway_download,
+    max_file_size=settings.MAX_FILE_SIZE,
+    janitor_interval=settings.CONTENT_CACHE_JANITOR_INTERVAL,
+    janitor_batch=settings.CONTENT_CACHE_JANITOR_BATCH,
+)
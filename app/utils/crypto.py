@@ -0,0 +1,226 @@
+"""
+Chunked AES-256-GCM container for stored documents (a streaming AEAD in the style of
+Tink's AES-GCM-HKDF streaming).
+
+    header:  b"VLTC" | version (1) | chunk size (uint32 BE) | salt (32 random bytes) | nonce prefix (7 random bytes)
+    chunks:  AESGCM(plaintext chunk) + 16-byte tag, every chunk `chunk size` bytes except the last
+
+Each file is sealed under its own key, HKDF-SHA256(ENCRYPTION_KEY, salt), so one file's
+chunks are all a key ever encrypts and random nonce prefixes cannot collide across files.
+Chunk i uses nonce = prefix | i (uint32 BE) | 1 if it is the last chunk else 0, and the
+header as associated data, so reordered, dropped or truncated chunks fail to decrypt.
+Chunk i sits at a fixed offset, so any byte range can be decrypted on its own.
+
+Version 1 containers (no salt; every file under one key derived from ENCRYPTION_KEY) and
+Fernet tokens written before either format still decrypt. An explicit `key` replaces
+ENCRYPTION_KEY.
+"""
+import base64
+import functools
+import itertools
+import os
+import struct
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from app.core.config import settings
+
+MAGIC = b"VLTC"
+VERSION = 2
+TAG_SIZE = 16
+SALT_SIZE = 32
+_PREAMBLE = struct.Struct(">4sBI")  # Magic, version and chunk size, common to every version
+_HEADERS = {1: struct.Struct(">4sBI7s"), 2: struct.Struct(">4sBI32s7s")}
+MAX_HEADER_SIZE = max(h.size for h in _HEADERS.values())
+
+
+def _fernet_key(key=None) -> bytes:
+    key = key if key is not None else settings.ENCRYPTION_KEY
+    return key if isinstance(key, bytes) else key.encode()
+
+
+def _derive(fernet_key: bytes, salt: Optional[bytes], info: bytes) -> AESGCM:
+    return AESGCM(HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=info).derive(
+        base64.urlsafe_b64decode(fernet_key)
+    ))
+
+
+@functools.lru_cache(maxsize=4)
+def _v1_aead(fernet_key: bytes) -> AESGCM:
+    return _derive(fernet_key, None, b"vault chunked aes-256-gcm v1")
+
+
+def _file_aead(salt: bytes, key=None) -> AESGCM:
+    return _derive(_fernet_key(key), salt, b"vault chunked aes-256-gcm v2")
+
+
+def _fernet(key=None) -> Fernet:
+    return Fernet(_fernet_key(key))
+
+
+def _nonce(prefix: bytes, index: int, last: bool) -> bytes:
+    return prefix + struct.pack(">IB", index, 1 if last else 0)
+
+
+def _layout(data: bytes):
+    """(version, header size, chunk size) of a container starting with `data`."""
+    if len(data) < _PREAMBLE.size:
+        raise _corrupt(EOFError("short header"))
+    magic, version, chunk_size = _PREAMBLE.unpack_from(data)
+    if magic != MAGIC or version not in _HEADERS or chunk_size <= 0:
+        raise ValueError("Not a supported encrypted container")
+    if len(data) < _HEADERS[version].size:
+        raise _corrupt(EOFError("short header"))
+    return version, _HEADERS[version].size, chunk_size
+
+
+def _open(data: bytes, key=None):
+    """(header, AESGCM, chunk size, nonce prefix) of a container starting with `data`."""
+    version, header_size, chunk_size = _layout(data)
+    header = bytes(data[:header_size])
+    if version == 1:
+        prefix = _HEADERS[1].unpack(header)[3]
+        return header, _v1_aead(_fernet_key(key)), chunk_size, prefix
+    salt, prefix = _HEADERS[2].unpack(header)[3:]
+    return header, _file_aead(salt, key), chunk_size, prefix
+
+
+def _rechunk(chunks: Iterable[bytes], size: int) -> Iterator[bytes]:
+    """Re-slice arbitrary pieces into `size`-byte pieces (the last one may be shorter)."""
+    buf = bytearray()
+    for chunk in chunks:
+        view = memoryview(chunk)
+        if buf:
+            take = size - len(buf)
+            buf += view[:take]
+            view = view[take:]
+            if len(buf) < size:
+                continue
+            yield bytes(buf)
+            buf = bytearray()
+        while len(view) >= size:
+            yield bytes(view[:size])
+            view = view[size:]
+        buf += view
+    if buf:
+        yield bytes(buf)
+
+
+def _with_last(pieces: Iterator[bytes]) -> Iterator[tuple]:
+    """(piece, is_last) pairs, looking one piece ahead."""
+    previous = next(pieces, None)
+    for piece in pieces:
+        yield previous, False
+        previous = piece
+    if previous is not None:
+        yield previous, True
+
+
+def _corrupt(e: Exception) -> ValueError:
+    return ValueError(f"Encrypted content is corrupt, truncated or was encrypted with another key ({type(e).__name__})")
+
+
+def encrypt_stream(chunks: Iterable[bytes], chunk_size: Optional[int] = None, key=None) -> Iterator[bytes]:
+    """Encrypt plaintext pieces of any size; yields the header, then one ciphertext chunk at a time."""
+    chunk_size = chunk_size or settings.ENCRYPTION_CHUNK_SIZE
+    salt = os.urandom(SALT_SIZE)
+    prefix = os.urandom(7)
+    header = _HEADERS[VERSION].pack(MAGIC, VERSION, chunk_size, salt, prefix)
+    yield header
+    aead = _file_aead(salt, key)
+    emitted = False
+    for index, (piece, last) in enumerate(_with_last(_rechunk(chunks, chunk_size))):
+        yield aead.encrypt(_nonce(prefix, index, last), piece, header)
+        emitted = True
+    if not emitted:
+        yield aead.encrypt(_nonce(prefix, 0, True), b"", header)
+
+
+def decrypt_stream(chunks: Iterable[bytes], key=None) -> Iterator[bytes]:
+    """Decrypt a container (or a legacy Fernet token) from pieces of any size, one chunk at a time."""
+    chunks = iter(chunks)
+    head = bytearray()
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= MAX_HEADER_SIZE:
+            break
+    if not head.startswith(MAGIC):
+        # Fernet token from before the chunked format: it can only be decrypted whole
+        try:
+            yield _fernet(key).decrypt(bytes(head) + b"".join(chunks))
+        except InvalidToken as e:
+            raise _corrupt(e)
+        return
+    header, aead, chunk_size, prefix = _open(head, key)
+    body = itertools.chain([bytes(head[len(header):])], chunks)
+    decrypted = 0
+    try:
+        for index, (piece, last) in enumerate(_with_last(_rechunk(body, chunk_size + TAG_SIZE))):
+            yield aead.decrypt(_nonce(prefix, index, last), piece, header)
+            decrypted += 1
+    except InvalidTag as e:
+        raise _corrupt(e)
+    if not decrypted:
+        raise _corrupt(EOFError("no chunks"))
+
+
+def plaintext_size(f: BinaryIO) -> int:
+    """Decrypted size of a container file, from its length alone."""
+    _, header_size, chunk_size = _layout(_read_at(f, 0, MAX_HEADER_SIZE))
+    body = f.seek(0, os.SEEK_END) - header_size
+    chunks = max(1, -(-body // (chunk_size + TAG_SIZE)))
+    return body - chunks * TAG_SIZE
+
+
+def decrypt_range(f: BinaryIO, start: int, length: int, key=None) -> Iterator[bytes]:
+    """
+    Decrypt bytes [start, start + length) of a container file, touching only the chunks that
+    hold them. Legacy Fernet files are decrypted whole and sliced.
+    """
+    head = _read_at(f, 0, MAX_HEADER_SIZE)
+    if not head.startswith(MAGIC):
+        f.seek(0)
+        plaintext = b"".join(decrypt_stream(iter(lambda: f.read(1024 * 1024), b""), key))
+        yield plaintext[start:start + length]
+        return
+    header, aead, chunk_size, prefix = _open(head, key)
+    size = plaintext_size(f)
+    end = min(start + length, size)
+    if start >= end:
+        return
+    last_index = (size - 1) // chunk_size if size else 0
+    for index in range(start // chunk_size, (end - 1) // chunk_size + 1):
+        sealed = _read_at(f, len(header) + index * (chunk_size + TAG_SIZE), chunk_size + TAG_SIZE)
+        try:
+            plain = aead.decrypt(_nonce(prefix, index, index == last_index), sealed, header)
+        except InvalidTag as e:
+            raise _corrupt(e)
+        offset = index * chunk_size
+        yield plain[max(start - offset, 0):end - offset]
+
+
+def _read_at(f: BinaryIO, offset: int, size: int) -> bytes:
+    f.seek(offset)
+    return f.read(size)
+
+
+def encrypt_file(src: BinaryIO, dst: BinaryIO, chunk_size: Optional[int] = None, key=None) -> int:
+    """Stream-encrypt `src` into `dst`; returns the number of bytes written."""
+    chunk_size = chunk_size or settings.ENCRYPTION_CHUNK_SIZE
+    written = 0
+    for piece in encrypt_stream(iter(lambda: src.read(chunk_size), b""), chunk_size, key):
+        written += dst.write(piece)
+    return written
+
+
+def decrypt_file(src: BinaryIO, dst: BinaryIO, key=None) -> int:
+    """Stream-decrypt `src` (container or legacy Fernet) into `dst`; returns the plaintext size."""
+    written = 0
+    for piece in decrypt_stream(iter(lambda: src.read(1024 * 1024), b""), key):
+        written += dst.write(piece)
+    return written
@@ -0,0 +1,125 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.blockchain import upload_file
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pinned (
+    cid TEXT PRIMARY KEY,
+    pinned_cid TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    pinned_at INTEGER NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Stores written before entries were keyed by CID: sha256 -> pinned CID
+_MIGRATE_SHA256_PINS = """
+INSERT OR IGNORE INTO pinned (cid, pinned_cid, sha256, size, pinned_at, hits)
+    SELECT cid, cid, sha256, size, pinned_at, hits FROM pins;
+DROP TABLE pins;
+"""
+
+
+class DedupUploader:
+    """
+    Content-addressed front for IPFS uploads.
+
+    Callers pass each file's CIDv0 (and SHA-256), computed locally as it was received.
+    A persistent CID -> pinned CID table is consulted first and the upload is skipped
+    on a hit. Concurrent uploads of the same content are coalesced: the first caller
+    uploads, the others wait for its result.
+    """
+
+    def __init__(self, db_path: str, upload: Callable[[BinaryIO, str], str]):
+        self._upload = upload
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        if self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pins'").fetchone():
+            self._conn.executescript(_MIGRATE_SHA256_PINS)
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.uploads = 0
+
+    def upload(self, raw: BinaryIO, filename: str, cid: str, sha256: str, size: int) -> Tuple[str, bool]:
+        """
+        Upload `raw` unless content with CID `cid` is already pinned; returns (pinned CID,
+        deduplicated). `cid`, `sha256` and `size` describe the content and were computed
+        while it was received, so `raw` is only read when it is actually uploaded.
+        """
+        pinned = self.lookup(cid)
+        if pinned is not None:
+            return pinned, True
+
+        with self._lock:
+            future = self._in_flight.get(cid)
+            owner = future is None
+            if owner:
+                future = self._in_flight[cid] = Future()
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result(), True
+
+        try:
+            pinned = self._upload(raw, filename)
+            if not pinned:
+                raise RuntimeError("IPFS upload returned no CID")
+            if pinned != cid:
+                logger.warning(f"Pinned CID {pinned} differs from locally computed {cid}; keeping the pinned one")
+            self._record(cid, pinned, sha256, size)
+            future.set_result(pinned)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(cid, None)
+        return pinned, False
+
+    def lookup(self, cid: str) -> Optional[str]:
+        """The pinned CID of content whose local CID is `cid`, counting a hit; None if not pinned."""
+        with self._lock:
+            row = self._conn.execute("SELECT pinned_cid FROM pinned WHERE cid = ?", (cid,)).fetchone()
+            if row is not None:
+                self.hits += 1
+                with self._conn:
+                    self._conn.execute("UPDATE pinned SET hits = hits + 1 WHERE cid = ?", (cid,))
+        return row[0] if row else None
+
+    def _record(self, cid: str, pinned_cid: str, sha256: str, size: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pinned (cid, pinned_cid, sha256, size, pinned_at) VALUES (?, ?, ?, ?, ?)",
+                (cid, pinned_cid, sha256, size, int(time.time())),
+            )
+            self.uploads += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pinned").fetchone()
+            return {
+                "pins": count,
+                "pinnedBytes": total,
+                "hits": self.hits,
+                "coalesced": self.coalesced,
+                "uploads": self.uploads,
+            }
+
+
+dedup_uploader: Optional[DedupUploader] = None
+if settings.DEDUP_ENABLED:
+    dedup_uploader = DedupUploader(settings.DEDUP_DB_PATH, upload_file)
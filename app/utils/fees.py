@@ -0,0 +1,124 @@
+import logging
+import statistics
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Urgency profiles: tip percentile of the fee-history window and how many times the
+# next block's base fee maxFeePerGas covers (i.e. how many doublings it survives).
+FEE_PROFILES = {
+    "slow": {"percentile": 10, "base_multiplier": 1.25},
+    "standard": {"percentile": 50, "base_multiplier": 2.0},
+    "fast": {"percentile": 90, "base_multiplier": 3.0},
+}
+
+
+class FeeOracle:
+    """
+    Gas limits and fees for contract writes.
+
+    Gas limits are estimated once per contract function with the arguments of the first
+    call that needs one, padded by `gas_margin_percent`, and re-estimated every
+    `gas_refresh` seconds. If an estimate fails (e.g. the call would revert) the last
+    known value, or `default_gas`, is used and the node decides.
+
+    Fees come from a rolling `eth_feeHistory` window refreshed every `fee_refresh`
+    seconds: maxPriorityFeePerGas is the median of the profile's reward percentile and
+    maxFeePerGas adds `base_multiplier` times the next base fee. Chains without a base
+    fee get a legacy gasPrice from `eth_gasPrice` instead.
+    """
+
+    def __init__(self, estimate_gas: Callable, fetch_fee_history: Callable, fetch_gas_price: Callable[[], int],
+                 gas_refresh: float, gas_margin_percent: int, default_gas: int, fee_refresh: float,
+                 window: int, min_priority_fee: int, max_fee: int):
+        self._estimate_gas = estimate_gas
+        self._fetch_fee_history = fetch_fee_history
+        self._fetch_gas_price = fetch_gas_price
+        self.gas_refresh = gas_refresh
+        self.gas_margin_percent = gas_margin_percent
+        self.default_gas = default_gas
+        self.fee_refresh = fee_refresh
+        self.window = window
+        self.min_priority_fee = min_priority_fee
+        self.max_fee = max_fee
+        self._gas: Dict[str, tuple] = {}
+        self._fees: Optional[dict] = None
+        self._fees_at = 0.0
+        self._lock = threading.Lock()
+        self.estimates = 0
+        self.estimate_failures = 0
+
+    def tx_params(self, fn, urgency: str = "standard") -> dict:
+        """gas plus either EIP-1559 fee fields or gasPrice for a bound contract call."""
+        return {"gas": self.gas_for(fn), **self.fees_for(urgency)}
+
+    def gas_for(self, fn) -> int:
+        name = fn.fn_name
+        cached = self._gas.get(name)
+        if cached is not None and time.monotonic() - cached[1] < self.gas_refresh:
+            return cached[0]
+        try:
+            gas = int(self._estimate_gas(fn)) * (100 + self.gas_margin_percent) // 100
+        except Exception as e:
+            self.estimate_failures += 1
+            logger.debug(f"Gas estimate for {name} failed: {e}")
+            return cached[0] if cached is not None else self.default_gas
+        self.estimates += 1
+        self._gas[name] = (gas, time.monotonic())
+        return gas
+
+    def fees_for(self, urgency: str = "standard") -> dict:
+        profile = FEE_PROFILES.get(urgency)
+        if profile is None:
+            raise ValueError(f"Unknown fee urgency '{urgency}'; use one of {', '.join(FEE_PROFILES)}")
+        fees = self._current_fees()
+        if fees["base_fee"] is None:
+            gas_price = int(fees["gas_price"] * profile["base_multiplier"] / FEE_PROFILES["standard"]["base_multiplier"])
+            return {"gasPrice": min(max(gas_price, fees["gas_price"]), self.max_fee)}
+        tip = max(fees["tips"].get(profile["percentile"], 0), self.min_priority_fee)
+        max_fee = min(int(fees["base_fee"] * profile["base_multiplier"]) + tip, self.max_fee)
+        return {"maxFeePerGas": max_fee, "maxPriorityFeePerGas": min(tip, max_fee)}
+
+    def _current_fees(self) -> dict:
+        with self._lock:
+            if self._fees is not None and time.monotonic() - self._fees_at < self.fee_refresh:
+                return self._fees
+            percentiles = sorted({p["percentile"] for p in FEE_PROFILES.values()})
+            try:
+                history = self._fetch_fee_history(self.window, percentiles)
+                base_fees = history.get("baseFeePerGas") or []
+                # The last entry is the base fee of the next (pending) block
+                base_fee = int(base_fees[-1]) if base_fees and int(base_fees[-1]) > 0 else None
+                rewards = history.get("reward") or []
+                tips = {
+                    p: int(statistics.median(int(r[i]) for r in rewards)) if rewards else 0
+                    for i, p in enumerate(percentiles)
+                }
+                fees = {"base_fee": base_fee, "tips": tips, "gas_price": None}
+            except Exception as e:
+                logger.warning(f"eth_feeHistory failed, using legacy gas price: {e}")
+                fees = {"base_fee": None, "tips": {}, "gas_price": None}
+            if fees["base_fee"] is None:
+                try:
+                    fees["gas_price"] = int(self._fetch_gas_price())
+                except Exception as e:
+                    if self._fees is None:
+                        raise
+                    logger.warning(f"eth_gasPrice failed, keeping previous fees: {e}")
+                    return self._fees
+            self._fees, self._fees_at = fees, time.monotonic()
+            return fees
+
+    def stats(self) -> dict:
+        fees = self._fees or {}
+        return {
+            "baseFee": fees.get("base_fee"),
+            "gasPrice": fees.get("gas_price"),
+            "tips": {str(p): tip for p, tip in (fees.get("tips") or {}).items()},
+            "gasLimits": {name: gas for name, (gas, _) in self._gas.items()},
+            "estimates": self.estimates,
+            "estimateFailures": self.estimate_failures,
+            "profiles": FEE_PROFILES,
+        }
@@ -0,0 +1,346 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+from app.core.config import settings
+from app.utils.blockchain import w3, contract, encode_bytes32, decode_bytes32
+from app.utils.blocks import ActionBlock
+from app.utils.ownership import owner_index
+from app.utils.utils import ZERO_HASH, compute_record_hash
+
+logger = logging.getLogger(__name__)
+
+INDEXED_EVENTS = ("DocumentCreated", "DocumentShared", "DocumentAccessed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    doc_title BLOB NOT NULL,
+    owner INTEGER NOT NULL,
+    last_access_date INTEGER NOT NULL,
+    last_accessed_by BLOB NOT NULL,
+    action INTEGER NOT NULL,
+    shared_user BLOB NOT NULL,
+    shared_end_date INTEGER NOT NULL,
+    ipfs_hash BLOB NOT NULL,
+    timestamp INTEGER NOT NULL,
+    previous_hash BLOB NOT NULL,
+    record_hash BLOB NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE INDEX IF NOT EXISTS records_by_title ON records (doc_title, block_number, log_index);
+CREATE INDEX IF NOT EXISTS records_by_owner ON records (owner, action);
+CREATE TABLE IF NOT EXISTS blocks (number INTEGER PRIMARY KEY, hash BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+_RECORD_COLUMNS = (
+    "doc_title, owner, last_access_date, last_accessed_by, action, shared_user, "
+    "shared_end_date, ipfs_hash, timestamp, previous_hash"
+)
+
+_LATEST_COLUMNS = ", ".join("r." + c.strip() for c in _RECORD_COLUMNS.split(","))
+
+
+def _history_row_to_block(row) -> ActionBlock:
+    return ActionBlock(row, timestamp=int(row[8]), previous_hash=row[9])
+
+
+def _document_row_to_block(row, read_timestamp: Optional[int]) -> ActionBlock:
+    return ActionBlock(_as_read_at(row, read_timestamp), previous_hash=row[9])
+
+
+def _listing_row_to_block(row, read_timestamp: Optional[int]) -> ActionBlock:
+    # getUserDocuments entries carry no previousHash; listings match the chain read exactly
+    return ActionBlock(_as_read_at(row, read_timestamp))
+
+
+def _as_read_at(row, read_timestamp: Optional[int]):
+    # getDocument / getUserDocuments report block.timestamp of the block read, not the record's
+    return row if read_timestamp is None else (*row[:8], read_timestamp)
+
+
+class EventIndexer:
+    """
+    Tails DocumentCreated / DocumentShared / DocumentAccessed logs into SQLite and
+    rebuilds each document's ActionRecord chain (including previousHash) locally.
+
+    Only blocks at least `confirmations` deep are indexed. The hash of every indexed
+    block carrying events is kept so a deeper reorg is detected on the next poll and
+    the affected blocks are rolled back and re-read.
+
+    Reads go through a per-thread connection, each in one WAL read transaction, so they
+    never wait for the writer's lock while a batch is being applied. They block on SQLite,
+    so async callers run them in a worker thread.
+    """
+
+    def __init__(self, db_path: str, start_block: int, confirmations: int, poll_interval: float,
+                 batch_blocks: int, max_lag: int):
+        self.db_path = db_path
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.poll_interval = poll_interval
+        self.batch_blocks = batch_blocks
+        self.max_lag = max_lag
+        self.head: Optional[int] = None
+        self.last_sync = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._events = {}
+        self._readers = threading.local()
+        self.indexed_block = self._get_meta("indexed_block", start_block - 1)
+
+    # ---------------- Background sync ----------------
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-indexer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval * 2)
+            self._thread = None
+
+    def _run(self) -> None:
+        logger.info(f"Event indexer started at block {self.indexed_block + 1}")
+        while not self._stop.is_set():
+            try:
+                self.sync_once()
+            except Exception as e:
+                logger.warning(f"Event indexer poll failed: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def sync_once(self) -> None:
+        if not self._events:
+            for name in INDEXED_EVENTS:
+                event = getattr(contract.events, name)()
+                self._events[bytes.fromhex(event.topic.removeprefix("0x"))] = event
+        head = w3.eth.block_number
+        self._rewind_on_reorg()
+        safe = head - self.confirmations
+        start = self.indexed_block + 1
+        while start <= safe and not self._stop.is_set():
+            end = min(start + self.batch_blocks - 1, safe)
+            logs = w3.eth.get_logs({
+                "address": contract.address,
+                "fromBlock": start,
+                "toBlock": end,
+                "topics": [["0x" + t.hex() for t in self._events]],
+            })
+            end_block = w3.eth.get_block(end)
+            self._apply(logs, end, bytes(end_block["hash"]), int(end_block["timestamp"]))
+            start = end + 1
+        self.head = head
+        self.last_sync = time.time()
+
+    def _apply(self, logs: list, end_block: int, end_hash: bytes, end_timestamp: int) -> None:
+        logs = sorted(logs, key=lambda l: (l["blockNumber"], l["logIndex"]))
+        with self._lock, self._conn:
+            for log in logs:
+                event = self._events.get(bytes(log["topics"][0]))
+                if event is None:
+                    continue
+                args = event.process_log(log)["args"]
+                self._insert_record(log, args)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO blocks (number, hash) VALUES (?, ?)",
+                    (log["blockNumber"], bytes(log["blockHash"])),
+                )
+            self._conn.execute("INSERT OR REPLACE INTO blocks (number, hash) VALUES (?, ?)", (end_block, end_hash))
+            # Keep enough block hashes to walk back well past the confirmation depth
+            self._conn.execute("DELETE FROM blocks WHERE number < ?", (end_block - 64 * max(self.confirmations, 1),))
+            self._set_meta("indexed_block", end_block)
+            self._set_meta("indexed_timestamp", end_timestamp)
+        self.indexed_block = end_block
+
+    def _insert_record(self, log, args) -> None:
+        title = bytes(args["DocTitle"])
+        action = int(args["action"])
+        if action == 0:
+            previous_hash = ZERO_HASH
+            owner_index.add(int(args["Owner"]), decode_bytes32(title))
+        else:
+            row = self._conn.execute(
+                "SELECT record_hash FROM records WHERE doc_title = ? "
+                "ORDER BY block_number DESC, log_index DESC LIMIT 1",
+                (title,),
+            ).fetchone()
+            previous_hash = bytes(row[0]) if row else ZERO_HASH
+        fields = (
+            title, int(args["Owner"]), int(args["LastAccessDate"]), bytes(args["LastAccessedBy"]), action,
+            bytes(args["SharedUser"]), int(args["SharedEndDate"]), bytes(args["ipfsHash"]),
+            int(args["TimeStamp"]), int(args["TimeStamp"]), previous_hash,
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO records (block_number, log_index, tx_hash, doc_title, owner, "
+            "last_access_date, last_accessed_by, action, shared_user, shared_end_date, ipfs_hash, "
+            "timestamp, previous_hash, record_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (log["blockNumber"], log["logIndex"], "0x" + bytes(log["transactionHash"]).hex(),
+             *fields[:9], previous_hash, compute_record_hash(fields)),
+        )
+
+    def _rewind_on_reorg(self) -> None:
+        with self._lock:
+            stored = self._conn.execute(
+                "SELECT number, hash FROM blocks WHERE number <= ? ORDER BY number DESC", (self.indexed_block,)
+            ).fetchall()
+        for number, block_hash in stored:
+            block = w3.eth.get_block(number)
+            if bytes(block["hash"]) == bytes(block_hash):
+                if number != self.indexed_block:
+                    self._rollback_to(number, int(block["timestamp"]))
+                return
+        if stored:
+            self._rollback_to(self.start_block - 1, None)
+
+    def _rollback_to(self, block_number: int, timestamp: Optional[int]) -> None:
+        logger.warning(f"Chain reorg detected; rolling event index back from {self.indexed_block} to {block_number}")
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM records WHERE block_number > ?", (block_number,))
+            self._conn.execute("DELETE FROM blocks WHERE number > ?", (block_number,))
+            self._set_meta("indexed_block", block_number)
+            if timestamp is None:
+                self._conn.execute("DELETE FROM meta WHERE key = 'indexed_timestamp'")
+            else:
+                self._set_meta("indexed_timestamp", timestamp)
+        self.indexed_block = block_number
+
+    def _get_meta(self, key: str, default: int) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row else default
+
+    def _set_meta(self, key: str, value: int) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, int(value)))
+
+    # ---------------- Read path ----------------
+
+    @contextmanager
+    def _read(self):
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._readers.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA query_only=ON")
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _read_timestamp(conn) -> Optional[int]:
+        """Timestamp of the last indexed block: what a chain read at that block reports as TimeStamp."""
+        row = conn.execute("SELECT value FROM meta WHERE key = 'indexed_timestamp'").fetchone()
+        return int(row[0]) if row else None
+
+    def is_serving(self) -> bool:
+        """True when the index is running and close enough to the chain head to answer reads."""
+        if self._thread is None or self.head is None:
+            return False
+        if time.time() - self.last_sync > max(30.0, self.poll_interval * 10):
+            return False
+        return (self.head - self.confirmations) - self.indexed_block <= self.max_lag
+
+    def get_user_documents(self, owner, offset: int = 0, limit: int = -1) -> List[ActionBlock]:
+        with self._read() as conn:
+            return self._user_documents(conn, owner, offset, limit)
+
+    def _user_documents(self, conn, owner, offset: int, limit: int) -> List[ActionBlock]:
+        rows = conn.execute(
+            f"SELECT {_LATEST_COLUMNS} FROM records c JOIN records r ON r.rowid = ("
+            "  SELECT l.rowid FROM records l WHERE l.doc_title = c.doc_title"
+            "  ORDER BY l.block_number DESC, l.log_index DESC LIMIT 1"
+            ") WHERE c.owner = ? AND c.action = 0 ORDER BY c.block_number, c.log_index LIMIT ? OFFSET ?",
+            (int(owner), limit, offset),
+        ).fetchall()
+        read_timestamp = self._read_timestamp(conn)
+        return [_listing_row_to_block(r, read_timestamp) for r in rows]
+
+    def get_user_documents_page(self, owner, offset: int, limit: int):
+        """(docs, next_offset, total), ordered like the contract's userDocuments array."""
+        with self._read() as conn:
+            total = conn.execute(
+                "SELECT COUNT(*) FROM records WHERE owner = ? AND action = 0", (int(owner),)
+            ).fetchone()[0]
+            docs = self._user_documents(conn, owner, offset, limit)
+        return docs, (offset + len(docs) if offset + len(docs) < total else None), total
+
+    def get_document(self, doc_title: str, owner) -> ActionBlock:
+        with self._read() as conn:
+            history = self._history_rows(conn, doc_title, owner, limit=1)
+            read_timestamp = self._read_timestamp(conn)
+        return _document_row_to_block(history[0], read_timestamp)
+
+    def get_document_history(self, doc_title: str, owner) -> List[ActionBlock]:
+        with self._read() as conn:
+            rows = self._history_rows(conn, doc_title, owner)
+        return [_history_row_to_block(r) for r in rows]
+
+    def get_document_history_page(self, doc_title: str, owner, cursor: Optional[bytes], limit: int):
+        """(records, next_cursor) with the same cursor semantics as the chain read; LookupError
+        if the document or the cursor's record is not indexed."""
+        title = encode_bytes32(doc_title)
+        with self._read() as conn:
+            self._history_rows(conn, doc_title, owner, limit=1)  # Existence and owner checks
+            if cursor is None:
+                start = conn.execute(
+                    "SELECT block_number, log_index FROM records WHERE doc_title = ? "
+                    "ORDER BY block_number DESC, log_index DESC LIMIT 1", (title,),
+                ).fetchone()
+            else:
+                start = conn.execute(
+                    "SELECT block_number, log_index FROM records WHERE doc_title = ? AND record_hash = ?",
+                    (title, cursor),
+                ).fetchone()
+                if start is None:
+                    raise LookupError("Cursor record is not in index")
+            rows = conn.execute(
+                f"SELECT {_RECORD_COLUMNS} FROM records WHERE doc_title = ? AND (block_number, log_index) <= (?, ?) "
+                "ORDER BY block_number DESC, log_index DESC LIMIT ?",
+                (title, start[0], start[1], limit),
+            ).fetchall()
+        records = [_history_row_to_block(r) for r in rows]
+        next_cursor = records[-1].previousHash
+        return records, (next_cursor if next_cursor != ZERO_HASH else None)
+
+    def _history_rows(self, conn, doc_title: str, owner, limit: int = -1) -> list:
+        rows = conn.execute(
+            f"SELECT {_RECORD_COLUMNS} FROM records WHERE doc_title = ? "
+            "ORDER BY block_number DESC, log_index DESC LIMIT ?",
+            (encode_bytes32(doc_title), limit),
+        ).fetchall()
+        if not rows:
+            raise LookupError("Document does not exist in index")
+        if int(rows[0][1]) != int(owner):
+            raise LookupError("Owner does not match")
+        return rows
+
+
+indexer: Optional[EventIndexer] = None
+if settings.INDEXER_ENABLED:
+    if settings.INDEXER_START_BLOCK is None:
+        logger.warning("INDEXER_ENABLED is set but INDEXER_START_BLOCK is not; event index disabled")
+    else:
+        indexer = EventIndexer(
+            db_path=settings.INDEXER_DB_PATH,
+            start_block=int(settings.INDEXER_START_BLOCK),
+            confirmations=settings.INDEXER_CONFIRMATIONS,
+            poll_interval=settings.INDEXER_POLL_INTERVAL,
+            batch_blocks=settings.INDEXER_BATCH_BLOCKS,
+            max_lag=settings.INDEXER_MAX_LAG,
+        )
@@ -0,0 +1,183 @@
+import hashlib
+
+_B58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+_B58_INDEX = {c: i for i, c in enumerate(_B58_ALPHABET)}
+
+# CIDv0 is the base58btc multihash <0x12 sha2-256><0x20 length><32-byte digest>
+_SHA256_MULTIHASH_PREFIX = b"\x12\x20"
+
+
+def b58encode(data: bytes) -> str:
+    n = int.from_bytes(data, "big")
+    out = ""
+    while n:
+        n, rem = divmod(n, 58)
+        out = _B58_ALPHABET[rem] + out
+    return "1" * (len(data) - len(data.lstrip(b"\0"))) + out
+
+
+def b58decode(text: str) -> bytes:
+    n = 0
+    for c in text:
+        if c not in _B58_INDEX:
+            raise ValueError(f"Invalid base58 character {c!r}")
+        n = n * 58 + _B58_INDEX[c]
+    body = n.to_bytes((n.bit_length() + 7) // 8, "big")
+    return b"\0" * (len(text) - len(text.lstrip("1"))) + body
+
+
+def cid_to_digest(cid: str) -> bytes:
+    """32-byte sha2-256 digest of a CIDv0 ("Qm..."); raises ValueError for anything else."""
+    if not (len(cid) == 46 and cid.startswith("Qm")):
+        raise ValueError(f"Not a CIDv0: {cid}")
+    multihash = b58decode(cid)
+    if len(multihash) != 34 or not multihash.startswith(_SHA256_MULTIHASH_PREFIX):
+        raise ValueError(f"Not a sha2-256 CIDv0: {cid}")
+    return multihash[2:]
+
+
+def digest_to_cid(digest: bytes) -> str:
+    return b58encode(_SHA256_MULTIHASH_PREFIX + bytes(digest))
+
+
+# Defaults of `ipfs add` / the pinning services for CIDv0: 256 KiB chunks, dag-pb
+# UnixFS leaves (no raw leaves) and a balanced tree of at most 174 links per node.
+CHUNK_SIZE = 262144
+MAX_LINKS = 174
+
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while n >= 0x80:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def _field_bytes(field: int, value: bytes) -> bytes:
+    return _varint(field << 3 | 2) + _varint(len(value)) + value
+
+
+def _field_varint(field: int, value: int) -> bytes:
+    return _varint(field << 3) + _varint(value)
+
+
+def _unixfs_file(data: bytes = None, filesize: int = 0, blocksizes=()) -> bytes:
+    out = _field_varint(1, 2)  # Type = File
+    if data:
+        out += _field_bytes(2, data)
+    out += _field_varint(3, filesize)
+    for size in blocksizes:
+        out += _field_varint(4, size)
+    return out
+
+
+def leaf_nodes(data: bytes) -> list:
+    """
+    (multihash, tsize, filesize) of the leaves `data` is cut into, CHUNK_SIZE bytes each (the
+    last may be shorter). Depends on nothing but `data`, so it can run in a worker process.
+    """
+    nodes = []
+    for offset in range(0, max(len(data), 1), CHUNK_SIZE):
+        chunk = data[offset:offset + CHUNK_SIZE]
+        block = _field_bytes(1, _unixfs_file(chunk, len(chunk)))
+        nodes.append((_SHA256_MULTIHASH_PREFIX + hashlib.sha256(block).digest(), len(block), len(chunk)))
+    return nodes
+
+
+class CidBuilder:
+    """
+    Incremental CIDv0 of a file as `ipfs add` (and Pinata/Infura) would produce it.
+    Only the digests of the pending nodes of each tree level are kept, so memory does
+    not grow with the file size.
+
+    With hash_leaves=False, update() only buffers: the caller takes whole chunks with
+    take_chunks(), hashes them elsewhere with leaf_nodes() and hands the nodes back, in
+    order, with add_leaves().
+    """
+
+    def __init__(self, hash_leaves: bool = True):
+        self._hash_leaves = hash_leaves
+        self._buffer = bytearray()
+        # Per level: [(multihash, tsize, filesize), ...] of nodes not yet linked from a parent
+        self._levels = [[]]
+        self._cid = None
+
+    def update(self, data: bytes) -> None:
+        self._buffer += data
+        if self._hash_leaves and len(self._buffer) >= CHUNK_SIZE:
+            self.add_leaves(leaf_nodes(self.take_chunks()))
+
+    def take_chunks(self, min_size: int = CHUNK_SIZE) -> bytes:
+        """The buffered whole chunks, removed from the buffer, once at least `min_size` bytes of them are buffered; else b""."""
+        whole = len(self._buffer) - len(self._buffer) % CHUNK_SIZE
+        if not whole or whole < min_size:
+            return b""
+        chunks = bytes(self._buffer[:whole])
+        del self._buffer[:whole]
+        return chunks
+
+    def add_leaves(self, nodes: list) -> None:
+        for node in nodes:
+            self._push(0, node)
+
+    def cid(self) -> str:
+        """Finish the tree and return the root CID; no more data may be added afterwards."""
+        if self._cid is not None:
+            return self._cid
+        if self._buffer or not any(self._levels):
+            self.add_leaves(leaf_nodes(bytes(self._buffer)))
+            self._buffer.clear()
+        for depth in range(len(self._levels)):
+            nodes = self._levels[depth]
+            if nodes and (len(nodes) > 1 or any(self._levels[depth + 1:])):
+                self._push(depth + 1, self._parent(nodes))
+                self._levels[depth] = []
+        self._cid = b58encode(self._levels[-1][0][0])
+        return self._cid
+
+    def _push(self, depth: int, node: tuple) -> None:
+        if depth == len(self._levels):
+            self._levels.append([])
+        self._levels[depth].append(node)
+        if len(self._levels[depth]) == MAX_LINKS:
+            full, self._levels[depth] = self._levels[depth], []
+            self._push(depth + 1, self._parent(full))
+
+    @staticmethod
+    def _parent(children: list) -> tuple:
+        links = b"".join(
+            _field_bytes(2, _field_bytes(1, mh) + _field_bytes(2, b"") + _field_varint(3, tsize))
+            for mh, tsize, _ in children
+        )
+        filesize = sum(size for _, _, size in children)
+        block = links + _field_bytes(1, _unixfs_file(filesize=filesize, blocksizes=[size for _, _, size in children]))
+        tsize = len(block) + sum(t for _, t, _ in children)
+        return _SHA256_MULTIHASH_PREFIX + hashlib.sha256(block).digest(), tsize, filesize
+
+
+def encode_ipfs_hash(value: str) -> bytes:
+    """
+    bytes32 for the contract's ipfsHash: a CIDv0 is stored as its 32-byte digest (the
+    46-character string does not fit); anything else, e.g. a placeholder, as UTF-8.
+    """
+    try:
+        return cid_to_digest(value)
+    except ValueError:
+        pass
+    b = value.encode("utf-8")
+    if len(b) > 32:
+        raise ValueError("ipfsHash must be a CIDv0 or at most 32 bytes")
+    return b.ljust(32, b"\0")
+
+
+def decode_ipfs_hash(value: bytes) -> str:
+    """Inverse of encode_ipfs_hash: printable ASCII is a stored string, otherwise a CIDv0 digest."""
+    value = bytes(value)
+    text = value.rstrip(b"\0")
+    if not text:
+        return ""
+    if all(0x20 <= b < 0x7f for b in text):
+        return text.decode("ascii")
+    return digest_to_cid(value)
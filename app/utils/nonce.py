@@ -0,0 +1,151 @@
+import heapq
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Substrings of node errors meaning the nonce was already used on chain
+_CONSUMED_NONCE_ERRORS = (
+    "nonce too low",
+    "already known",
+    "replacement transaction underpriced",
+    "known transaction",
+)
+
+
+def is_nonce_error(exc: Exception) -> bool:
+    msg = str(exc).lower()
+    return any(s in msg for s in _CONSUMED_NONCE_ERRORS) or "nonce too high" in msg
+
+
+# Failures after which the signed transaction cannot be on the node: the connection was
+# never made, or the node answered the request with an error.
+_UNSENT_MESSAGES = ("connection refused", "failed to establish a new connection", "name or service not known")
+_UNSENT_TYPES = {"ConnectTimeout", "ConnectionRefusedError", "CircuitOpenError", "Web3RPCError", "ContractLogicError"}
+
+
+def never_reached_node(exc: Exception) -> bool:
+    """True when a failed send provably left no transaction behind (web3 / requests matched by name, not imported)."""
+    if {c.__name__ for c in type(exc).__mro__} & _UNSENT_TYPES:
+        return True
+    msg = str(exc).lower()
+    return any(s in msg for s in _UNSENT_MESSAGES)
+
+
+class NonceManager:
+    """
+    In-process nonce allocator for a single signing account.
+
+    Nonces are handed out sequentially under a lock, so concurrent requests never
+    sign two transactions with the same nonce. A nonce whose transaction provably
+    never reached the node goes to a free-list and is handed out again before new
+    ones, which fills the gap the failed send would otherwise leave.
+
+    Broadcast nonces are remembered until the node's pending count passes them (or
+    `broadcast_ttl` seconds go by): a lagging or load-balanced RPC may not count them
+    yet, and they must not be reissued. A nonce below our next one that is neither
+    in use nor broadcast is only refilled once the node has been missing it for
+    `gap_grace` seconds. The pending count is re-read at most every `resync_interval`
+    seconds when nonces are allocated.
+    """
+
+    def __init__(self, fetch_pending_count: Callable[[], int], gap_grace: float = 30.0,
+                 broadcast_ttl: float = 300.0, resync_interval: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self._fetch_pending_count = fetch_pending_count
+        self.gap_grace = gap_grace
+        self.broadcast_ttl = broadcast_ttl
+        self.resync_interval = resync_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._next: Optional[int] = None
+        self._synced_at = 0.0
+        self._free: List[int] = []
+        self._in_flight: set = set()
+        self._broadcast: Dict[int, float] = {}
+        self._missing_since: Dict[int, float] = {}
+
+    def resync(self) -> int:
+        """Re-read the account's pending tx count and reconcile local state with it."""
+        chain_next = int(self._fetch_pending_count())
+        with self._lock:
+            self._reconcile(chain_next)
+            return self._next
+
+    def _reconcile(self, chain_next: int) -> None:
+        now = self._clock()
+        self._synced_at = now
+        # Counted by the node (or too old to still be waiting for it)
+        self._broadcast = {
+            n: at for n, at in self._broadcast.items() if n >= chain_next and now - at <= self.broadcast_ttl
+        }
+        if self._next is None or chain_next >= self._next:
+            self._next = chain_next
+            self._missing_since.clear()
+        else:
+            # Chain is behind us: a nonce in [chain_next, next) that is neither being
+            # signed, free, nor recently broadcast is missing; refill it after the grace period.
+            known = self._in_flight.union(self._free, self._broadcast)
+            self._missing_since = {
+                n: self._missing_since.get(n, now) for n in range(chain_next, self._next) if n not in known
+            }
+            gaps = [n for n, since in self._missing_since.items() if now - since >= self.gap_grace]
+            if gaps:
+                logger.warning(f"Nonce gaps detected, will refill: {gaps}")
+                self._free.extend(gaps)
+                for n in gaps:
+                    del self._missing_since[n]
+        self._free = sorted(set(n for n in self._free if n >= chain_next))
+        heapq.heapify(self._free)
+
+    def allocate(self) -> int:
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, count: int) -> List[int]:
+        """Reserve `count` nonces atomically, lowest (gap-filling) first."""
+        if self._next is None:
+            self.resync()
+        elif self._clock() - self._synced_at > self.resync_interval:
+            try:
+                self.resync()
+            except Exception as e:
+                logger.warning(f"Nonce resync failed: {e}")
+        with self._lock:
+            nonces = []
+            for _ in range(count):
+                if self._free:
+                    nonce = heapq.heappop(self._free)
+                else:
+                    nonce = self._next
+                    self._next += 1
+                self._in_flight.add(nonce)
+                nonces.append(nonce)
+            return nonces
+
+    def confirm(self, nonce: int) -> None:
+        """Mark a nonce as successfully broadcast."""
+        with self._lock:
+            self._in_flight.discard(nonce)
+            self._broadcast[nonce] = self._clock()
+
+    def release(self, nonce: int, error: Optional[Exception] = None) -> None:
+        """
+        Return a nonce whose send failed; `error` is the send's exception, None if it
+        failed before anything was sent. The nonce is reused only if the transaction
+        never reached the node. A nonce error means it is taken; any other failure (a
+        read timeout, a dropped connection) may have been accepted, so the nonce is
+        kept as broadcast. Both resync with the chain.
+        """
+        with self._lock:
+            self._in_flight.discard(nonce)
+            if error is None or (not is_nonce_error(error) and never_reached_node(error)):
+                heapq.heappush(self._free, nonce)
+                return
+            if not is_nonce_error(error):
+                self._broadcast[nonce] = self._clock()
+        try:
+            self.resync()
+        except Exception as e:
+            logger.warning(f"Nonce resync failed: {e}")
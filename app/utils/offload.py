@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.utils.crypto import decrypt_stream, encrypt_stream
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker(encryption_key, chunk_size: int) -> None:
+    """Pool initializer: spawned workers would otherwise generate their own ENCRYPTION_KEY."""
+    settings.ENCRYPTION_KEY = encryption_key
+    settings.ENCRYPTION_CHUNK_SIZE = chunk_size
+
+
+def _timed(fn: Callable, args: tuple):
+    started = time.time()
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, started, time.perf_counter() - t0
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def encrypt_bytes(data: bytes) -> bytes:
+    return b"".join(encrypt_stream([data]))
+
+
+def decrypt_bytes(token: bytes) -> bytes:
+    return b"".join(decrypt_stream([token]))
+
+
+class CpuPool:
+    """
+    Runs hashing, encryption and decryption on a pool of worker processes so that large
+    payloads use every core and do not hold the GIL the request threads need. Inputs smaller
+    than `inline_below` bytes run in the calling thread: for them the pickling round-trip
+    costs more than the work. `fn` must be a module-level function the workers can import.
+    The pool is started on first use.
+    """
+
+    def __init__(self, max_workers: int, inline_below: int, timeout: float):
+        self.max_workers = max_workers
+        self.inline_below = inline_below
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._ops: Dict[str, Dict[str, float]] = {}
+
+    def run(self, fn: Callable, data: bytes, *args) -> Any:
+        """`fn(data, *args)`, in a worker process when `data` is large enough."""
+        if not self._offloads(data):
+            return self._run_inline(fn, (data, *args))
+        return self.submit(fn, data, *args).result(timeout=self.timeout)
+
+    async def run_async(self, fn: Callable, data: bytes, *args) -> Any:
+        """Awaitable `run`: the event loop keeps serving while the job runs."""
+        loop = asyncio.get_running_loop()
+        if not self._offloads(data):
+            return await loop.run_in_executor(None, self._run_inline, fn, (data, *args))
+        return await asyncio.wait_for(asyncio.wrap_future(self.submit(fn, data, *args)), self.timeout)
+
+    def submit(self, fn: Callable, data: bytes, *args) -> Future:
+        """Queue `fn(data, *args)` on the process pool; the returned future carries the result."""
+        submitted = time.time()
+        name = fn.__name__
+        with self._lock:
+            self._pending += 1
+        try:
+            executor = self._pool()
+            inner = executor.submit(_timed, fn, (data, *args))
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        outer: Future = Future()
+
+        def _done(f: Future) -> None:
+            try:
+                result, started, seconds = f.result()
+            except BaseException as e:
+                if isinstance(e, BrokenProcessPool):
+                    # A worker died (OOM, kill); the next job starts a fresh pool
+                    with self._lock:
+                        if self._executor is executor:
+                            self._executor = None
+                self._record(name, "offloaded", 0.0, 0.0, failed=True, dequeued=True)
+                outer.set_exception(e)
+                return
+            self._record(name, "offloaded", max(started - submitted, 0.0), seconds, dequeued=True)
+            outer.set_result(result)
+
+        inner.add_done_callback(_done)
+        return outer
+
+    def batch_size(self, unit: int) -> int:
+        """The smallest multiple of `unit` bytes that is worth sending to a worker."""
+        return max(-(-self.inline_below // unit), 1) * unit
+
+    def _offloads(self, data) -> bool:
+        return self.max_workers > 0 and len(data) >= self.inline_below
+
+    def _run_inline(self, fn: Callable, args: tuple) -> Any:
+        t0 = time.perf_counter()
+        try:
+            result = fn(*args)
+        except BaseException:
+            self._record(fn.__name__, "inline", 0.0, time.perf_counter() - t0, failed=True)
+            raise
+        self._record(fn.__name__, "inline", 0.0, time.perf_counter() - t0)
+        return result
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that runs web3/indexer threads is unsafe, and it is
+                # the only start method on Windows anyway
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(settings.ENCRYPTION_KEY, settings.ENCRYPTION_CHUNK_SIZE),
+                )
+                logger.info("Started CPU pool with %d worker processes", self.max_workers)
+            return self._executor
+
+    def _record(self, name: str, mode: str, wait: float, seconds: float, failed: bool = False, dequeued: bool = False) -> None:
+        with self._lock:
+            if dequeued:
+                self._pending -= 1
+            op = self._ops.setdefault(name, {
+                "inline": 0, "offloaded": 0, "failed": 0,
+                "inline_seconds": 0.0, "offloaded_seconds": 0.0, "queue_wait_seconds": 0.0,
+            })
+            op[mode] += 1
+            op[f"{mode}_seconds"] += seconds
+            op["queue_wait_seconds"] += wait
+            if failed:
+                op["failed"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            ops = {name: dict(op) for name, op in self._ops.items()}
+            pending = self._pending
+            started = self._executor is not None
+        for op in ops.values():
+            op["avg_offloaded_seconds"] = op["offloaded_seconds"] / op["offloaded"] if op["offloaded"] else None
+            op["avg_queue_wait_seconds"] = op["queue_wait_seconds"] / op["offloaded"] if op["offloaded"] else None
+        return {
+            "max_workers": self.max_workers,
+            "inline_below": self.inline_below,
+            "started": started,
+            "pending": pending,
+            "operations": ops,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+cpu_pool = CpuPool(
+    max_workers=settings.CPU_POOL_WORKERS,
+    inline_below=settings.CPU_POOL_INLINE_BELOW,
+    timeout=settings.CPU_POOL_TIMEOUT,
+)
@@ -0,0 +1,75 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional, Set
+
+from app.core.config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS owner_titles (
+    owner INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    PRIMARY KEY (owner, title)
+);
+"""
+
+
+class OwnerIndex:
+    """
+    Owner -> set of DocTitles, learned from DocumentCreated events and from receipts of
+    this service's own creates. A document's owner never changes after creation, so a
+    hit is authoritative; a miss only means "not seen yet" and callers go to the chain.
+    Optionally persisted to SQLite so it survives restarts.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self._titles: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            for owner, title in self._conn.execute("SELECT owner, title FROM owner_titles"):
+                self._titles.setdefault(owner, set()).add(title)
+
+    def contains(self, owner, doc_title: str) -> bool:
+        with self._lock:
+            found = doc_title in self._titles.get(int(owner), ())
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def add(self, owner, doc_title: str) -> None:
+        self.add_titles(owner, (doc_title,))
+
+    def add_titles(self, owner, doc_titles: Iterable[str]) -> None:
+        owner = int(owner)
+        with self._lock:
+            titles = self._titles.setdefault(owner, set())
+            new = [t for t in doc_titles if t not in titles]
+            if not new:
+                return
+            titles.update(new)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO owner_titles (owner, title) VALUES (?, ?)", [(owner, t) for t in new]
+                    )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "owners": len(self._titles),
+                "titles": sum(len(t) for t in self._titles.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+owner_index = OwnerIndex(settings.OWNER_INDEX_DB_PATH or None)
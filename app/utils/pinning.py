@@ -0,0 +1,258 @@
+import io
+import json
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional
+
+from app.utils.transport import upstream_session
+
+logger = logging.getLogger(__name__)
+
+
+class UploadCancelled(Exception):
+    pass
+
+
+class PinningProvider:
+    """A pinning backend: streams one file and returns the CID it was pinned under."""
+
+    name = "provider"
+
+    def configured(self) -> bool:
+        return True
+
+    def pin(self, stream, filename: str) -> str:
+        raise NotImplementedError
+
+
+class PinataProvider(PinningProvider):
+    name = "pinata"
+
+    def __init__(self, jwt: Optional[str]):
+        self.jwt = jwt
+        self.session = upstream_session(self.name)
+
+    def configured(self) -> bool:
+        return bool(self.jwt)
+
+    def pin(self, stream, filename: str) -> str:
+        from requests_toolbelt.multipart.encoder import MultipartEncoder  # Deferred: ~90 ms at import
+        m = MultipartEncoder(
+            fields={
+                "file": (filename, stream),
+                "pinataMetadata": ('', json.dumps({"name": filename}), 'application/json'),
+                "pinataOptions": ('', '{"cidVersion": 0}', 'application/json'),
+            }
+        )
+        headers = {
+            "Authorization": f"Bearer {self.jwt}",
+            "Content-Type": m.content_type
+        }
+        response = self.session.post("https://api.pinata.cloud/pinning/pinFileToIPFS", data=m, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+        return data.get("IpfsHash") or data.get("IpfsCid") or data.get("cid") or data.get("Hash")
+
+
+class InfuraProvider(PinningProvider):
+    name = "infura"
+
+    def __init__(self, project_id: Optional[str], project_secret: Optional[str]):
+        self.auth = (project_id, project_secret) if project_id and project_secret else None
+        self.session = upstream_session(self.name)
+
+    def pin(self, stream, filename: str) -> str:
+        from requests_toolbelt.multipart.encoder import MultipartEncoder
+        m = MultipartEncoder(fields={"file": (filename, stream)})
+        resp = self.session.post(
+            "https://ipfs.infura.io:5001/api/v0/add",
+            params={"cid-version": 0, "pin": "true"},
+            data=m,
+            headers={"Content-Type": m.content_type},
+            auth=self.auth,
+        )
+        resp.raise_for_status()
+        info = resp.json()
+        # Infura returns { Name, Hash, Size }
+        return info.get("Hash") or info.get("Cid")
+
+
+class _SharedSource:
+    """
+    One upload's content, readable by several providers at once. File objects are not
+    copied: their descriptor is duplicated and read positionally, which also keeps a
+    request's temp file alive for uploads that outlive the request.
+    """
+
+    def __init__(self, file):
+        self._data: Optional[bytes] = None
+        self._fd: Optional[int] = None
+        self._lock = threading.Lock()
+        if isinstance(file, (bytes, bytearray, memoryview)):
+            self._data = bytes(file)
+            self.start, self.size = 0, len(self._data)
+            return
+        self.start = file.tell()
+        try:
+            file.flush()
+            self._fd = os.dup(file.fileno())
+            self.size = os.fstat(self._fd).st_size - self.start
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            self._data = file.read()
+            self.start, self.size = 0, len(self._data)
+
+    def pread(self, size: int, offset: int) -> bytes:
+        if self._data is not None:
+            return self._data[offset:offset + size]
+        if hasattr(os, "pread"):
+            return os.pread(self._fd, size, self.start + offset)
+        with self._lock:  # No pread on Windows
+            os.lseek(self._fd, self.start + offset, os.SEEK_SET)
+            return os.read(self._fd, size)
+
+    def reader(self) -> "_SourceReader":
+        return _SourceReader(self)
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class _SourceReader:
+    """Independent read position over a _SharedSource; `cancel()` aborts the upload using it."""
+
+    def __init__(self, source: _SharedSource):
+        self._source = source
+        self._pos = 0
+        self._cancelled = threading.Event()
+
+    @property
+    def len(self) -> int:
+        return self._source.size - self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        if self._cancelled.is_set():
+            raise UploadCancelled("Upload cancelled")
+        if size is None or size < 0:
+            size = self.len
+        chunk = self._source.pread(min(size, self.len), self._pos)
+        self._pos += len(chunk)
+        return chunk
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+
+class HedgedUploader:
+    """
+    Uploads one file to several pinning providers and returns the first CID.
+
+    The first configured provider starts at once; each further one starts after
+    `hedge_delay` seconds without a result (0 starts them all together), or right
+    away when an earlier one fails. With policy "cancel" the losing uploads are
+    aborted; with "complete" they run on in the background for redundancy.
+    """
+
+    def __init__(self, providers: List[PinningProvider], hedge_delay: float, policy: str, max_workers: int):
+        if policy not in ("cancel", "complete"):
+            raise ValueError("Hedge policy must be 'cancel' or 'complete'")
+        self.providers = providers
+        self.hedge_delay = hedge_delay
+        self.policy = policy
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ipfs-upload")
+        self._stats_lock = threading.Lock()
+        self.wins = {p.name: 0 for p in providers}
+        self.failures = {p.name: 0 for p in providers}
+        self.cancelled = 0
+
+    def upload(self, file, filename: str) -> str:
+        providers = [p for p in self.providers if p.configured()]
+        if not providers:
+            raise RuntimeError("No IPFS pinning provider is configured")
+        source = _SharedSource(file)
+        running = {}
+        errors = []
+
+        def start(provider):
+            reader = source.reader()
+            running[self._executor.submit(provider.pin, reader, filename)] = (provider, reader)
+
+        pending = list(providers)
+        try:
+            start(pending.pop(0))
+            while True:
+                timeout = self.hedge_delay if pending else None
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    provider, _ = running.pop(future)
+                    try:
+                        cid = future.result()
+                        if not cid:
+                            raise RuntimeError("no CID in response")
+                    except Exception as e:
+                        self._count(self.failures, provider.name)
+                        errors.append(f"{provider.name}={e}")
+                        continue
+                    self._count(self.wins, provider.name)
+                    self._finish_losers(running)
+                    return cid
+                # Hedge delay passed, or an upload failed: bring in the next provider
+                if pending:
+                    start(pending.pop(0))
+                elif not running:
+                    raise RuntimeError(f"IPFS upload failed on every provider: {', '.join(errors)}")
+        finally:
+            self._release_source(source, list(running))
+
+    def _finish_losers(self, running: dict) -> None:
+        for future, (provider, reader) in running.items():
+            if self.policy == "cancel":
+                future.cancel()
+                reader.cancel()
+                with self._stats_lock:
+                    self.cancelled += 1
+            else:
+                future.add_done_callback(lambda f, name=provider.name: self._log_redundant(f, name))
+
+    def _log_redundant(self, future, name: str) -> None:
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self._count(self.failures, name)
+            logger.warning(f"Redundant upload to {name} failed: {error}")
+
+    @staticmethod
+    def _release_source(source: _SharedSource, futures: list) -> None:
+        """Close the shared descriptor once no upload is reading it any more."""
+        left = [len(futures)]
+        lock = threading.Lock()
+        if not futures:
+            source.close()
+            return
+
+        def done(_):
+            with lock:
+                left[0] -= 1
+                if left[0] == 0:
+                    source.close()
+
+        for future in futures:
+            future.add_done_callback(done)
+
+    def _count(self, counter: dict, name: str) -> None:
+        with self._stats_lock:
+            counter[name] = counter.get(name, 0) + 1
+
+    def stats(self) -> dict:
+        return {
+            "providers": [p.name for p in self.providers if p.configured()],
+            "hedgeDelay": self.hedge_delay,
+            "policy": self.policy,
+            "wins": dict(self.wins),
+            "failures": dict(self.failures),
+            "cancelled": self.cancelled,
+        }
@@ -0,0 +1,37 @@
+"""
+Signed download links.
+
+The API has no login of its own; the service that authenticates users (and holds
+SECRET_KEY) issues links for a document, the user it authenticated and an expiry time.
+The download endpoint only trusts the `user` of a link whose signature verifies.
+"""
+import hashlib
+import hmac
+import time
+
+from app.core.config import settings
+
+_DEFAULT_SECRET = "vault-secret-key-change-in-production"
+
+
+def signing_configured() -> bool:
+    """False while SECRET_KEY is the published default, which anyone could sign with."""
+    return bool(settings.SECRET_KEY) and settings.SECRET_KEY != _DEFAULT_SECRET
+
+
+def _mac(doc_title: str, owner: int, user: str, expires: int) -> str:
+    message = "\n".join(("download", doc_title, str(int(owner)), user, str(int(expires))))
+    return hmac.new(settings.SECRET_KEY.encode(), message.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def sign_download(doc_title: str, owner: int, user: str, expires: int) -> str:
+    """Signature for `user` to download (doc_title, owner) until `expires` (unix seconds)."""
+    if not signing_configured():
+        raise RuntimeError("SECRET_KEY is not configured; download links cannot be signed")
+    return _mac(doc_title, owner, user, expires)
+
+
+def verify_download(doc_title: str, owner: int, user: str, expires: int, signature: str) -> bool:
+    if not signing_configured() or expires < time.time():
+        return False
+    return hmac.compare_digest(_mac(doc_title, owner, user, expires), signature)
@@ -0,0 +1,136 @@
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.config import settings
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures and then fails calls
+    fast for `reset_timeout` seconds. After that it is half-open: a single probe call
+    goes through while the others keep failing fast; its success closes the breaker
+    and its failure re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def before(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at >= self.reset_timeout and not self._probing:
+                self._probing = True  # This call is the half-open probe
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"{self.name} is unavailable (circuit open after repeated failures: {self.last_error})")
+
+    def success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def abandon(self) -> None:
+        """The call ended without telling whether the upstream is healthy: let another probe through."""
+        with self._lock:
+            self._probing = False
+
+    def failure(self, error) -> None:
+        with self._lock:
+            self._probing = False
+            self._failures += 1
+            self.last_error = str(error)
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def to_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutiveFailures": self._failures,
+            "rejected": self.rejected,
+            "lastError": self.last_error,
+        }
+
+
+class UpstreamSession(requests.Session):
+    """
+    requests.Session for one upstream: a keep-alive pool of `pool_size` connections,
+    default (connect, read) timeouts and a circuit breaker. Connection errors, timeouts,
+    429 and 5xx responses count as failures; anything else closes the breaker.
+    """
+
+    def __init__(self, name: str, pool_size: int, connect_timeout: float, read_timeout: float, breaker: CircuitBreaker):
+        super().__init__()
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        self.breaker.before()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            self.breaker.failure(e)
+            raise
+        except BaseException:
+            self.breaker.abandon()
+            raise
+        if response.status_code == 429 or response.status_code >= 500:
+            self.breaker.failure(f"HTTP {response.status_code}")
+        else:
+            self.breaker.success()
+        return response
+
+
+_sessions: Dict[str, UpstreamSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def upstream_session(name: str, read_timeout: Optional[float] = None) -> UpstreamSession:
+    """The shared session for an upstream, created on first use."""
+    with _sessions_lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = _sessions[name] = UpstreamSession(
+                name,
+                pool_size=settings.HTTP_POOL_SIZE,
+                connect_timeout=settings.HTTP_CONNECT_TIMEOUT,
+                read_timeout=read_timeout or settings.HTTP_READ_TIMEOUT,
+                breaker=CircuitBreaker(name, settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RESET_TIMEOUT),
+            )
+        return session
+
+
+def upstream_status() -> dict:
+    with _sessions_lock:
+        return {name: session.breaker.to_dict() for name, session in _sessions.items()}
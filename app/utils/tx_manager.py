@@ -0,0 +1,218 @@
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.utils.blockchain import observe_receipt, receipt_summary, rpc_batch, rebroadcast_transaction
+from app.utils.nonce import is_nonce_error
+
+logger = logging.getLogger(__name__)
+
+
+def _hex(value) -> str:
+    return value if isinstance(value, str) else "0x" + bytes(value).hex()
+
+
+class TxJob:
+    """
+    One API write submitted without waiting; may span several transactions (share 'both').
+    The poller updates `txs` while routes read the job, so both go through `_lock`.
+    """
+
+    def __init__(self, kind: str, sent: list, meta: dict):
+        now = time.time()
+        self._lock = threading.Lock()
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.meta = meta
+        self.created_at = now
+        self.finished_at: Optional[float] = None
+        self.txs = [
+            {
+                "hashes": [_hex(tx_hash)],
+                "tx": tx,
+                "status": "pending",
+                "last_broadcast": now,
+                "rebroadcasts": 0,
+                "attempts": 0,
+                "txHash": None,
+                "blockNumber": None,
+            }
+            for tx_hash, tx in sent
+        ]
+
+    @property
+    def status(self) -> str:
+        with self._lock:
+            return self._status()
+
+    def _status(self) -> str:
+        statuses = {t["status"] for t in self.txs}
+        if "reverted" in statuses:
+            return "reverted"
+        if "pending" in statuses:
+            return "pending"
+        if "abandoned" in statuses:
+            return "abandoned"
+        return "confirmed"
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "jobId": self.id,
+                "kind": self.kind,
+                "status": self._status(),
+                "createdAt": int(self.created_at),
+                "transactions": [
+                    {
+                        "status": t["status"],
+                        "txHash": t["txHash"] or t["hashes"][-1],
+                        "broadcastHashes": list(t["hashes"]),
+                        "nonce": t["tx"].get("nonce"),
+                        "blockNumber": t["blockNumber"],
+                        "rebroadcasts": t["rebroadcasts"],
+                    }
+                    for t in self.txs
+                ],
+                **self.meta,
+            }
+
+
+class TxManager:
+    """
+    Tracks broadcast transactions and resolves them from a single background poller
+    that fetches all outstanding receipts in JSON-RPC batches. Transactions without a
+    receipt after `stuck_after` seconds are re-signed at the same nonce with a bumped fee.
+    One still stuck after `max_rebroadcasts` attempts (or at the fee cap) is marked
+    'abandoned' so its job finishes and expires like any other.
+    """
+
+    def __init__(self, poll_interval: float, batch_size: int, stuck_after: float, fee_bump_percent: int,
+                 max_rebroadcasts: int, job_ttl: float):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.stuck_after = stuck_after
+        self.fee_bump_percent = fee_bump_percent
+        self.max_rebroadcasts = max_rebroadcasts
+        self.job_ttl = job_ttl
+        self._jobs: Dict[str, TxJob] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, kind: str, sent: list, **meta) -> TxJob:
+        job = TxJob(kind, sent, meta)
+        with self._lock:
+            self._jobs[job.id] = job
+        self.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[TxJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="tx-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=self.poll_interval * 2)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.warning(f"Receipt poll failed: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def poll_once(self) -> None:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        pending = []
+        for job in jobs:
+            with job._lock:
+                pending += [(job, t, list(t["hashes"])) for t in job.txs if t["status"] == "pending"]
+        if pending:
+            # Only this thread writes to the txs; job locks are held for the updates, not the RPCs
+            receipts = self._fetch_receipts([h for _, _, hashes in pending for h in hashes])
+            now = time.time()
+            for job, t, hashes in pending:
+                receipt = next((receipts[h] for h in hashes if receipts.get(h)), None)
+                if receipt is not None:
+                    observe_receipt(receipt)
+                    summary = receipt_summary(receipt)
+                    with job._lock:
+                        t["status"] = summary["status"]
+                        t["txHash"] = summary["txHash"]
+                        t["blockNumber"] = summary["blockNumber"]
+                elif now - t["last_broadcast"] > self.stuck_after:
+                    if t["attempts"] < self.max_rebroadcasts:
+                        self._rebroadcast(job, t, now)
+                    else:
+                        with job._lock:
+                            t["status"] = "abandoned"
+                        logger.warning(f"Gave up on nonce {t['tx'].get('nonce')} after {t['attempts']} re-broadcasts: {hashes}")
+                with job._lock:
+                    if t["status"] != "pending" and job.finished_at is None and job._status() != "pending":
+                        job.finished_at = now
+        self._prune()
+
+    def _fetch_receipts(self, hashes: List[str]) -> dict:
+        receipts = {}
+        for i in range(0, len(hashes), self.batch_size):
+            chunk = hashes[i:i + self.batch_size]
+            results = rpc_batch([("eth_getTransactionReceipt", [h]) for h in chunk])
+            for h, result in zip(chunk, results):
+                if result is not None and not isinstance(result, Exception):
+                    receipts[h] = result
+        return receipts
+
+    def _rebroadcast(self, job: TxJob, t: dict, now: float) -> None:
+        with job._lock:
+            t["attempts"] += 1
+            t["last_broadcast"] = now
+        try:
+            result = rebroadcast_transaction(t["tx"], self.fee_bump_percent)
+        except Exception as e:
+            # A nonce error means one of the earlier broadcasts was mined; the next poll finds it
+            if not is_nonce_error(e):
+                logger.warning(f"Re-broadcast of nonce {t['tx'].get('nonce')} failed: {e}")
+            return
+        if result is None:
+            # At the fee cap: no further replacement can be sent
+            with job._lock:
+                t["attempts"] = self.max_rebroadcasts
+            return
+        tx_hash, bumped = result
+        with job._lock:
+            t["tx"] = bumped
+            t["hashes"].append(_hex(tx_hash))
+            t["rebroadcasts"] += 1
+        logger.info(f"Re-broadcast stuck nonce {bumped.get('nonce')} with bumped fee as {_hex(tx_hash)}")
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.job_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+tx_manager = TxManager(
+    poll_interval=settings.TX_POLL_INTERVAL,
+    batch_size=settings.TX_POLL_BATCH,
+    stuck_after=settings.TX_STUCK_AFTER,
+    fee_bump_percent=settings.TX_FEE_BUMP_PERCENT,
+    max_rebroadcasts=settings.TX_MAX_REBROADCASTS,
+    job_ttl=settings.TX_JOB_TTL,
+)
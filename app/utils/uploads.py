@@ -0,0 +1,141 @@
+import hashlib
+from tempfile import SpooledTemporaryFile
+from typing import Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from python_multipart import MultipartParser
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import parse_options_header
+from starlette.requests import Request
+
+from app.utils.ipfs import CHUNK_SIZE, CidBuilder, leaf_nodes
+from app.utils.offload import cpu_pool
+
+_SPOOL_MAX_SIZE = 1024 * 1024  # Received files larger than this are spooled to disk
+_MAX_FIELD_SIZE = 64 * 1024
+
+
+class ReceivedUpload:
+    """
+    A multipart upload whose file part was spooled and hashed while it was received:
+    the SHA-256 and the CIDv0 are known before the spooled copy is read at all. The CID
+    leaves are hashed in batches on the CPU pool.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self.filename: Optional[str] = None
+        self.file = SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE)
+        self.size = 0
+        self.sha256: Optional[str] = None
+        self.cid: Optional[str] = None
+        self._sha256 = hashlib.sha256()
+        self._cid = CidBuilder(hash_leaves=False)
+
+    def _append(self, data: bytes) -> None:
+        self.file.write(data)
+        self._sha256.update(data)
+        self._cid.update(data)
+
+    async def _hash_leaves(self) -> None:
+        batch = self._cid.take_chunks(cpu_pool.batch_size(CHUNK_SIZE))
+        if batch:
+            self._cid.add_leaves(await cpu_pool.run_async(leaf_nodes, batch))
+
+    def _finish(self) -> None:
+        self.file.seek(0)
+        self.sha256 = self._sha256.hexdigest()
+        self.cid = self._cid.cid()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+async def receive_upload(request: Request, file_field: str, max_size: int) -> ReceivedUpload:
+    """
+    Parse a multipart/form-data body with one file part, `file_field`. The file is
+    written to a spooled temporary file and hashed chunk by chunk as the body arrives,
+    so memory does not grow with its size. ValueError for a malformed body; ValueError
+    mentioning "limit" when the file is larger than `max_size`.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise ValueError("Expected a multipart/form-data body")
+    declared = request.headers.get("content-length")
+    if max_size and declared and declared.isdigit() and int(declared) > max_size + _MAX_FIELD_SIZE:
+        raise ValueError(f"Request body is {declared} bytes; the file size limit is {max_size}")
+
+    upload = ReceivedUpload()
+    part = {}
+    pending = []
+    found = False
+
+    def on_part_begin():
+        part.clear()
+        part.update(headers={}, name=None, data=bytearray(), is_file=False)
+
+    def on_header_field(data, start, end):
+        part["field"] = part.get("field", b"") + data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] = part.get("value", b"") + data[start:end]
+
+    def on_header_end():
+        part["headers"][part.pop("field", b"").lower()] = part.pop("value", b"")
+
+    def on_headers_finished():
+        nonlocal found
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise ValueError("A form part has no name")
+        part["name"] = options[b"name"].decode("utf-8", "replace")
+        if b"filename" in options:
+            if part["name"] != file_field or found:
+                raise ValueError(f"Only one file, in the '{file_field}' field, is accepted")
+            found = part["is_file"] = True
+            upload.filename = options[b"filename"].decode("utf-8", "replace")
+
+    def on_part_data(data, start, end):
+        if part["is_file"]:
+            pending.append(bytes(data[start:end]))
+            return
+        if len(part["data"]) + end - start > _MAX_FIELD_SIZE:
+            raise ValueError(f"Form field '{part['name']}' is too large")
+        part["data"] += data[start:end]
+
+    def on_part_end():
+        if not part["is_file"]:
+            upload.fields[part["name"]] = part["data"].decode("utf-8", "replace")
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if pending:
+                data = b"".join(pending)
+                pending.clear()
+                upload.size += len(data)
+                if max_size and upload.size > max_size:
+                    raise ValueError(f"File is larger than the limit of {max_size} bytes")
+                # Disk writes and hashing stay off the event loop
+                await run_in_threadpool(upload._append, data)
+                await upload._hash_leaves()
+        parser.finalize()
+        if not found:
+            raise ValueError(f"No file in the '{file_field}' field")
+        await run_in_threadpool(upload._finish)
+    except FormParserError as e:
+        upload.close()
+        raise ValueError(f"Invalid multipart body: {e}")
+    except BaseException:
+        upload.close()
+        raise
+    return upload
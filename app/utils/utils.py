@@ -6,6 +6,7 @@ import os
 import mimetypes
 from cryptography.fernet import Fernet
 from app.core.config import settings
+from app.utils.offload import cpu_pool, decrypt_bytes, encrypt_bytes, sha256_hex
 
 # Action mapping to Solidity enum
 ACTION_MAP = {
@@ -68,13 +69,16 @@ def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
 def encrypt_content(content: bytes) -> bytes:
-    return cipher.encrypt(content)
+    # Chunked AES-GCM container; use crypto.encrypt_stream / encrypt_file to avoid holding whole files.
+    # Large inputs are encrypted on the CPU pool, small ones inline.
+    return cpu_pool.run(encrypt_bytes, content)
 
 def decrypt_content(token: bytes) -> bytes:
-    return cipher.decrypt(token)
+    # Reads both the chunked container and Fernet tokens written before it
+    return cpu_pool.run(decrypt_bytes, token)
 
 def generate_data_hash(data: bytes) -> str:
-    return hashlib.sha256(data).hexdigest()
+    return cpu_pool.run(sha256_hex, data)
 
 def validate_file_type(filename: str, allowed_types: list = None) -> bool:
     if not allowed_types:
@@ -129,30 +133,48 @@ def format_file_size(size_bytes: int) -> str:
     return f"{size_bytes:.2f} PB"
 
 def encrypt_file_content(file_content: bytes) -> bytes:
-    return cipher.encrypt(file_content)
+    return encrypt_content(file_content)
 
 def calculate_file_hash(file_content: bytes) -> str:
-    return hashlib.sha256(file_content).hexdigest()
+    return cpu_pool.run(sha256_hex, file_content)
 
 # ---------------- Blockchain helpers ----------------
-from typing import Any, Dict
-from web3 import Web3
-from app.utils.blockchain import w3
+from typing import Any, Dict, Sequence
+from app.utils.blockchain import encode_bytes32
+from app.utils.ipfs import encode_ipfs_hash
+from app.utils.blocks import ActionBlock
+
+# abi.encode layout of the contract's ActionRecord, as hashed by _computeHash
+ACTION_RECORD_TYPES = [
+    "bytes32", "uint64", "uint64", "bytes32", "uint8", "bytes32",
+    "uint64", "bytes32", "uint64", "uint64", "bytes32",
+]
+ZERO_HASH = b"\0" * 32
+
+def compute_record_hash(fields: Sequence) -> bytes:
+    """
+    keccak256(abi.encode(record)) for an ActionRecord tuple in contract field order.
+    Every field is a static type, so abi.encode is just the fields as 32-byte words.
+    """
+    from eth_utils import keccak
+    return keccak(b"".join(
+        bytes(v) if isinstance(v, (bytes, bytearray)) else int(v).to_bytes(32, "big")
+        for v in fields
+    ))
 
-def compute_action_record_hash(block: Dict[str, Any]) -> str:
+def action_record_fields(block: Dict[str, Any]) -> tuple:
     """
-    Compute keccak256 hash equivalent to Solidity _computeHash(ActionRecord) using abi.encode.
+    ActionRecord field tuple from a record dict as returned by the history reads.
     Expects keys: DocTitle, Owner, LastAccessDate, LastAccessedBy, action, SharedUser,
-    SharedEndDate, TimeStamp/timestamp, previousHash
+    SharedEndDate, ipfsHash, TimeStamp, timestamp, previousHash
     """
-    previous_hash = block.get("previousHash") or "0x" + ("00" * 32)
-    if isinstance(previous_hash, bytes):
-        previous_hash_bytes32 = previous_hash
-    else:
-        previous_hash_bytes32 = Web3.to_bytes(hexstr=previous_hash)
+    if isinstance(block, ActionBlock):
+        return block.record_fields()
+    previous_hash = block.get("previousHash") or ZERO_HASH
+    if isinstance(previous_hash, str):
+        previous_hash = bytes.fromhex(previous_hash.removeprefix("0x"))
     # Ensure bytes32 length
-    if len(previous_hash_bytes32) != 32:
-        previous_hash_bytes32 = previous_hash_bytes32.rjust(32, b"\x00")[:32]
+    previous_hash = bytes(previous_hash).rjust(32, b"\x00")[:32]
 
     # Resolve action value (supports 'actionIndex', numeric 'action', or string action name)
     action_value: int
@@ -165,30 +187,24 @@ def compute_action_record_hash(block: Dict[str, Any]) -> str:
         else:
             action_value = int(a or 0)
 
-    # Use a single timestamp source for both contract fields
-    ts_single = int(block.get("timestamp") or block.get("TimeStamp") or 0)
-    values = [
-        block.get("DocTitle", ""),
+    block_time = int(block.get("TimeStamp") or block.get("timestamp") or 0)
+    return (
+        encode_bytes32(str(block.get("DocTitle", ""))),
         int(block.get("Owner", 0) or 0),  # Owner is now uint64
         int(block.get("LastAccessDate", 0) or 0),
-        block.get("LastAccessedBy", ""),
+        encode_bytes32(str(block.get("LastAccessedBy", "") or "")),
         action_value,
-        block.get("SharedUser", ""),
+        encode_bytes32(str(block.get("SharedUser", "") or "")),
         int(block.get("SharedEndDate", 0) or 0),
-        ts_single,
-        ts_single,
-        previous_hash_bytes32,
-    ]
-    types = [
-        "string",
-        "uint64",  # Owner is now uint64
-        "uint256",
-        "string",
-        "uint8",
-        "string",
-        "uint256",
-        "uint256",
-        "uint256",
-        "bytes32",
-    ]
-    return Web3.to_hex(w3.solidity_keccak(types, values))
\ No newline at end of file
+        encode_ipfs_hash(str(block.get("ipfsHash", "") or "")),
+        block_time,
+        int(block.get("timestamp") or block_time),
+        previous_hash,
+    )
+
+def compute_action_record_hash(block: Dict[str, Any]) -> str:
+    """
+    Compute keccak256 hash equivalent to Solidity _computeHash(ActionRecord) using abi.encode
+    over all eleven ActionRecord fields (see action_record_fields for the expected keys).
+    """
+    return "0x" + compute_record_hash(action_record_fields(block)).hex()
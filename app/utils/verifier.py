@@ -0,0 +1,147 @@
+import argparse
+import json
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.utils.utils import ZERO_HASH, action_record_fields, compute_record_hash
+
+
+def _hex(value: bytes) -> str:
+    return "0x" + bytes(value).hex()
+
+
+class HistoryVerifier:
+    """
+    Checks that every ActionRecord's previousHash is keccak256(abi.encode(predecessor)),
+    as the contract's _computeHash links them, and that the first record links to zero.
+
+    The hash of the newest record of each verified history is memoised with the
+    history's length. A record hash commits to the whole chain before it, so when a
+    history has grown, the verified prefix is recognised by its head hash (one hash to
+    confirm) and only the new records are hashed.
+    """
+
+    def __init__(self, memo_size: int):
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hashed = 0
+        self.reused = 0
+
+    def verify(self, history: List[Dict]) -> Dict:
+        """`history` is newest first, as getDocumentHistory returns it."""
+        records = [action_record_fields(r) for r in reversed(history)]
+        start, previous = self._resume_point(records)
+        if start == 0:
+            previous = ZERO_HASH
+        broken = None
+        for i in range(start, len(records)):
+            fields = records[i]
+            if fields[10] != previous:
+                broken = {
+                    "index": i,
+                    "action": int(fields[4]),
+                    "TimeStamp": int(fields[8]),
+                    "expectedPreviousHash": _hex(previous),
+                    "previousHash": _hex(fields[10]),
+                }
+                break
+            previous = compute_record_hash(fields)
+        hashed = (i + 1 if broken is None else i) - start if records else 0
+        with self._lock:
+            self.hashed += hashed
+            self.reused += start
+            if broken is None and records:
+                self._memo[previous] = len(records)
+                self._memo.move_to_end(previous)
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+        return {
+            "valid": broken is None and bool(records),
+            "records": len(records),
+            "hashed": hashed,
+            "reusedPrefix": start,
+            "head": _hex(previous) if broken is None and records else None,
+            "brokenLink": broken,
+        }
+
+    def _resume_point(self, records: list):
+        """(index, hash of record index-1) of the longest memoised verified prefix, or (0, None)."""
+        with self._lock:
+            memo = dict(self._memo)
+        for i in range(len(records) - 1, 0, -1):
+            if memo.get(records[i][10]) == i and compute_record_hash(records[i - 1]) == records[i][10]:
+                return i, records[i][10]
+        return 0, None
+
+    def stats(self) -> Dict:
+        return {"memoEntries": len(self._memo), "recordsHashed": self.hashed, "recordsReused": self.reused}
+
+
+history_verifier = HistoryVerifier(settings.VERIFY_MEMO_MAX_ENTRIES)
+
+
+def _index():
+    from app.utils.indexer import indexer
+    if indexer is None:
+        raise RuntimeError("Event index is not enabled")
+    return indexer
+
+
+def fetch_histories(owner, doc_titles: Optional[List[str]] = None, source: str = "chain") -> List:
+    """Histories (newest first) per title from the chain (one batched read) or the local event index.
+    Without titles, all of the owner's documents are fetched."""
+    if source == "index":
+        index = _index()
+        if doc_titles is None:
+            doc_titles = [d["DocTitle"] for d in index.get_user_documents(owner)]
+        histories = []
+        for title in doc_titles:
+            try:
+                histories.append(index.get_document_history(title, owner))
+            except LookupError as e:
+                histories.append(e)
+        return list(zip(doc_titles, histories))
+    if source != "chain":
+        raise ValueError("source must be 'chain' or 'index'")
+    from app.utils.blockchain import get_document_histories_on_chain, get_user_documents_on_chain
+    if doc_titles is None:
+        doc_titles = [d["DocTitle"] for d in get_user_documents_on_chain(owner)]
+    return list(zip(doc_titles, get_document_histories_on_chain(owner, doc_titles)))
+
+
+def verify_documents(owner, doc_titles: Optional[List[str]] = None, source: str = "chain") -> Dict:
+    results = []
+    for title, history in fetch_histories(owner, doc_titles, source):
+        if isinstance(history, Exception):
+            code = "DOCUMENT_NOT_FOUND" if isinstance(history, LookupError) else getattr(history, "code", None)
+            results.append({"DocTitle": title, "valid": False, "error": str(history), "code": code})
+            continue
+        results.append({"DocTitle": title, **history_verifier.verify(history)})
+    return {
+        "Owner": str(owner),
+        "source": source,
+        "valid": all(r["valid"] for r in results),
+        "documents": results,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Verify the previousHash chain of document histories.")
+    parser.add_argument("--owner", required=True, type=int, help="Owner ID (uint64)")
+    parser.add_argument("--title", action="append", help="DocTitle to verify (repeatable); default: all of the owner's documents")
+    parser.add_argument("--source", choices=("chain", "index"), default="chain")
+    args = parser.parse_args(argv)
+    if args.source == "index":
+        _index().sync_once()
+    report = verify_documents(args.owner, args.title, args.source)
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0 if report["valid"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
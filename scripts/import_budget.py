@@ -0,0 +1,79 @@
+"""
+Measure the cold import time of `import app` and fail if it exceeds the budget.
+
+    python scripts/import_budget.py [--budget-ms 1200] [--runs 5] [--top 15]
+
+Each run is a fresh interpreter. The median wall time is compared against the budget,
+and the slowest modules of the last run (from -X importtime) are listed. Importing the
+app must not load web3 / eth_account (or the other modules in HEAVY_MODULES); that is
+checked as well. Most of the time is FastAPI's own import; the budget leaves headroom
+for slower or busier machines rather than tracking the median closely.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+HEAVY_MODULES = ("web3", "eth_account", "eth_abi", "eth_utils", "requests_toolbelt")
+
+_PROBE = (
+    "import sys, time; t = time.perf_counter(); import app; "
+    "print(time.perf_counter() - t); "
+    f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+)
+
+
+def measure(runs: int):
+    times, loaded, importtime = [], set(), ""
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _PROBE],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        out = proc.stdout.strip().splitlines()
+        times.append(float(out[0]) * 1000)
+        if len(out) > 1:
+            loaded.update(m for m in out[1].split(",") if m)
+        importtime = proc.stderr
+    return times, loaded, importtime
+
+
+def slowest(importtime: str, top: int) -> list:
+    rows = []
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            rows.append((int(cumulative) / 1000, name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", 1200)))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    times, loaded, importtime = measure(args.runs)
+    median = statistics.median(times)
+    print(f"import app: median {median:.0f} ms over {args.runs} runs (min {min(times):.0f}, max {max(times):.0f}); budget {args.budget_ms:.0f} ms")
+    print("slowest imports (cumulative ms):")
+    for ms, name in slowest(importtime, args.top):
+        print(f"  {ms:8.1f}  {name}")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: importing app loaded {', '.join(sorted(loaded))}; defer these to first use")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: over budget by {median - args.budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Point every on-disk store the app opens at import time to a temporary directory and fix
+the keys, before any app module is imported.
+"""
+import os
+import sys
+import tempfile
+
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+_tmp = tempfile.mkdtemp(prefix="vault-tests-")
+os.environ.update({
+    "DEDUP_DB_PATH": os.path.join(_tmp, "pins.sqlite3"),
+    "INDEXER_DB_PATH": os.path.join(_tmp, "index.sqlite3"),
+    "CONTENT_CACHE_DIR": os.path.join(_tmp, "ipfs"),
+    "CONTENT_CACHE_DB_PATH": os.path.join(_tmp, "content.sqlite3"),
+    "TEMP_DIR": os.path.join(_tmp, "temp"),
+    "UPLOAD_DIR": os.path.join(_tmp, "uploads"),
+    "ENCRYPTION_KEY": Fernet.generate_key().decode(),
+    "SECRET_KEY": "test-secret",
+})
+
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def chain():
+    """The contract artifact deployed on an in-process eth-tester chain, installed as the app's client."""
+    pytest.importorskip("eth_tester")
+    import json
+    from types import SimpleNamespace
+
+    from eth_account import Account
+    from web3 import EthereumTesterProvider, Web3
+
+    import app.utils.blockchain as bc
+    from app.utils.codec import ContractCodec
+
+    w3 = Web3(EthereumTesterProvider())
+    with open(os.path.join(os.path.dirname(__file__), "..", "contracts", "EnhancedBlockDocument.json")) as f:
+        artifact = json.load(f)
+    account = Account.create()
+    funder = w3.eth.accounts[0]
+    w3.eth.wait_for_transaction_receipt(w3.eth.send_transaction({"from": funder, "to": account.address, "value": 10**20}))
+    tx = w3.eth.contract(abi=artifact["abi"], bytecode=artifact["bytecode"]).constructor().transact({"from": funder})
+    address = w3.eth.wait_for_transaction_receipt(tx).contractAddress
+    bc.PRIVATE_KEY = account.key
+    bc._client = SimpleNamespace(
+        w3=w3,
+        account=w3.eth.account.from_key(account.key),
+        contract=w3.eth.contract(address=address, abi=artifact["abi"]),
+        abi=artifact["abi"],
+        codec=ContractCodec(artifact["abi"]),
+    )
+    return bc._client
+
+
+@pytest.fixture(scope="session")
+def client(chain):
+    from fastapi.testclient import TestClient
+
+    from app import app
+    with TestClient(app) as c:
+        yield c
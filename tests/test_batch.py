@@ -0,0 +1,109 @@
+import time
+
+import app.utils.blockchain as bc
+
+P = "/api/v1/documents"
+
+
+def test_batch_create_and_access(client):
+    items = [{"DocTitle": f"batch-{i}", "Owner": 851, "LastAccessDate": 1} for i in range(3)]
+    r = client.post(P + "/create_blocks", json=items)
+    assert r.status_code == 200, r.text
+    results = r.json()["data"]["results"]
+    assert [x["status"] for x in results] == ["confirmed"] * 3
+    listed = client.get(P + "/blocks/owner/851").json()["data"]["blocks"]
+    assert [b["DocTitle"] for b in listed] == ["batch-0", "batch-1", "batch-2"]
+
+    r = client.post(P + "/access_documents", json=[
+        {"DocTitle": "batch-0", "Owner": 851, "action": 0, "LastAccessDate": 2},
+        {"DocTitle": "batch-1", "Owner": 851, "action": 1, "LastAccessDate": 2},
+    ])
+    assert r.status_code == 200, r.text
+    assert r.json()["data"]["results"][1]["status"] == "confirmed"
+    history = client.get(P + "/blocks/document/batch-1/owner/851").json()["data"]["blocks"]
+    assert [b["action"] for b in history] == ["Downloaded", "Created"]
+
+
+def test_batch_reports_failed_items(client):
+    r = client.post(P + "/create_blocks", json=[
+        {"DocTitle": "batch-0", "Owner": 851, "LastAccessDate": 1},  # Exists already
+        {"DocTitle": "batch-new", "Owner": 851, "LastAccessDate": 1},
+    ])
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert not body["success"]
+    failed, ok = body["data"]["results"]
+    assert failed["status"] == "failed" and failed["code"] == "DOCUMENT_EXISTS"
+    assert ok["status"] == "confirmed"
+
+
+def test_batch_validation(client):
+    assert client.post(P + "/create_blocks", json=[]).status_code == 400
+    dup = [{"DocTitle": "batch-dup", "Owner": 852, "LastAccessDate": 1}] * 2
+    assert client.post(P + "/create_blocks", json=dup).status_code == 400
+
+
+def test_batch_without_waiting_tracks_a_job(client):
+    r = client.post(P + "/create_blocks", params={"wait": "false"}, json=[
+        {"DocTitle": f"batch-async-{i}", "Owner": 853, "LastAccessDate": 1} for i in range(2)
+    ])
+    assert r.status_code == 202, r.text
+    job_id = r.json()["data"]["jobId"]
+    deadline = time.time() + 30
+    while True:
+        job = client.get(P + f"/jobs/{job_id}").json()["data"]
+        if job["status"] != "pending" or time.time() > deadline:
+            break
+        time.sleep(0.2)
+    assert job["status"] == "confirmed"
+    assert len(job["transactions"]) == 2
+
+
+def test_batch_stops_at_the_first_failed_send(client, monkeypatch):
+    real_send = bc._sign_and_send
+    sends = []
+
+    def flaky_send(tx):
+        sends.append(tx["nonce"])
+        if len(sends) == 2:
+            raise ConnectionError("connection refused")
+        return real_send(tx)
+
+    monkeypatch.setattr(bc, "_sign_and_send", flaky_send)
+    r = client.post(P + "/create_blocks", json=[
+        {"DocTitle": f"batch-stop-{i}", "Owner": 854, "LastAccessDate": 1} for i in range(4)
+    ])
+    assert r.status_code == 200, r.text
+    assert [x["status"] for x in r.json()["data"]["results"]] == ["confirmed", "failed", "failed", "failed"]
+    assert len(sends) == 2
+
+    # The failed send and the two never attempted leave no gap: their nonces are handed out again
+    monkeypatch.setattr(bc, "_sign_and_send", real_send)
+    reused = bc.nonce_manager.allocate_many(3)
+    assert reused == [sends[1], sends[1] + 1, sends[1] + 2]
+    for nonce in reused:
+        bc.nonce_manager.release(nonce)
+    r = client.post(P + "/create_blocks", json=[{"DocTitle": "batch-stop-1", "Owner": 854, "LastAccessDate": 1}])
+    assert r.json()["data"]["results"][0]["status"] == "confirmed"
+
+
+def test_fee_estimate_failure_releases_the_callers_nonce(client, monkeypatch):
+    real_params = bc.fee_oracle.tx_params
+    sends = []
+
+    def flaky_params(fn, urgency):
+        sends.append(fn)
+        if len(sends) == 2:
+            raise ConnectionError("fee history unavailable")
+        return real_params(fn, urgency)
+
+    monkeypatch.setattr(bc.fee_oracle, "tx_params", flaky_params)
+    ipfs_hash = "QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG"
+    results = bc.send_many([(bc._create_document_call(f"batch-fee-{i}", "855", 1, ipfs_hash), "standard") for i in range(3)])
+    assert isinstance(results[1], ConnectionError) and isinstance(results[2], RuntimeError)
+    sent_nonce = results[0][1]["nonce"]
+    reused = bc.nonce_manager.allocate_many(2)
+    assert reused == [sent_nonce + 1, sent_nonce + 2]
+    for nonce in reused:
+        bc.nonce_manager.release(nonce)
+    bc.wait_for_receipt(results[0][0])
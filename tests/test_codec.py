@@ -0,0 +1,67 @@
+import pytest
+
+import app.utils.blockchain as bc
+
+P = "/api/v1/documents"
+
+
+def _plain(value):
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, str):
+        return value.lower()  # Addresses: eth_abi does not checksum them
+    return bytes(value) if isinstance(value, (bytes, bytearray)) else value
+
+
+@pytest.fixture(scope="module")
+def history(client):
+    assert client.post(P + "/create_block", json={"DocTitle": "codec-doc", "Owner": 831, "LastAccessDate": 1}).status_code == 200
+    assert client.post(P + "/access_document", json={"DocTitle": "codec-doc", "Owner": 831, "action": 1, "LastAccessDate": 2}).status_code == 200
+    r = client.post(P + "/share_document", json={
+        "DocTitle": "codec-doc", "Owner": 831, "SharedUser": "carol", "permissions": "view", "SharedEndDate": 9, "LastAccessDate": 3,
+    })
+    assert r.status_code == 200, r.text
+    return client.get(P + "/blocks/document/codec-doc/owner/831").json()["data"]["blocks"]
+
+
+def _calls(history):
+    title = bc.encode_bytes32("codec-doc")
+    previous = bytes.fromhex(history[0]["previousHash"])
+    return [
+        ("documentHistory", (title,)),
+        ("historyByHash", (previous,)),
+        ("getDocument", (title, 831)),
+        ("getDocumentHistory", (title, 831)),
+        ("getUserDocuments", (831,)),
+        ("userDocuments", (831, 0)),
+        ("owner", ()),
+    ]
+
+
+def test_codec_matches_web3(chain, history):
+    for name, args in _calls(history):
+        data = chain.codec.encode(name, *args)
+        fn = getattr(chain.contract.functions, name)(*args)
+        assert "0x" + data.hex() == fn._encode_transaction_data(), name
+        raw = chain.w3.eth.call({"to": chain.contract.address, "data": "0x" + data.hex()})
+        assert _plain(chain.codec.decode(name, bytes(raw))) == _plain(fn.call()), name
+
+
+def test_history_decodes_every_record(chain, history):
+    title = bc.encode_bytes32("codec-doc")
+    raw = chain.w3.eth.call({"to": chain.contract.address, "data": "0x" + chain.codec.encode("getDocumentHistory", title, 831).hex()})
+    records = chain.codec.decode("getDocumentHistory", bytes(raw))
+    assert [r[4] for r in records] == [4, 3, 0]  # Newest first: Shared_view, Downloaded, Created
+
+
+def test_malformed_return_data(chain):
+    with pytest.raises(ValueError):
+        chain.codec.decode("documentHistory", b"\0" * 64)
+    # Array length pointing past the end of the data
+    with pytest.raises(ValueError):
+        chain.codec.decode("getUserDocuments", (32).to_bytes(32, "big") + (5).to_bytes(32, "big"))
+
+
+def test_encode_checks_arguments(chain):
+    with pytest.raises(ValueError):
+        chain.codec.encode("getDocument", bc.encode_bytes32("x"))
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+
+import pytest
+
+from app.utils.content_cache import ContentCache, ContentMismatchError
+from app.utils.ipfs import CidBuilder
+from app.utils.signing import sign_download, verify_download
+
+
+def _cid(data: bytes) -> str:
+    builder = CidBuilder()
+    builder.update(data)
+    return builder.cid()
+
+
+class _Gateway:
+    def __init__(self, delay: float = 0.0):
+        self.store = {}
+        self.fetches = []
+        self.delay = delay
+
+    def add(self, data: bytes) -> str:
+        cid = _cid(data)
+        self.store[cid] = data
+        return cid
+
+    def __call__(self, cid: str):
+        self.fetches.append(cid)
+        time.sleep(self.delay)
+        if cid not in self.store:
+            raise FileNotFoundError(cid)
+        data = self.store[cid]
+        for i in range(0, len(data), 4096):
+            yield data[i:i + 4096]
+
+
+@pytest.fixture
+def gateway():
+    return _Gateway()
+
+
+def _cache(tmp_path, gateway, max_bytes=25_000, **kwargs) -> ContentCache:
+    return ContentCache(str(tmp_path / "files"), str(tmp_path / "index.sqlite3"), max_bytes, gateway, **kwargs)
+
+
+def test_miss_then_hit(tmp_path, gateway):
+    cache = _cache(tmp_path, gateway)
+    data = os.urandom(10_000)
+    cid = gateway.add(data)
+    path = cache.acquire(cid)
+    cache.release(cid)
+    assert open(path, "rb").read() == data
+    assert cache.acquire(cid) == path
+    cache.release(cid)
+    assert gateway.fetches == [cid]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_lru_eviction_skips_leased_entries(tmp_path, gateway):
+    cache = _cache(tmp_path, gateway)
+    a, b, c = (gateway.add(os.urandom(10_000)) for _ in range(3))
+    cache.acquire(a)  # held while the others are added
+    for cid in (b, c):
+        cache.acquire(cid)
+        cache.release(cid)
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["bytes"] <= 25_000
+    assert os.path.exists(cache.path(a)) and not os.path.exists(cache.path(b))
+    cache.release(a)
+    assert cache.stats()["leased"] == 0
+
+
+def test_concurrent_misses_share_one_download(tmp_path):
+    gateway = _Gateway(delay=0.2)
+    cache = _cache(tmp_path, gateway)
+    cid = gateway.add(os.urandom(5_000))
+    paths = []
+    threads = [threading.Thread(target=lambda: paths.append(cache.acquire(cid))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert gateway.fetches == [cid] and len(set(paths)) == 1
+    assert cache.stats()["coalesced"] == 3
+
+
+def test_mismatched_content_is_not_cached(tmp_path, gateway):
+    cache = _cache(tmp_path, gateway)
+    cid = _cid(b"expected")
+    gateway.store[cid] = b"something else"
+    with pytest.raises(ContentMismatchError):
+        cache.acquire(cid)
+    assert cache.stats()["entries"] == 0
+    assert not os.listdir(os.path.dirname(cache.path(cid)))
+
+
+def test_oversized_download_is_rejected(tmp_path, gateway):
+    cache = _cache(tmp_path, gateway, max_file_size=100)
+    cid = gateway.add(os.urandom(1_000))
+    with pytest.raises(ValueError):
+        cache.acquire(cid)
+    assert cache.stats()["entries"] == 0
+
+
+def test_missing_file_is_fetched_again(tmp_path, gateway):
+    cache = _cache(tmp_path, gateway)
+    cid = gateway.add(os.urandom(1_000))
+    cache.acquire(cid)
+    cache.release(cid)
+    os.remove(cache.path(cid))
+    cache.acquire(cid)
+    cache.release(cid)
+    assert gateway.fetches == [cid, cid]
+    os.remove(cache.path(cid))
+    cache.tidy()
+    assert cache.stats()["entries"] == 0 and cache.stats()["missingFiles"] == 2
+
+
+def test_index_survives_restart(tmp_path, gateway):
+    cache = _cache(tmp_path, gateway)
+    older, newer = gateway.add(os.urandom(1_000)), gateway.add(os.urandom(1_000))
+    for cid in (older, newer, older):
+        cache.acquire(cid)
+        cache.release(cid)
+    cache.stop()  # flushes access times
+    reopened = _cache(tmp_path, gateway)
+    assert list(reopened._entries) == [newer, older]
+    assert reopened.stats()["bytes"] == 2_000
+
+
+def test_download_signature():
+    expires = int(time.time()) + 60
+    signature = sign_download("doc.pdf", 7, "bob", expires)
+    assert verify_download("doc.pdf", 7, "bob", expires, signature)
+    assert not verify_download("doc.pdf", 7, "7", expires, signature)
+    assert not verify_download("other.pdf", 7, "bob", expires, signature)
+    expired = int(time.time()) - 1
+    assert not verify_download("doc.pdf", 7, "bob", expired, sign_download("doc.pdf", 7, "bob", expired))
@@ -0,0 +1,86 @@
+import io
+import os
+
+import pytest
+from cryptography.fernet import Fernet
+
+from app.utils import crypto
+
+CHUNK = 1024
+
+
+def _seal(data: bytes) -> bytes:
+    return b"".join(crypto.encrypt_stream([data], CHUNK))
+
+
+def _open(token: bytes) -> bytes:
+    return b"".join(crypto.decrypt_stream([token]))
+
+
+@pytest.mark.parametrize("size", [0, 1, CHUNK - 1, CHUNK, 3 * CHUNK, 3 * CHUNK + 17])
+def test_round_trip(size):
+    data = os.urandom(size)
+    token = _seal(data)
+    assert _open(token) == data
+    # Fed back in arbitrary pieces
+    pieces = [token[i:i + 333] for i in range(0, len(token), 333)]
+    assert b"".join(crypto.decrypt_stream(pieces)) == data
+    assert crypto.plaintext_size(io.BytesIO(token)) == size
+
+
+def test_every_file_has_its_own_key():
+    data = b"same plaintext" * 100
+    a, b = _seal(data), _seal(data)
+    header = crypto._HEADERS[crypto.VERSION]
+    assert header.unpack_from(a)[3] != header.unpack_from(b)[3]  # Salt
+    assert a[header.size:] != b[header.size:]
+
+
+@pytest.mark.parametrize("start,length", [(0, 10), (CHUNK - 5, 10), (CHUNK, CHUNK), (2 * CHUNK + 3, 10 ** 6), (10 ** 6, 5)])
+def test_range_decrypt(start, length):
+    data = os.urandom(3 * CHUNK + 100)
+    f = io.BytesIO(_seal(data))
+    assert b"".join(crypto.decrypt_range(f, start, length)) == data[start:start + length]
+
+
+def _tampered(token: bytes, how: str) -> bytes:
+    header = crypto._HEADERS[crypto.VERSION].size
+    sealed = CHUNK + crypto.TAG_SIZE
+    if how == "flip body":
+        return token[:header + 5] + bytes([token[header + 5] ^ 1]) + token[header + 6:]
+    if how == "flip salt":
+        return token[:10] + bytes([token[10] ^ 1]) + token[11:]
+    if how == "truncate":
+        return token[:header + 2 * sealed]
+    if how == "drop chunk":
+        return token[:header] + token[header + sealed:]
+    if how == "swap chunks":
+        return token[:header] + token[header + sealed:header + 2 * sealed] + token[header:header + sealed] + token[header + 2 * sealed:]
+    raise AssertionError(how)
+
+
+@pytest.mark.parametrize("how", ["flip body", "flip salt", "truncate", "drop chunk", "swap chunks"])
+def test_tampering_is_detected(how):
+    token = _seal(os.urandom(3 * CHUNK + 5))
+    with pytest.raises(ValueError, match="corrupt"):
+        _open(_tampered(token, how))
+
+
+def test_other_key_fails():
+    token = _seal(b"secret")
+    with pytest.raises(ValueError, match="corrupt"):
+        b"".join(crypto.decrypt_stream([token], key=Fernet.generate_key()))
+
+
+def test_version_1_and_fernet_still_decrypt():
+    data = os.urandom(2 * CHUNK + 9)
+    prefix = os.urandom(7)
+    header = crypto._HEADERS[1].pack(crypto.MAGIC, 1, CHUNK, prefix)
+    aead = crypto._v1_aead(crypto._fernet_key())
+    pieces = [data[i:i + CHUNK] for i in range(0, len(data), CHUNK)]
+    v1 = header + b"".join(
+        aead.encrypt(crypto._nonce(prefix, i, i == len(pieces) - 1), piece, header) for i, piece in enumerate(pieces)
+    )
+    assert _open(v1) == data
+    assert b"".join(crypto.decrypt_range(io.BytesIO(v1), CHUNK - 2, 4)) == data[CHUNK - 2:CHUNK + 2]
+    assert _open(crypto._fernet().encrypt(b"legacy")) == b"legacy"
@@ -0,0 +1,46 @@
+import sqlite3
+import threading
+import time
+
+from app.utils.dedup import DedupUploader
+
+
+def test_concurrent_uploads_of_one_cid_upload_once(tmp_path):
+    calls = []
+
+    def slow_upload(raw, filename):
+        calls.append(filename)
+        time.sleep(0.2)
+        return "QmPinned"
+
+    dedup = DedupUploader(str(tmp_path / "pins.sqlite3"), slow_upload)
+    results = []
+    threads = [
+        threading.Thread(target=lambda i=i: results.append(dedup.upload(None, f"f{i}", "QmLocal", "ab" * 32, 10)))
+        for i in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert sorted(results) == [("QmPinned", False)] + [("QmPinned", True)] * 7
+    stats = dedup.stats()
+    assert stats["uploads"] == 1 and stats["hits"] + stats["coalesced"] == 7 and stats["pins"] == 1
+
+    # Keyed by the local CID; a different CID is uploaded even with the same sha256
+    assert dedup.upload(None, "g", "QmOther", "ab" * 32, 10) == ("QmPinned", False)
+    assert len(calls) == 2
+
+
+def test_sha256_keyed_store_is_migrated(tmp_path):
+    path = str(tmp_path / "pins.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE pins (sha256 TEXT PRIMARY KEY, cid TEXT NOT NULL, size INTEGER NOT NULL, "
+            "pinned_at INTEGER NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("INSERT INTO pins VALUES (?, ?, ?, ?, ?)", ("cd" * 32, "QmOld", 5, 1, 2))
+    dedup = DedupUploader(path, lambda raw, filename: None)
+    assert dedup.lookup("QmOld") == "QmOld"
+    assert dedup.stats()["pins"] == 1
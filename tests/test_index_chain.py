@@ -0,0 +1,30 @@
+import app.routes.documents as documents
+from app.utils.indexer import EventIndexer
+
+P = "/api/v1/documents"
+
+
+def _data(client, path):
+    r = client.get(P + path)
+    assert r.status_code == 200, r.text
+    data = r.json()["data"]
+    data.pop("indexedBlock")
+    return data
+
+
+def test_index_reads_match_chain_reads(client, chain, tmp_path, monkeypatch):
+    for title in ("idx-a", "idx-b"):
+        r = client.post(P + "/create_block", json={"DocTitle": title, "Owner": 811, "LastAccessDate": 1})
+        assert r.status_code == 200, r.text
+    r = client.post(P + "/access_document", json={"DocTitle": "idx-a", "Owner": 811, "action": 1, "LastAccessDate": 2})
+    assert r.status_code == 200, r.text
+
+    paths = ("/blocks/owner/811", "/blocks/document/idx-a/owner/811/latest", "/blocks/document/idx-a/owner/811")
+    from_chain = [_data(client, p) for p in paths]
+
+    index = EventIndexer(str(tmp_path / "index.sqlite3"), start_block=0, confirmations=0,
+                         poll_interval=1, batch_blocks=1000, max_lag=5)
+    index.sync_once()
+    monkeypatch.setattr(documents, "indexer", index)
+    monkeypatch.setattr(documents, "_index_serving", lambda: True)
+    assert [_data(client, p) for p in paths] == from_chain
@@ -0,0 +1,142 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import app.utils.indexer as indexer_module
+from app.utils.blockchain import encode_bytes32
+from app.utils.indexer import EventIndexer
+from app.utils.utils import ZERO_HASH, compute_record_hash
+
+TOPIC = b"\x01" * 32
+
+
+class _Event:
+    @staticmethod
+    def process_log(log):
+        return {"args": log["args"]}
+
+
+class _FakeChain:
+    """Blocks with hashes and DocumentCreated-style logs, enough for EventIndexer.sync_once."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.logs = []
+        self.block_number = 0
+        self.eth = self
+
+    def mine(self, logs=(), fork: int = 0):
+        self.block_number += 1
+        n = self.block_number
+        self.hashes[n] = bytes([fork, n % 256]) * 16
+        for i, args in enumerate(logs):
+            self.logs.append({
+                "blockNumber": n, "logIndex": i, "blockHash": self.hashes[n],
+                "transactionHash": bytes([n, i]) * 16, "topics": [TOPIC], "args": args,
+            })
+        return n
+
+    def reorg(self, from_block: int):
+        """Drop blocks from `from_block` on (and their logs); mining continues on a new fork."""
+        self.logs = [l for l in self.logs if l["blockNumber"] < from_block]
+        for n in range(from_block, self.block_number + 1):
+            del self.hashes[n]
+        self.block_number = from_block - 1
+
+    def get_block(self, n):
+        return {"hash": self.hashes[n], "timestamp": 1000 + n}
+
+    def get_logs(self, flt):
+        return [l for l in self.logs if flt["fromBlock"] <= l["blockNumber"] <= flt["toBlock"]]
+
+
+def _args(title: str, owner: int, action: int, when: int, user: str = "") -> dict:
+    return {
+        "DocTitle": encode_bytes32(title), "Owner": owner, "LastAccessDate": when,
+        "LastAccessedBy": encode_bytes32(user), "action": action, "SharedUser": encode_bytes32(user),
+        "SharedEndDate": 0, "ipfsHash": encode_bytes32("QmPlaceholder"), "TimeStamp": when,
+    }
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    chain = _FakeChain()
+    monkeypatch.setattr(indexer_module, "w3", chain)
+    monkeypatch.setattr(indexer_module, "contract", SimpleNamespace(address="0x" + "11" * 20))
+    return chain
+
+
+@pytest.fixture
+def index(tmp_path, chain):
+    idx = EventIndexer(str(tmp_path / "index.sqlite3"), start_block=1, confirmations=0,
+                       poll_interval=1, batch_blocks=2, max_lag=5)
+    idx._events = {TOPIC: _Event()}
+    return idx
+
+
+def test_history_chain_and_listing(index, chain):
+    chain.mine([_args("doc", 5, 0, 100)])
+    chain.mine([_args("doc", 5, 2, 101, "5"), _args("doc", 5, 5, 102, "bob")])
+    chain.mine([_args("other", 5, 0, 103)])
+    index.sync_once()
+    assert index.indexed_block == 3
+
+    history = index.get_document_history("doc", 5)
+    assert [b.action for b in history] == [5, 2, 0]
+    assert history[-1].previousHash == ZERO_HASH
+    for newer, older in zip(history, history[1:]):
+        assert newer.previousHash == compute_record_hash(older.record_fields())
+
+    # Listings carry no previousHash, like getUserDocuments; the single-document read does
+    docs = index.get_user_documents(5)
+    assert [(d.DocTitle, d.action) for d in docs] == [("doc", 5), ("other", 0)]
+    assert all(d.previousHash is None for d in docs)
+    # ...and, like the contract's view functions, the TimeStamp of the block read (the last indexed)
+    assert {d.TimeStamp for d in docs} == {index.get_document("doc", 5).TimeStamp} == {1003}
+    assert index.get_document("doc", 5).previousHash == history[0].previousHash
+
+    page, next_offset, total = index.get_user_documents_page(5, 0, 1)
+    assert [d.DocTitle for d in page] == ["doc"] and next_offset == 1 and total == 2
+    with pytest.raises(LookupError):
+        index.get_document_history("doc", 6)
+
+
+def test_history_page_cursor(index, chain):
+    chain.mine([_args("doc", 5, 0, 100)])
+    for when in range(101, 106):
+        chain.mine([_args("doc", 5, 2, when, "5")])
+    index.sync_once()
+    seen, cursor = [], None
+    while True:
+        records, cursor = index.get_document_history_page("doc", 5, cursor, 2)
+        seen.extend(r.LastAccessDate for r in records)
+        if cursor is None:
+            break
+    assert seen == [105, 104, 103, 102, 101, 100]
+
+
+def test_reorg_rolls_back_and_reindexes(index, chain):
+    chain.mine([_args("doc", 5, 0, 100)])
+    chain.mine([_args("doc", 5, 2, 101, "5")])
+    chain.mine([_args("doc", 5, 2, 102, "5")])
+    index.sync_once()
+    assert len(index.get_document_history("doc", 5)) == 3
+
+    chain.reorg(3)
+    chain.mine([_args("doc", 5, 5, 110, "bob")], fork=1)
+    chain.mine(fork=1)
+    index.sync_once()
+    assert index.indexed_block == 4
+    assert [b.LastAccessDate for b in index.get_document_history("doc", 5)] == [110, 101, 100]
+
+
+def test_reads_do_not_wait_for_writer(index, chain):
+    chain.mine([_args("doc", 5, 0, 100)])
+    index.sync_once()
+    result = []
+    with index._lock:  # held by a batch being applied
+        reader = threading.Thread(target=lambda: result.append(index.get_document("doc", 5)))
+        reader.start()
+        reader.join(timeout=5)
+        assert result and result[0].DocTitle == "doc"
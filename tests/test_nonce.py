@@ -0,0 +1,104 @@
+import pytest
+
+from app.utils.nonce import NonceManager
+
+
+class _Node:
+    def __init__(self, pending):
+        self.pending = pending
+
+    def count(self):
+        return self.pending
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def node():
+    return _Node(5)
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def manager(node, clock):
+    return NonceManager(node.count, gap_grace=30, broadcast_ttl=300, resync_interval=10, clock=clock)
+
+
+def _send(manager, count):
+    nonces = manager.allocate_many(count)
+    for n in nonces:
+        manager.confirm(n)
+    return nonces
+
+
+def test_lagging_node_does_not_reissue_broadcast_nonces(manager, node, clock):
+    assert _send(manager, 3) == [5, 6, 7]
+    # The node has not counted our sends yet
+    clock.now += 60
+    manager.resync()
+    assert manager.allocate() == 8
+
+
+def test_missing_nonce_is_refilled_after_grace(manager, node, clock):
+    _send(manager, 3)
+    clock.now += 400  # Broadcasts older than the TTL
+    node.pending = 6  # Only nonce 5 reached the chain
+    manager.resync()
+    assert manager.allocate() == 8  # Missing, but not for the grace period yet
+    clock.now += 31
+    manager.resync()
+    assert manager.allocate_many(2) == [6, 7]
+
+
+def test_counted_nonces_are_forgotten(manager, node, clock):
+    _send(manager, 2)
+    node.pending = 7
+    manager.resync()
+    assert manager._broadcast == {}
+    assert manager.allocate() == 7
+
+
+def test_release_before_send_reuses_nonce(manager):
+    nonce = manager.allocate()
+    manager.release(nonce)
+    assert manager.allocate() == nonce
+
+
+def test_release_refused_connection_reuses_nonce(manager):
+    nonce = manager.allocate()
+    manager.release(nonce, ConnectionRefusedError("[Errno 111] Connection refused"))
+    assert manager.allocate() == nonce
+
+
+def test_release_rpc_rejection_reuses_nonce(manager):
+    Web3RPCError = type("Web3RPCError", (Exception,), {})
+    nonce = manager.allocate()
+    manager.release(nonce, Web3RPCError("insufficient funds for gas * price + value"))
+    assert manager.allocate() == nonce
+
+
+def test_release_ambiguous_failure_keeps_nonce(manager, clock):
+    ReadTimeout = type("ReadTimeout", (Exception,), {})
+    nonce = manager.allocate()
+    manager.release(nonce, ReadTimeout("Read timed out. (read timeout=10)"))
+    # The node may have accepted it: never handed out again, not even as a gap
+    clock.now += 60
+    manager.resync()
+    assert manager.allocate() == nonce + 1
+
+
+def test_release_consumed_nonce_resyncs(manager, node):
+    nonce = manager.allocate()
+    node.pending = nonce + 1
+    manager.release(nonce, ValueError("nonce too low"))
+    assert manager.allocate() == nonce + 1
@@ -0,0 +1,56 @@
+import asyncio
+import hashlib
+import os
+
+from app.core.config import settings
+from app.utils.ipfs import CHUNK_SIZE, CidBuilder, leaf_nodes
+from app.utils.offload import CpuPool, decrypt_bytes, encrypt_bytes, sha256_hex
+
+
+def test_offloaded_round_trip():
+    pool = CpuPool(max_workers=1, inline_below=1, timeout=60)
+    try:
+        data = os.urandom(3 * settings.ENCRYPTION_CHUNK_SIZE + 5)
+        token = pool.run(encrypt_bytes, data)
+        # The worker encrypted under this process's key
+        assert decrypt_bytes(token) == data
+        assert pool.run(decrypt_bytes, encrypt_bytes(data)) == data
+        assert pool.run(sha256_hex, data) == hashlib.sha256(data).hexdigest()
+        assert pool.stats()["operations"]["encrypt_bytes"]["offloaded"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_run_async_offloads_without_blocking_the_loop():
+    pool = CpuPool(max_workers=1, inline_below=1024, timeout=60)
+    data = os.urandom(5 * CHUNK_SIZE + 3)
+
+    async def hash_both():
+        return await asyncio.gather(pool.run_async(leaf_nodes, data), pool.run_async(sha256_hex, b"small"))
+
+    try:
+        leaves, small = asyncio.run(hash_both())
+        assert leaves == leaf_nodes(data) and small == hashlib.sha256(b"small").hexdigest()
+        ops = pool.stats()["operations"]
+        assert ops["leaf_nodes"]["offloaded"] == 1 and ops["sha256_hex"]["inline"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_leaves_hashed_in_batches_give_the_same_cid():
+    data = os.urandom(9 * CHUNK_SIZE + 11)
+    whole = CidBuilder()
+    whole.update(data)
+    batched = CidBuilder(hash_leaves=False)
+    for offset in range(0, len(data), 100000):
+        batched.update(data[offset:offset + 100000])
+        batch = batched.take_chunks(4 * CHUNK_SIZE)
+        if batch:
+            batched.add_leaves(leaf_nodes(batch))
+    assert batched.cid() == whole.cid()
+
+
+def test_small_inputs_run_inline():
+    pool = CpuPool(max_workers=1, inline_below=1024, timeout=60)
+    assert pool.run(decrypt_bytes, pool.run(encrypt_bytes, b"small")) == b"small"
+    assert pool.stats()["started"] is False
@@ -0,0 +1,69 @@
+from web3.exceptions import ContractLogicError
+
+import app.utils.blockchain as bc
+
+P = "/api/v1/documents"
+
+
+def _create(client, title, owner, when=1):
+    r = client.post(P + "/create_block", json={"DocTitle": title, "Owner": owner, "LastAccessDate": when})
+    assert r.status_code == 200, r.text
+
+
+def _pages(client, url, limit):
+    blocks, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        r = client.get(url, params=params)
+        assert r.status_code == 200, r.text
+        data = r.json()["data"]
+        assert len(data["blocks"]) <= limit
+        blocks += data["blocks"]
+        pages += 1
+        cursor = data["nextCursor"]
+        if cursor is None:
+            return blocks, pages
+
+
+def test_history_pages_match_full_history(client):
+    _create(client, "page-doc", 801)
+    for i in range(6):
+        r = client.post(P + "/access_document", json={"DocTitle": "page-doc", "Owner": 801, "action": i % 2, "LastAccessDate": 2 + i})
+        assert r.status_code == 200, r.text
+    full = client.get(P + "/blocks/document/page-doc/owner/801").json()["data"]["blocks"]
+    assert len(full) == 7
+    blocks, pages = _pages(client, P + "/blocks/document/page-doc/owner/801", 3)
+    assert blocks == full and pages == 3
+
+
+def test_owner_pages_match_full_listing(client):
+    for i in range(5):
+        _create(client, f"page-own-{i}", 802)
+    full = client.get(P + "/blocks/owner/802").json()["data"]["blocks"]
+    blocks, pages = _pages(client, P + "/blocks/owner/802", 2)
+    assert [b["DocTitle"] for b in full] == [f"page-own-{i}" for i in range(5)]
+    assert blocks == full and pages == 3
+
+
+def test_page_errors(client):
+    _create(client, "page-err", 803)
+    assert client.get(P + "/blocks/document/page-err/owner/803", params={"cursor": "0x" + "ab" * 32}).status_code == 400
+    assert client.get(P + "/blocks/document/page-err/owner/804", params={"limit": 2}).status_code == 404
+    assert client.get(P + "/blocks/document/page-err/owner/803", params={"limit": 0}).status_code == 400
+    assert client.get(P + "/blocks/owner/803", params={"cursor": "x"}).status_code == 400
+
+
+def test_non_integer_owner_is_rejected(client):
+    for path in ("/blocks/owner/bob", "/blocks/document/page-err/owner/bob"):
+        for params in ({}, {"limit": 2}, {"stream": 1}):
+            r = client.get(P + path, params=params)
+            assert r.status_code == 400 and r.json()["detail"] == "Owner must be an integer", (path, params)
+
+
+
+def test_revert_without_reason_has_an_empty_reason(chain):
+    # eth-tester reports a read past an array's end as "execution reverted: b''"
+    (result,) = bc.batch_read([bc._read("userDocuments", 899, 0)])
+    assert isinstance(result, bc.ContractRevert) and result.reason == ""
+    assert bc.revert_reason(ContractLogicError("execution reverted: b''")) == ""
+    assert bc.revert_reason(ContractLogicError("execution reverted: Document does not exist")) == "Document does not exist"
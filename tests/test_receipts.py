@@ -0,0 +1,46 @@
+import app.utils.blockchain as bc
+
+P = "/api/v1/documents"
+
+
+def test_previous_hash_of_records_mined_in_one_block(client, chain):
+    assert client.post(P + "/create_block", json={"DocTitle": "same-block", "Owner": 821, "LastAccessDate": 1}).status_code == 200
+    tester = chain.w3.provider.ethereum_tester
+    tester.disable_auto_mine_transactions()
+    try:
+        first = bc.submit_access_document("same-block", "821", 0, 2)[0][0]
+        # eth-tester takes one pending transaction per sender: the second comes from another account
+        second = bc._access_document_call("same-block", "821", 1, 3).transact({"from": chain.w3.eth.accounts[0]})
+    finally:
+        tester.enable_auto_mine_transactions()
+    receipts = [bc.wait_for_receipt(h) for h in (first, second)]
+    assert receipts[0]["blockNumber"] == receipts[1]["blockNumber"]
+
+    history = client.get(P + "/blocks/document/same-block/owner/821").json()["data"]["blocks"]
+    assert [b["previousHash"] for b in history[:2]] == [
+        bc.previous_hash_in_receipt(receipts[1], "same-block").hex(),
+        bc.previous_hash_in_receipt(receipts[0], "same-block").hex(),
+    ]
+    assert history[2]["action"] == "Created"
+    assert history[1]["previousHash"] != history[0]["previousHash"]
+
+
+def test_access_response_carries_its_own_previous_hash(client):
+    assert client.post(P + "/create_block", json={"DocTitle": "prev-hash", "Owner": 822, "LastAccessDate": 1}).status_code == 200
+    r = client.post(P + "/access_document", json={"DocTitle": "prev-hash", "Owner": 822, "action": 0, "LastAccessDate": 2})
+    assert r.status_code == 200, r.text
+    history = client.get(P + "/blocks/document/prev-hash/owner/822").json()["data"]["blocks"]
+    assert r.json()["data"]["previousHash"] == history[0]["previousHash"]
+
+
+def test_previous_hash_reads_state_and_logs_in_one_batch(client, monkeypatch):
+    assert client.post(P + "/create_block", json={"DocTitle": "one-batch", "Owner": 823, "LastAccessDate": 1}).status_code == 200
+    receipt = bc.wait_for_receipt(bc.submit_access_document("one-batch", "823", 0, 2)[0][0])
+    history = client.get(P + "/blocks/document/one-batch/owner/823").json()["data"]["blocks"]
+    batches = []
+    rpc_batch = bc.rpc_batch
+    monkeypatch.setattr(bc, "rpc_batch", lambda requests_: batches.append([m for m, _ in requests_]) or rpc_batch(requests_))
+    monkeypatch.setattr(bc, "_call", None)
+    previous = bc.previous_hash_in_receipt(receipt, "one-batch")
+    assert batches == [["eth_call", "eth_getLogs"]]
+    assert previous.hex() == history[0]["previousHash"]
@@ -0,0 +1,45 @@
+import app.utils.blockchain as bc
+
+P = "/api/v1/documents"
+
+
+def _share(client, title, owner, user, permissions):
+    return client.post(P + "/share_document", json={
+        "DocTitle": title, "Owner": owner, "SharedUser": user, "permissions": permissions,
+        "SharedEndDate": 0, "LastAccessDate": 2,
+    })
+
+
+def test_share_both_writes_view_and_download(client):
+    assert client.post(P + "/create_block", json={"DocTitle": "share-both", "Owner": 811, "LastAccessDate": 1}).status_code == 200
+    r = _share(client, "share-both", 811, "bob", "both")
+    assert r.status_code == 200, r.text
+    assert r.json()["data"]["action"] == "Shared_download"
+    history = client.get(P + "/blocks/document/share-both/owner/811").json()["data"]["blocks"]
+    assert [b["action"] for b in history] == ["Shared_download", "Shared_view", "Created"]
+
+
+def test_partial_share_reports_the_sent_transaction(client, monkeypatch):
+    assert client.post(P + "/create_block", json={"DocTitle": "share-half", "Owner": 812, "LastAccessDate": 1}).status_code == 200
+    real_send = bc._sign_and_send
+    sends = []
+
+    def flaky_send(tx):
+        sends.append(tx["nonce"])
+        if len(sends) == 2:
+            raise ConnectionError("connection refused")
+        return real_send(tx)
+
+    monkeypatch.setattr(bc, "_sign_and_send", flaky_send)
+    r = _share(client, "share-half", 812, "eve", "both")
+    assert r.status_code == 502, r.text
+    detail = r.json()["detail"]
+    assert len(detail["txHashes"]) == 1 and "connection refused" in detail["message"]
+    assert sends[1] == sends[0] + 1
+
+    # The nonce of the send that never reached the node is handed out again
+    monkeypatch.setattr(bc, "_sign_and_send", real_send)
+    assert bc.nonce_manager.allocate() == sends[1]
+    bc.nonce_manager.release(sends[1])
+    r = _share(client, "share-half", 812, "eve", "download")
+    assert r.status_code == 200, r.text
@@ -0,0 +1,55 @@
+import pytest
+
+from app.utils import transport
+from app.utils.transport import CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(transport.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before()
+        breaker.failure("boom")
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker("rpc", failure_threshold=2, reset_timeout=30)
+    _open(breaker)
+    with pytest.raises(CircuitOpenError):
+        breaker.before()
+
+    clock[0] += 31
+    breaker.before()  # The probe
+    with pytest.raises(CircuitOpenError):
+        breaker.before()
+    breaker.success()
+    assert breaker.state == "closed"
+    breaker.before()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker("rpc", failure_threshold=2, reset_timeout=30)
+    _open(breaker)
+    clock[0] += 31
+    breaker.before()
+    breaker.failure("still down")
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before()
+    clock[0] += 31
+    breaker.before()
+
+
+def test_abandoned_probe_frees_the_slot(clock):
+    breaker = CircuitBreaker("rpc", failure_threshold=1, reset_timeout=30)
+    _open(breaker)
+    clock[0] += 31
+    breaker.before()
+    breaker.abandon()
+    breaker.before()
+    assert breaker.rejected == 0
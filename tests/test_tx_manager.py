@@ -0,0 +1,78 @@
+import threading
+
+import app.utils.blockchain as bc
+import app.utils.tx_manager as txm
+
+GWEI = 10 ** 9
+
+
+def _manager(**overrides):
+    options = dict(poll_interval=1, batch_size=10, stuck_after=0, fee_bump_percent=15, max_rebroadcasts=2, job_ttl=0)
+    options.update(overrides)
+    manager = txm.TxManager(**options)
+    manager.start = lambda: None  # Polled by hand
+    return manager
+
+
+def test_stuck_job_is_abandoned_and_pruned(monkeypatch):
+    sent = []
+    monkeypatch.setattr(txm, "rpc_batch", lambda calls: [None] * len(calls))
+    monkeypatch.setattr(txm, "rebroadcast_transaction",
+                        lambda tx, pct: (sent.append(tx["nonce"]) or bytes([len(sent)]) * 32, dict(tx)))
+    manager = _manager()
+    job = manager.track("create", [(b"\x01" * 32, {"nonce": 7, "gasPrice": GWEI})])
+
+    manager.poll_once()
+    manager.poll_once()
+    assert job.status == "pending" and job.to_dict()["transactions"][0]["rebroadcasts"] == 2
+    manager.poll_once()
+    assert sent == [7, 7]
+    assert job.status == "abandoned" and job.finished_at is not None
+    manager.poll_once()
+    assert manager.get(job.id) is None
+
+
+def test_fee_cap_ends_rebroadcasts(monkeypatch):
+    monkeypatch.setattr(txm, "rpc_batch", lambda calls: [None] * len(calls))
+    monkeypatch.setattr(txm, "rebroadcast_transaction", lambda tx, pct: None)
+    manager = _manager(max_rebroadcasts=5, job_ttl=3600)
+    job = manager.track("create", [(b"\x01" * 32, {"nonce": 3, "gasPrice": GWEI})])
+    manager.poll_once()
+    manager.poll_once()
+    assert job.status == "abandoned"
+
+
+def test_job_reads_are_consistent_while_polled(monkeypatch):
+    monkeypatch.setattr(txm, "rpc_batch", lambda calls: [None] * len(calls))
+    monkeypatch.setattr(txm, "rebroadcast_transaction", lambda tx, pct: (bytes([tx["n"] % 256]) * 32, {**tx, "n": tx["n"] + 1}))
+    manager = _manager(max_rebroadcasts=300, job_ttl=3600)
+    job = manager.track("create", [(b"\x01" * 32, {"nonce": 4, "n": 0})])
+    snapshots = []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            snapshots.append(job.to_dict()["transactions"][0])
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for _ in range(301):
+            manager.poll_once()
+    finally:
+        done.set()
+        reader.join()
+    assert job.status == "abandoned"
+    assert snapshots and all(len(t["broadcastHashes"]) == t["rebroadcasts"] + 1 for t in snapshots)
+
+
+def test_rebroadcast_respects_fee_cap(monkeypatch):
+    monkeypatch.setattr(bc, "_sign_and_send", lambda tx: b"\x02" * 32)
+    monkeypatch.setattr(bc.fee_oracle, "max_fee", 100 * GWEI)
+    tx = {"nonce": 1, "maxFeePerGas": 80 * GWEI, "maxPriorityFeePerGas": 80 * GWEI}
+    _, bumped = bc.rebroadcast_transaction(tx, 15)
+    assert bumped["maxFeePerGas"] == 92 * GWEI + 1
+    assert bumped["maxPriorityFeePerGas"] <= bumped["maxFeePerGas"]
+
+    assert bc.rebroadcast_transaction(bumped, 15) is None
+    assert bc.rebroadcast_transaction({"nonce": 1, "gasPrice": 95 * GWEI}, 15) is None
@@ -0,0 +1,66 @@
+import hashlib
+import os
+
+import app.routes.documents as documents
+import app.utils.blockchain as bc
+from app.core.config import settings
+from app.utils.ipfs import CidBuilder
+
+P = "/api/v1/documents"
+
+
+def _cid(data: bytes) -> str:
+    builder = CidBuilder()
+    builder.update(data)
+    return builder.cid()
+
+
+def _upload(client, title, owner, data):
+    return client.post(
+        P + "/upload_document",
+        files={"file": ("report.bin", data)},
+        data={"DocTitle": title, "Owner": str(owner), "LastAccessDate": "1"},
+    )
+
+
+def test_upload_hashes_on_receipt_and_reads_the_file_only_to_upload(client, monkeypatch):
+    uploaded = []
+
+    def fake_upload(raw, filename):
+        data = raw.read()
+        uploaded.append(data)
+        return _cid(data)
+
+    monkeypatch.setattr(documents.dedup_uploader, "_upload", fake_upload)
+    data = os.urandom(3 * 262144 + 17)
+    r = _upload(client, "upload-a", 861, data)
+    assert r.status_code == 200, r.text
+    body = r.json()["data"]
+    assert body["sha256"] == hashlib.sha256(data).hexdigest() and body["size"] == len(data)
+    assert body["ipfsHash"] == _cid(data) and body["deduplicated"] is False
+    assert uploaded == [data]
+
+    # Same content for another document: known from its hashes, so nothing is uploaded
+    r = _upload(client, "upload-b", 861, data)
+    assert r.status_code == 200, r.text
+    assert r.json()["data"]["ipfsHash"] == _cid(data) and r.json()["data"]["deduplicated"] is True
+    assert len(uploaded) == 1
+
+    assert bc.get_document_on_chain("upload-b", 861).ipfsHash == _cid(data)
+
+
+def test_upload_without_dedup(client, monkeypatch):
+    monkeypatch.setattr(documents, "dedup_uploader", None)
+    monkeypatch.setattr(documents, "upload_file", lambda raw, filename: _cid(raw.read()))
+    r = _upload(client, "upload-plain", 862, b"plain content")
+    assert r.status_code == 200, r.text
+    assert r.json()["data"]["ipfsHash"] == _cid(b"plain content")
+
+
+def test_upload_errors(client, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 1024)
+    assert _upload(client, "upload-big", 863, b"x" * 2048).status_code == 413
+    r = client.post(P + "/upload_document", data={"DocTitle": "upload-none", "Owner": "863", "LastAccessDate": "1"})
+    assert r.status_code == 400
+    r = client.post(P + "/upload_document", files={"file": ("a.txt", b"a")}, data={"DocTitle": "upload-owner", "Owner": "bob", "LastAccessDate": "1"})
+    assert r.status_code == 400
@@ -0,0 +1,50 @@
+from app.utils.verifier import HistoryVerifier
+
+P = "/api/v1/documents"
+
+
+def _write(client, path, **body):
+    r = client.post(P + path, json=body)
+    assert r.status_code == 200, r.text
+
+
+def test_verify_document_and_resume_from_memo(client):
+    _write(client, "/create_block", DocTitle="verify-doc", Owner=841, LastAccessDate=1)
+    _write(client, "/access_document", DocTitle="verify-doc", Owner=841, action=0, LastAccessDate=2)
+    _write(client, "/share_document", DocTitle="verify-doc", Owner=841, SharedUser="dave", permissions="download",
+           SharedEndDate=0, LastAccessDate=3)
+    r = client.get(P + "/verify/document/verify-doc/owner/841")
+    assert r.status_code == 200, r.text
+    data = r.json()["data"]
+    assert data["valid"] and data["records"] == 3 and data["brokenLink"] is None
+
+    _write(client, "/access_document", DocTitle="verify-doc", Owner=841, action=1, LastAccessDate=4)
+    data = client.get(P + "/verify/document/verify-doc/owner/841").json()["data"]
+    assert data["valid"] and data["records"] == 4
+    assert data["reusedPrefix"] == 3 and data["hashed"] == 1
+
+
+def test_verify_owner(client):
+    for i in range(2):
+        _write(client, "/create_block", DocTitle=f"verify-own-{i}", Owner=842, LastAccessDate=1)
+    data = client.get(P + "/verify/owner/842").json()["data"]
+    assert data["valid"] and [d["DocTitle"] for d in data["documents"]] == ["verify-own-0", "verify-own-1"]
+    assert client.get(P + "/verify/owner/843").status_code == 404
+    assert client.get(P + "/verify/document/missing/owner/842").status_code == 404
+
+
+def test_tampered_history_is_reported(client):
+    import app.utils.blockchain as bc
+    from app.utils.blocks import ActionBlock
+
+    _write(client, "/create_block", DocTitle="verify-bad", Owner=844, LastAccessDate=1)
+    _write(client, "/access_document", DocTitle="verify-bad", Owner=844, action=0, LastAccessDate=2)
+    _write(client, "/access_document", DocTitle="verify-bad", Owner=844, action=1, LastAccessDate=3)
+    history = list(bc.get_document_history_on_chain("verify-bad", "844"))  # The read cache shares its lists
+    assert HistoryVerifier(16).verify(history)["valid"]
+
+    oldest = list(history[2].record_fields())
+    oldest[2] = 99  # Rewrite the oldest record's LastAccessDate
+    history[2] = ActionBlock.from_record(oldest)
+    report = HistoryVerifier(16).verify(history)
+    assert not report["valid"] and report["brokenLink"]["index"] == 1